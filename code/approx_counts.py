@@ -0,0 +1,289 @@
+'''
+Vocabulary counts in bounded memory, for corpora whose distinct tokens do not fit a Counter
+(cooccurrence.build_vocab, the vocab files changes_over_time.load_vocab reads for word1lims).
+
+Tokens are cut and kept as in corpus_tokenizer (the same bytes.translate tables and rules, so the
+same tokens as the notebook's tokenize or clean_string), but never become Python strings: every
+token is hashed to 64 bits in numpy (a polynomial hash over its bytes, one vectorized step per
+character position) and the hashes are added to a count-min sketch, depth rows of width int64
+counters each indexed by a differently salted mix of the hash. The estimate of a word, the smallest
+of its counters, is never below its count and above it by at most e*tokens/width in each row with
+probability 1 - 1/e.
+
+Alongside the sketch the candidates hashes with the highest estimates are kept (and the word of
+each, cut from the piece where it first became a candidate). Every other token's estimate was at
+most the largest estimate ever left out, the floor, when it was seen last, so no word outside the
+candidates occurs more often than the floor.
+
+The optional second pass counts the candidates (and any words asked for) exactly, with their first
+appearance. When the n-th exact count is above the floor the result is the n most frequent words
+exactly, ties in order of first appearance as build_vocab; otherwise it says so.
+
+    python approx_counts.py --newsroom <jsonl> --first-year 2004 --last-year 2006 --top 50000
+    python approx_counts.py --year-files ../data/databyyr/coha --words ../data/word_lists/*.txt
+
+Memory is the sketch (depth * width * 8 bytes, 32 MB by default), the candidates and one piece of
+text (corpus_tokenizer.chunk_bytes).
+'''
+import argparse
+import glob
+import os
+
+import numpy as np
+
+import corpus_stream
+import corpus_tokenizer
+import profiling
+
+sketch_width = 1 << 20
+sketch_depth = 4
+_prime = np.uint64(0x100000001b3)
+# the lowest n bytes of a uint64, n = 0..8
+_byte_masks = np.array([(1 << (8 * n)) - 1 for n in range(9)], dtype=np.uint64)
+
+
+def _mix(h):
+    '''
+    splitmix64's finalizer on a uint64 array
+    '''
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xbf58476d1ce4e5b9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94d049bb133111eb)
+    return h ^ (h >> np.uint64(31))
+
+
+def hash_spans(buffer, starts, ends):
+    '''
+    64-bit hashes of the byte spans buffer[starts[i]:ends[i]] of a uint8 array
+    '''
+    lengths = ends - starts
+    # the eight bytes from every position of the buffer as one little-endian uint64 (unaligned reads)
+    padded = np.concatenate([buffer, np.zeros(8, dtype=np.uint8)])
+    words = np.ndarray((len(buffer),), dtype='<u8', buffer=padded, strides=(1,))
+    hashes = np.zeros(len(starts), dtype=np.uint64)
+    running = np.arange(len(starts))
+    k = 0
+    while len(running) > 0:
+        chunk = words[starts[running] + k] & _byte_masks[np.minimum(lengths[running] - k, 8)]
+        hashes[running] = hashes[running] * _prime + chunk
+        k += 8
+        running = running[lengths[running] > k]
+    return _mix(hashes + lengths.astype(np.uint64))
+
+
+def hash_words(words):
+    '''
+    the hashes token_hashes gives these words
+    '''
+    data = ' '.join(words).encode('ascii', 'replace')
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    lengths = np.array([len(w) for w in words], dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(lengths + 1)[:-1]]).astype(np.int64)
+    return hash_spans(buffer, starts, starts + lengths)
+
+
+def token_hashes(data, mode):
+    '''
+    (hashes, starts, ends, translated bytes) of the tokens corpus_tokenizer keeps in prepared bytes
+    '''
+    text = data.translate(corpus_tokenizer.translate_tables[mode])
+    buffer = np.frombuffer(text, dtype=np.uint8)
+    if mode == 'newsroom':
+        in_token = (buffer >= ord('a')) & (buffer <= ord('z'))
+    else:
+        in_token = (buffer != ord(' ')) & (buffer != ord('|'))
+    edges = np.diff(np.concatenate([np.zeros(1, dtype=np.int8), in_token.view(np.int8), np.zeros(1, dtype=np.int8)]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    lengths = ends - starts
+    if mode == 'newsroom':
+        keep = lengths > 2
+    else:
+        marks = np.concatenate([[0], np.cumsum(buffer == ord('?'))])
+        keep = (lengths < 20) & (marks[ends] == marks[starts])
+    starts, ends = starts[keep], ends[keep]
+    hashes = hash_spans(buffer, starts, ends)
+    if mode == 'newsroom':
+        stop = ~np.isin(hashes, _stopword_hashes())
+        hashes, starts, ends = hashes[stop], starts[stop], ends[stop]
+    return hashes, starts, ends, text
+
+
+def _stopword_hashes():
+    return hash_words(sorted(w for w in corpus_stream.stopwords if len(w) > 2))
+
+
+class CountMinSketch(object):
+    '''
+    depth x width int64 counters, estimates never below the counts
+    '''
+    def __init__(self, width=sketch_width, depth=sketch_depth, seed=0):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.salts = np.random.SeedSequence(seed).generate_state(depth, dtype=np.uint64)
+        self.total = 0
+
+    def _columns(self, hashes, row):
+        return _mix(hashes ^ self.salts[row]) % np.uint64(self.width)
+
+    def add(self, hashes):
+        for row in range(self.depth):
+            self.table[row] += np.bincount(self._columns(hashes, row).astype(np.int64), minlength=self.width)
+        self.total += len(hashes)
+
+    def estimate(self, hashes):
+        estimates = np.full(len(hashes), np.iinfo(np.int64).max, dtype=np.int64)
+        for row in range(self.depth):
+            np.minimum(estimates, self.table[row][self._columns(hashes, row).astype(np.int64)], out=estimates)
+        return estimates
+
+    def error_bound(self):
+        '''
+        e * tokens / width, what an estimate exceeds the count by at most with probability 1 - e**-depth
+        '''
+        return np.e * self.total / self.width
+
+
+def approximate_counts(pieces, mode, candidates, width=sketch_width, depth=sketch_depth, seed=0):
+    '''
+    one pass over prepared pieces: (sketch, {hash: word} of the candidates, floor)
+    '''
+    sketch = CountMinSketch(width, depth, seed)
+    kept = np.zeros(0, dtype=np.uint64)
+    words = {}
+    floor = 0
+    for data in pieces:
+        hashes, starts, ends, text = token_hashes(data, mode)
+        sketch.add(hashes)
+        seen, first = np.unique(hashes, return_index=True)
+        pool = np.union1d(kept, seen)
+        estimates = sketch.estimate(pool)
+        if len(pool) > candidates:
+            top = np.argpartition(-estimates, candidates - 1)
+            floor = max(floor, int(estimates[top[candidates:]].max()))
+            pool = pool[np.sort(top[:candidates])]
+        new = pool[~np.isin(pool, kept)]
+        at = first[np.searchsorted(seen, new)]
+        for h, start, end in zip(new.tolist(), starts[at].tolist(), ends[at].tolist()):
+            words[h] = text[start:end].decode('ascii')
+        for h in np.setdiff1d(kept, pool).tolist():
+            del words[h]
+        kept = pool
+    return sketch, words, floor
+
+
+def exact_counts(pieces, mode, hashes):
+    '''
+    (counts, first appearance as a token position) of these hashes in a second pass
+    '''
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    order = np.argsort(hashes)
+    target = hashes[order]
+    counts = np.zeros(len(target), dtype=np.int64)
+    first = np.full(len(target), np.iinfo(np.int64).max, dtype=np.int64)
+    offset = 0
+    for data in pieces:
+        tokens = token_hashes(data, mode)[0]
+        pos = np.minimum(np.searchsorted(target, tokens), max(len(target) - 1, 0))
+        match = np.flatnonzero(target[pos] == tokens) if len(target) else np.zeros(0, dtype=np.int64)
+        counts += np.bincount(pos[match], minlength=len(target))
+        found, at = np.unique(pos[match], return_index=True)
+        first[found] = np.minimum(first[found], offset + match[at])
+        offset += len(tokens)
+    unsorted_counts, unsorted_first = np.empty_like(counts), np.empty_like(first)
+    unsorted_counts[order], unsorted_first[order] = counts, first
+    return unsorted_counts, unsorted_first
+
+
+def top_words(make_pieces, mode, n, extra_words=(), candidates=None, exact=True, width=sketch_width,
+              depth=sketch_depth, seed=0):
+    '''
+    (words, counts, certain) of the n most frequent words and of extra_words, most frequent first;
+    make_pieces() gives the prepared pieces afresh for each pass. certain says the n words are
+    exactly build_vocab's (always False without the exact pass, whose counts are then estimates)
+    '''
+    if candidates is None: candidates = 2 * n + 1000
+    with profiling.phase('sketch', {'candidates': candidates}):
+        sketch, words, floor = approximate_counts(make_pieces(), mode, candidates, width, depth, seed)
+    print('{} tokens, {} candidates, floor {}, sketch error bound {:.0f}'.format(sketch.total, len(words), floor, sketch.error_bound()))
+    names = list(words.values())
+    extra, known = set(extra_words), set(names)
+    missing = [w for w in dict.fromkeys(extra_words) if w not in known]
+    hashes = np.array(list(words), dtype=np.uint64)
+    if missing:
+        hashes = np.concatenate([hashes, hash_words(missing)])
+    names += missing
+    if exact:
+        with profiling.phase('exact', {'words': len(names)}):
+            counts, first = exact_counts(make_pieces(), mode, hashes)
+    else:
+        counts, first = sketch.estimate(hashes), np.arange(len(names))
+    order = np.lexsort((first, -counts))
+    top = order[:n][counts[order[:n]] > 0]
+    rest = [en for en in order[n:].tolist() if names[en] in extra and counts[en] > 0]
+    certain = exact and (floor == 0 or (len(top) == n and bool(counts[top[-1]] > floor)))
+    selected = top.tolist() + rest
+    return [names[en] for en in selected], counts[selected], certain
+
+
+def write_vocab(filename, words, counts):
+    '''
+    word count per line, the format of changes_over_time.load_vocab and corpus_tokenizer's vocab.txt
+    '''
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    with open(filename + '.tmp', 'w', encoding='utf-8') as f:
+        for word, count in zip(words, counts):
+            f.write('{} {}\n'.format(word, count))
+    os.replace(filename + '.tmp', filename)
+
+
+def read_word_lists(files):
+    words = []
+    for filename in files:
+        with open(filename, 'r', encoding='utf-8', errors='ignore') as f:
+            words.extend(line.strip().lower() for line in f if line.strip())
+    return list(dict.fromkeys(words))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--newsroom', default='../output/plots/extend_figure/data/newsroom_test.jsonl',
+                        help='Newsroom jsonl file (.jsonl or .jsonl.gz)')
+    source.add_argument('--year-files', help='folder of <year>.txt files, one article per line (COHA, NYT)')
+    parser.add_argument('--mode', choices=corpus_tokenizer.modes, help='newsroom for --newsroom, clean for --year-files by default')
+    parser.add_argument('--first-year', type=int)
+    parser.add_argument('--last-year', type=int)
+    parser.add_argument('--top', type=int, default=50000, help='number of most frequent words')
+    parser.add_argument('--candidates', type=int, help='words tracked by the sketch pass (default 2 * top + 1000)')
+    parser.add_argument('--width', type=int, default=sketch_width)
+    parser.add_argument('--depth', type=int, default=sketch_depth)
+    parser.add_argument('--sketch-only', action='store_true', help='skip the exact second pass, write estimates')
+    parser.add_argument('--words', nargs='*', default=[], help='word list files whose words are counted as well')
+    parser.add_argument('--output', default='../output/newsroom/vocab_approx.txt')
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'approx_counts')
+
+    if args.year_files is not None:
+        mode = args.mode or 'clean'
+        files = sorted((int(os.path.basename(f)[:-4]), f) for f in glob.glob(os.path.join(args.year_files, '*.txt'))
+                       if os.path.basename(f)[:-4].isdigit())
+        files = [f for year, f in files if (args.first_year is None or year >= args.first_year) and
+                 (args.last_year is None or year <= args.last_year)]
+
+        def make_pieces():
+            return (piece for f in files for piece in corpus_tokenizer.iter_text_pieces(f, mode))
+    else:
+        mode = args.mode or 'newsroom'
+
+        years = set(range(args.first_year or corpus_stream.first_year, (args.last_year or corpus_stream.last_year) + 1))
+
+        def make_pieces():
+            return (piece for _, piece in corpus_tokenizer.iter_newsroom_pieces(args.newsroom, mode, years))
+
+    words, counts, certain = top_words(make_pieces, mode, args.top, read_word_lists(args.words), args.candidates,
+                                       not args.sketch_only, args.width, args.depth)
+    write_vocab(args.output, words, counts)
+    print('{}: {} words, top {} {}'.format(args.output, len(words), args.top, 'exact' if certain else 'not guaranteed exact'))
@@ -0,0 +1,8 @@
+'''
+Performance benchmarks on synthetic embeddings, run from the code/ directory:
+
+    python -m benchmarks.run_benchmarks --vocab-size 20000 --dims 300
+
+synthetic.py builds a throwaway copy of the data/ and output/ layout with generated vectors,
+vocab counts, word lists and run_params.csv, so the real scripts run unchanged on it.
+'''
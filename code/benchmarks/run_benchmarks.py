@@ -0,0 +1,194 @@
+'''
+Times the main pipeline stages on a synthetic workspace and appends the numbers to a JSON history
+so they can be compared across commits. Run from the code/ directory:
+
+    python -m benchmarks.run_benchmarks --vocab-size 20000 --dims 300 --decades 9
+    python -m benchmarks.run_benchmarks --compare     # last run vs the previous one with the same config
+
+Benchmarked: load_vectors (one decade), single_set_distances_to_single_set with the legacy and the
+fast engine (neutral list vs one group over all decades), changes_over_time.main (one label incl. individual words), load_file and
+a few representative plot functions, and the import time of the main modules (each in a fresh
+interpreter, so heavy imports at module level show up). Plots need the 9 HistWords decades of the sgns/svd labels and
+are skipped for other configs or with --no-plots.
+'''
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import create_workspace, default_config
+
+code_folder = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import_modules = ['utilities', 'plot_creation', 'create_final_plots_all', 'changes_over_time']
+history_file = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'output', 'benchmarks', 'history.json'))
+
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        timings.append(time.perf_counter() - start)
+    return {'min': min(timings), 'median': sorted(timings)[len(timings) // 2], 'runs': timings}
+
+
+def time_import(module, repeat):
+    '''
+    seconds to import module in a fresh python process started in code/
+    '''
+    statement = 'import time; start = time.perf_counter(); import {}; print(time.perf_counter() - start)'.format(module)
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', statement], cwd=code_folder, stderr=subprocess.DEVNULL)
+        timings.append(float(output.decode().strip().splitlines()[-1]))
+    return {'min': min(timings), 'median': sorted(timings)[len(timings) // 2], 'runs': timings}
+
+
+def git_revision():
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], stderr=subprocess.DEVNULL) != 0
+        return rev + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def plot_jobs(row, label):
+    import plot_creation as pc
+    gender_file = '../data/word_lists/occupation_percentages_gender_occ1950.csv'
+    return {
+        'scatter_occupation_percents_distances': lambda: pc.scatter_occupation_percents_distances(row, label, 'occupations1950', 'male_pairs', 'female_pairs', -1, gender_file, pc.load_occupationpercent_data, pc.occupation_func_female_percent, None, None, False, False, 'norm', 'png'),
+        'plot_averagebias_over_time_consistentoccupations': lambda: pc.plot_averagebias_over_time_consistentoccupations(row, label, 'occupations1950', 'male_pairs', 'female_pairs', True, gender_file, pc.occupation_func_female_percent),
+        'create_cross_time_correlation_heatmap_differencestoself': lambda: pc.create_cross_time_correlation_heatmap_differencestoself(row, label, 'occupations1950', 'male_pairs', 'female_pairs', None, 'pdf'),
+        'plot_overtime_scatter': lambda: pc.plot_overtime_scatter(row, label, 'occupations1950', 'male_pairs', 'female_pairs', gender_file, pc.occupation_func_female_percent),
+    }
+
+
+def run(config, repeat=3, plots=True, keep_workspace=False):
+    import changes_over_time as cot
+    import utilities
+
+    root = tempfile.mkdtemp(prefix='embedding_bench_')
+    results = {}
+    for module in import_modules:
+        results['import_' + module] = time_import(module, repeat)
+    cwd = os.getcwd()
+    try:
+        start = time.perf_counter()
+        ws = create_workspace(root, config)
+        results['create_workspace'] = {'min': time.perf_counter() - start}
+        config = ws['config']
+        os.chdir(ws['code_folder'])
+
+        filenames = ws['filenames']
+        neutral = ws['lists'][config['neutral_list']]
+        group = ws['lists'][config['group_lists'][0]]
+
+        results['load_vectors'] = time_call(lambda: cot.load_vectors(filenames[0]), repeat)
+        results['load_vectors']['bytes_per_sec'] = os.path.getsize(filenames[0]) / results['load_vectors']['min']
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            vectors = cot.load_vectors_over_time(filenames)
+            vocabd = [cot.load_vocab(cot.vocab_filename(fi)) for fi in filenames]
+        results['single_set_distances_to_single_set'] = time_call(lambda: cot.single_set_distances_to_single_set(vectors, neutral, group, vocabd), repeat)
+        results['single_set_distances_to_single_set']['pairs_per_sec'] = len(neutral) * len(group) * len(vectors) / results['single_set_distances_to_single_set']['min']
+        results['single_set_distances_to_single_set_fast'] = time_call(lambda: cot.distance_engines['fast'](vectors, neutral, group, vocabd), repeat)
+        results['single_set_distances_to_single_set_fast']['pairs_per_sec'] = len(neutral) * len(group) * len(vectors) / results['single_set_distances_to_single_set_fast']['min']
+        del vectors
+
+        resultsfile = '../output/run_results/finalrun.csv'
+
+        def run_main():
+            if os.path.exists(resultsfile): os.remove(resultsfile)
+            cot.main(filenames, config['label'], 'finalrun.csv', neutral_lists=[config['neutral_list']], group_lists=config['group_lists'], do_individual_neutral_words=True, do_individual_group_words=True)
+        results['main'] = time_call(run_main, 1)
+
+        results['load_file'] = time_call(lambda: utilities.load_file(resultsfile), repeat)
+
+        if plots and config['label'] in ('sgns', 'svd') and config['decades'] == 9 and config['start_year'] == 1910:
+            with contextlib.redirect_stdout(io.StringIO()):
+                row = utilities.load_file(resultsfile)[config['label']]
+            for name, job in plot_jobs(row, config['label']).items():
+                results[name] = time_call(job, 1)
+        elif plots:
+            print('skipping plot benchmarks, they need the 9 decades of the sgns or svd label')
+    finally:
+        os.chdir(cwd)
+        if keep_workspace:
+            print('workspace kept at ' + root)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return {'date': datetime.datetime.now().isoformat(), 'revision': git_revision(), 'python': sys.version.split()[0],
+            'config': config, 'repeat': repeat, 'results': results}
+
+
+def load_history(filename=history_file):
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def append_history(record, filename=history_file):
+    history = load_history(filename)
+    history.append(record)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(history, f, indent=1)
+    os.replace(filename + '.tmp', filename)
+
+
+def compare(history, config=None):
+    '''
+    prints the last record next to the previous one with the same config
+    '''
+    if len(history) == 0:
+        print('no benchmark history yet')
+        return
+    latest = history[-1] if config is None else [h for h in history if h['config'] == config][-1]
+    previous = [h for h in history[:history.index(latest)] if h['config'] == latest['config']]
+    if len(previous) == 0:
+        print('no earlier run with the same config to compare against')
+        return
+    previous = previous[-1]
+    print('{:55s} {:>12s} {:>12s} {:>8s}'.format('benchmark ({} vs {})'.format(latest['revision'], previous['revision']), 'now (s)', 'before (s)', 'ratio'))
+    for name, res in latest['results'].items():
+        if name not in previous['results']: continue
+        before = previous['results'][name]['min']
+        print('{:55s} {:12.4f} {:12.4f} {:8.2f}'.format(name, res['min'], before, res['min'] / before if before > 0 else float('nan')))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vocab-size', type=int, default=default_config['vocab_size'])
+    parser.add_argument('--dims', type=int, default=default_config['dims'])
+    parser.add_argument('--decades', type=int, default=default_config['decades'])
+    parser.add_argument('--neutral-size', type=int, default=default_config['neutral_size'])
+    parser.add_argument('--group-size', type=int, default=default_config['group_size'])
+    parser.add_argument('--seed', type=int, default=default_config['seed'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-plots', action='store_true')
+    parser.add_argument('--keep-workspace', action='store_true')
+    parser.add_argument('--history', default=history_file)
+    parser.add_argument('--compare', action='store_true', help='only compare the last two runs in the history')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(load_history(args.history))
+    else:
+        config = {'vocab_size': args.vocab_size, 'dims': args.dims, 'decades': args.decades,
+                  'neutral_size': args.neutral_size, 'group_size': args.group_size, 'seed': args.seed}
+        record = run(config, repeat=args.repeat, plots=not args.no_plots, keep_workspace=args.keep_workspace)
+        for name, res in record['results'].items():
+            print('{:55s} {:10.4f} s'.format(name, res['min']))
+        append_history(record, args.history)
+        compare(load_history(args.history))
@@ -0,0 +1,107 @@
+'''
+Synthetic inputs for the benchmarks.
+
+create_workspace(root, config) writes a miniature copy of the repository layout under root:
+
+    root/code/run_params.csv
+    root/data/word_lists/                          generated neutral and group lists + reference csvs
+    root/data/vectors/normalized_clean/            vectors_<label><year>.txt, unit-normalized
+    root/data/vectors/normalized_clean/vocab/      vocab_<label><year>.txt word counts
+    root/output/run_results/, plots/, regressions/
+
+so changes_over_time.main and the plot functions run unchanged from root/code/. Word lists start
+with the real list words (so the census and stereotype csvs still match) and are padded with
+made-up words when a larger list is asked for.
+'''
+import csv
+import os
+import shutil
+
+import numpy as np
+
+repo_word_lists = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'word_lists')
+
+# reference data read by the plot functions
+reference_files = ['occupation_percentages_gender_occ1950.csv', 'occupation_percentages_race_occ1950.csv',
+                   'mturk_stereotypes.csv', 'occupationsMturk.txt', 'adjectives_williamsbest.csv',
+                   'princeton_stereotypes.csv', 'adjectives_princeton.txt']
+
+default_config = {
+    'label': 'sgns',
+    'vocab_size': 10000,
+    'dims': 300,
+    'decades': 9,
+    'start_year': 1910,
+    'neutral_list': 'occupations1950',
+    'neutral_size': 76,
+    'group_lists': ['male_pairs', 'female_pairs'],
+    'group_size': 19,
+    'missing_rate': 0.05,
+    'seed': 0,
+}
+
+
+def list_words(name, size):
+    with open(os.path.join(repo_word_lists, name + '.txt'), 'r') as f:
+        words = [x.strip() for x in f if len(x.strip()) > 0][:size]
+    return words + ['{}{}'.format(name.replace('_', ''), i) for i in range(size - len(words))]
+
+
+def write_vectors(filename, words, matrix):
+    with open(filename, 'w', newline='') as f:
+        for word, vec in zip(words, matrix):
+            f.write(word + ' ' + ' '.join(map(repr, vec.tolist())) + '\n')
+
+
+def create_workspace(root, config=None):
+    config = dict(default_config, **(config or {}))
+    rng = np.random.default_rng(config['seed'])
+
+    code_folder = os.path.join(root, 'code')
+    lists_folder = os.path.join(root, 'data', 'word_lists')
+    vectors_folder = os.path.join(root, 'data', 'vectors', 'normalized_clean')
+    for folder in [code_folder, lists_folder, os.path.join(vectors_folder, 'vocab'),
+                   os.path.join(root, 'output', 'run_results'), os.path.join(root, 'output', 'regressions')]:
+        os.makedirs(folder, exist_ok=True)
+    for sub in ['', 'gender/', 'ethnicity/', 'appendix/', 'appendix/gender/', 'appendix/ethnicity/']:
+        os.makedirs(os.path.join(root, 'output', 'plots', sub), exist_ok=True)
+
+    lists = {config['neutral_list']: list_words(config['neutral_list'], config['neutral_size'])}
+    for group in config['group_lists']:
+        lists[group] = list_words(group, config['group_size'])
+    for name, words in lists.items():
+        with open(os.path.join(lists_folder, name + '.txt'), 'w') as f:
+            f.write('\n'.join(words) + '\n')
+    for name in reference_files:
+        shutil.copy(os.path.join(repo_word_lists, name), lists_folder)
+
+    vocab = []
+    for words in lists.values():
+        vocab.extend(w for w in words if w not in vocab)
+    vocab.extend('synthetic{}'.format(i) for i in range(max(0, config['vocab_size'] - len(vocab))))
+
+    years = [config['start_year'] + 10 * i for i in range(config['decades'])]
+    filenames = []
+    for yr in years:
+        present = rng.random(len(vocab)) >= config['missing_rate']
+        words = [w for en, w in enumerate(vocab) if present[en]]
+        matrix = rng.standard_normal((len(words), config['dims']))
+        matrix /= np.linalg.norm(matrix, axis=1)[:, None]
+        # heavy-tailed counts so that some words fall under the 50-count threshold
+        counts = np.floor(np.exp(rng.normal(6, 2, len(words)))) + 1
+
+        filename = os.path.join(vectors_folder, 'vectors_{}{}.txt'.format(config['label'], yr))
+        write_vectors(filename, words, matrix)
+        with open(os.path.join(vectors_folder, 'vocab', 'vocab_{}{}.txt'.format(config['label'], yr)), 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=' ')
+            for word, count in zip(words, counts):
+                writer.writerow([word, int(count)])
+        filenames.append('../data/vectors/normalized_clean/vectors_{}{}.txt'.format(config['label'], yr))
+
+    with open(os.path.join(code_folder, 'run_params.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['label', 'csvname', 'neutral_lists', 'group_lists', 'do_individual_neutral_words', 'do_individual_group_words'])
+        writer.writerow([config['label'], 'finalrun.csv', str([config['neutral_list']]), str(config['group_lists']), 'TRUE', 'TRUE'])
+
+    return {'root': root, 'code_folder': code_folder, 'filenames': filenames, 'years': years,
+            'lists': lists, 'config': config}
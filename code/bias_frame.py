@@ -0,0 +1,74 @@
+'''
+Bias frames: the (words x decades) array of per-word biases that most plot functions are built on.
+
+For a results row, a neutral list and a group pair the norm bias of a word is
+    row['indiv_distances_neutral_<list>'][word][group1][4] - ...[group2][4]
+(averagesecond distance to group1 minus distance to group2) and the cossim bias is
+    ...[group2][7] - ...[group1][7]
+exactly as utilities.differences was applied word by word before. get_bias_frame builds the whole
+array at once and caches it per (row, list, groups, metric), so the plot functions of one run
+share it and select words/decades by indexing. mask is True where a word has no value.
+'''
+import numpy as np
+
+# metric name -> index of the series in the 8 distance series of changes_over_time
+metric_series = {'norm': 4, 'cossim': 7}
+
+_frames = {}
+
+
+class BiasFrame(object):
+    def __init__(self, words, values):
+        self.words = words
+        self.values = values
+        self.mask = np.isnan(values)
+        self.index = {w: en for en, w in enumerate(words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.index
+
+    def __getitem__(self, word):
+        return self.values[self.index[word]]
+
+    def complete(self, columns=None):
+        '''
+        boolean per word: no missing value in the given decade columns (all decades by default)
+        '''
+        mask = self.mask if columns is None else self.mask[:, columns]
+        return ~mask.any(axis=1)
+
+    def as_dict(self):
+        return {w: self.values[en] for en, w in enumerate(self.words)}
+
+
+def n_decades(row, neutral_words, group, series):
+    '''
+    number of decades of the averaged series changes_over_time stores next to the per-word distances
+    '''
+    averaged = row.get('{}_{}'.format(neutral_words, group))
+    return 0 if averaged is None else len(averaged[series])
+
+
+def get_bias_frame(row, neutral_words, group1, group2, metric='norm'):
+    # the row is kept in the cache entry so its id cannot be reused by another row
+    key = (id(row), neutral_words, group1, group2, metric)
+    if key not in _frames:
+        distances = row['indiv_distances_neutral_{}'.format(neutral_words)]
+        words = list(distances)
+        series = metric_series[metric]
+        first, second = (group1, group2) if metric == 'norm' else (group2, group1)
+        if len(words) == 0:
+            # no words, but still one column per decade so complete(columns) and column slicing work
+            values = np.zeros((0, n_decades(row, neutral_words, group1, series)))
+        else:
+            values = np.subtract(np.array([distances[w][first][series] for w in words], dtype=float),
+                                 np.array([distances[w][second][series] for w in words], dtype=float))
+        _frames[key] = (row, BiasFrame(words, values))
+    return _frames[key][1]
+
+
+def clear_cache():
+    _frames.clear()
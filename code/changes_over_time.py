@@ -4,6 +4,13 @@ import sys
 from io import StringIO
 import copy
 import datetime
+import os
+import pickle
+import argparse
+from instrumentation import timer, add, write_report
+import profiling
+import distance_engine
+import data_sources
 
 def cossim(v1, v2, signed = True):
     c = np.dot(v1, v2)/np.linalg.norm(v1)/np.linalg.norm(v2)
@@ -79,10 +86,12 @@ def calc_distance_over_time_averagevectorsfirst(vectors_over_time, words_to_aver
 def load_vectors(filename):
     print(filename)
     vectors = {}
-    with open(filename, 'r') as f:
-        reader = csv.reader(f, delimiter = ' ')
-        for row in reader:
-            vectors[row[0]] = [float(x) for x in row[1:] if len(x) >0]
+    with timer('load_vectors', file = filename, bytes = os.path.getsize(filename)) as t:
+        with open(filename, 'r') as f:
+            reader = csv.reader(f, delimiter = ' ')
+            for row in reader:
+                vectors[row[0]] = [float(x) for x in row[1:] if len(x) >0]
+        t['counts']['words'] = len(vectors)
     return vectors
 
 def load_vectors_over_time(filenames):
@@ -107,6 +116,7 @@ def single_set_distances_to_single_set(vectors_mult, targetset, otherset, vocabd
     toset_averagetargetsetfirst = [[] for _ in range(len(vectors_mult))]
     toset_cossim_averagetargetsetfirst = [[] for _ in range(len(vectors_mult))]
 
+    add('pairs', len(targetset) * len(otherset) * len(vectors_mult))
     for word in targetset:
         for word2 in otherset:
             dists = calc_distance_over_time(vectors_mult, word, word2, vocabd = vocabd, word1lims = word1lims, word2lims = word2lims)
@@ -127,6 +137,10 @@ def single_set_distances_to_single_set(vectors_mult, targetset, otherset, vocabd
 
     return [toset, toset_cossim, averageboth, averagefirst, averagesecond, averageboth_cossim, averagefirst_cossim, averagesecond_cossim]
 
+# engines that compute_distances can use, all with the signature of single_set_distances_to_single_set.
+# verify_equivalence.py checks every non-legacy engine against the legacy one
+distance_engines = {'legacy': single_set_distances_to_single_set, 'fast': distance_engine.single_set_distances_to_single_set}
+
 def set_distances_to_set(vectors_mult, targetset, set0, set1, vocabd, word1lims = [50, 1e25], word2lims = [50, 1e25]):
     '''
     returns average distances of targetset to each of set0 and set1 over the vectors_mult
@@ -161,9 +175,10 @@ def set_distances_to_set(vectors_mult, targetset, set0, set1, vocabd, word1lims
 
 def load_vocab(fi):
     try:
-        with open(fi, 'r') as f:
-            reader = csv.reader(f, delimiter = ' ')
-            return {d[0]:float(d[1]) for d in reader}
+        with timer('load_vocab', file = fi, bytes = os.path.getsize(fi)):
+            with open(fi, 'r') as f:
+                reader = csv.reader(f, delimiter = ' ')
+                return {d[0]:float(d[1]) for d in reader}
     except:
         return None
 
@@ -197,14 +212,12 @@ def get_vector_variance(vectors_over_time, words, vocabd = None, word1lims = [50
 
     return variances
 
-def main(filenames, label, csvname = None, neutral_lists = [], group_lists = ['male_pairs', 'female_pairs'], do_individual_group_words = False, do_individual_neutral_words = False, do_cross_individual = False):
-
-    vocabs = [fi.replace('normalized_clean/vectors', 'normalized_clean/vocab/vocab') for fi in filenames]
-    vocabd = [load_vocab(fi) for fi in vocabs]
+def vocab_filename(filename):
+    return filename.replace('normalized_clean/vectors', 'normalized_clean/vocab/vocab')
 
+def compute_distances(vectors_over_time, vocabd, neutral_lists = [], group_lists = ['male_pairs', 'female_pairs'], do_individual_group_words = False, do_individual_neutral_words = False, do_cross_individual = False, engine = 'legacy'):
+    single_set_distances_to_single_set = distance_engines[engine]
     d = {}
-    vectors_over_time = load_vectors_over_time(filenames)
-    print('vocab size: ' + str([len(v.keys()) for v in vectors_over_time]))
     d['counts_all'] = {}
     d['variance_over_time'] = {}
 
@@ -224,7 +237,7 @@ def main(filenames, label, csvname = None, neutral_lists = [], group_lists = ['m
             dloc_neutral = {}
 
             for grouplist in group_lists:
-                with open('../data/word_lists/'+grouplist + '.txt', 'r') as f2:
+                with open('../data/word_lists/'+grouplist + '.txt', 'r') as f2, timer('distances', neutral = neut, group = grouplist):
                     print(neut, grouplist)
                     groupwords = [x.strip() for x in list(f2)]
                     distances = single_set_distances_to_single_set(vectors_over_time, neutwords, groupwords, vocabd)
@@ -252,9 +265,64 @@ def main(filenames, label, csvname = None, neutral_lists = [], group_lists = ['m
 
 
             d['indiv_distances_neutral_'+neut] = dloc_neutral
+    return d
+
+def merge_decade_results(parts):
+    '''
+    concatenates per-decade results of compute_distances along the time axis, giving the same
+    structure compute_distances returns when run on all decades at once
+
+    a dictionary that is empty in any decade stays empty, matching get_counts_dictionary, which
+    returns {} when any decade is missing its vocab file
+    '''
+    first = parts[0]
+    if isinstance(first, dict):
+        if any(len(p) == 0 for p in parts): return {}
+        return {k: merge_decade_results([p[k] for p in parts]) for k in first}
+    if len(first) > 0 and isinstance(first[0], list):
+        return [merge_decade_results([p[i] for p in parts]) for i in range(len(first))]
+    return [x for p in parts for x in p]
+
+def compute_distances_streaming(filenames, label, partials_folder = '../output/run_results/partials/', **kwargs):
+    '''
+    decade-outer version of compute_distances: each decade is loaded, all metrics for all lists are
+    computed on it, and it is evicted before the next one is loaded, so peak memory is one decade's vectors
+
+    every metric only looks at a single decade, so the merged result is identical to the in-memory run.
+    per-decade results are pickled to partials_folder so an interrupted run resumes where it stopped
+    '''
+    os.makedirs(partials_folder, exist_ok = True)
+    parts = []
+    partfiles = []
+    for en, fi in enumerate(filenames):
+        partfile = os.path.join(partials_folder, '{}_{}.pkl'.format(label, en))
+        partfiles.append(partfile)
+        params = {'filename': fi, 'kwargs': kwargs}
+        if os.path.exists(partfile):
+            with open(partfile, 'rb') as pf:
+                saved = pickle.load(pf)
+            if saved['params'] == params:
+                print('reusing partial results for ' + fi)
+                parts.append(saved['result'])
+                continue
+
+        vocab = load_vocab(vocab_filename(fi))
+        vectors = load_vectors(fi)
+        print('vocab size: ' + str(len(vectors)))
+        part = compute_distances([vectors], [vocab], **kwargs)
+        del vectors, vocab
+
+        with open(partfile + '.tmp', 'wb') as pf:
+            pickle.dump({'params': params, 'result': part}, pf)
+        os.replace(partfile + '.tmp', partfile)
+        parts.append(part)
+
+    return merge_decade_results(parts), partfiles
+
+def write_results(d, label, csvname):
     # the original here is:
     # with open('run_results/'+csvname, 'ab') as cf:
-    with open('../output/run_results/'+csvname, 'a', newline='') as cf:
+    with open('../output/run_results/'+csvname, 'a', newline='') as cf, timer('write_results', label = label):
         headerorder = ['datetime', 'label']
         headerorder.extend(sorted(list(d.keys())))
         print(headerorder)
@@ -266,32 +334,51 @@ def main(filenames, label, csvname = None, neutral_lists = [], group_lists = ['m
         csvwriter.writerow(d)
         cf.flush()
 
-# i changed the path, the origianl is:
-# folder = '../vectors/normalized_clean/'
-folder = '../data/vectors/normalized_clean/'
+def main(filenames, label, csvname = None, neutral_lists = [], group_lists = ['male_pairs', 'female_pairs'], do_individual_group_words = False, do_individual_neutral_words = False, do_cross_individual = False, stream_decades = False, engine = 'legacy'):
+    kwargs = {'neutral_lists': neutral_lists, 'group_lists': group_lists, 'do_individual_group_words': do_individual_group_words, 'do_individual_neutral_words': do_individual_neutral_words, 'do_cross_individual': do_cross_individual, 'engine': engine}
 
-#filenames_nyt = [folder + 'vectorsnyt{}-{}.txt'.format(x, x+3) for x in range(1987, 2005, 1)]
-filenames_sgns = [folder + 'vectors_sgns{}.txt'.format(x) for x in range(1910, 2000, 10)]
-filenames_svd = [folder + 'vectors_svd{}.txt'.format(x) for x in range(1910, 2000, 10)]
-filenames_google = [folder + 'vectorsGoogleNews_exactclean.txt']
-filenames_wikipedia = [folder + 'vectorswikipedia.txt']
-filenames_commoncrawl = [folder + 'vectorscommoncrawlglove.txt']
+    if stream_decades:
+        d, partfiles = compute_distances_streaming(filenames, label, **kwargs)
+    else:
+        vocabs = [vocab_filename(fi) for fi in filenames]
+        vocabd = [load_vocab(fi) for fi in vocabs]
+
+        vectors_over_time = load_vectors_over_time(filenames)
+        print('vocab size: ' + str([len(v.keys()) for v in vectors_over_time]))
+        d = compute_distances(vectors_over_time, vocabd, **kwargs)
+        partfiles = []
 
-filename_map = {
-    # 'nyt' : filenames_nyt, 
-    'sgns' : filenames_sgns, 'svd': filenames_svd, 'google':filenames_google, 'wikipedia':filenames_wikipedia, 'commoncrawlglove':filenames_commoncrawl}
+    write_results(d, label, csvname)
+    for partfile in partfiles:
+        os.remove(partfile)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stream-decades', action = 'store_true', help = 'load one decade of vectors at a time instead of all of them at once')
+    parser.add_argument('--engine', choices = sorted(distance_engines), default = 'legacy', help = 'distance implementation, fast is the vectorized distance_engine')
+    parser.add_argument('--labels', nargs = '+', help = 'only run these labels of run_params.csv')
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'changes_over_time')
+
     param_filename = 'run_params.csv'
 
     with open(param_filename,'r') as f:
         reader = csv.DictReader(f)
-        next(reader,None)  # skip the first line that contains NYT parameters in run_params.csv
         for row in reader:
             label = row['label']
+            if args.labels is not None and label not in args.labels:
+                continue
+            # e.g. the NYT vectors, which are not distributed, or Newsroom windows not trained yet
+            if data_sources.get(label) is None or not data_sources.get(label).available():
+                print('skipping {}: its vector files are missing'.format(label))
+                continue
             neutral_lists = eval(row['neutral_lists'])
             group_lists = eval(row['group_lists'])
             do_individual_neutral_words = (row['do_individual_neutral_words'] == "TRUE")
             do_individual_group_words = (row.get('do_individual_neutral_words', '') == "TRUE")
 
-            main(filename_map[label], label = label, csvname = row['csvname'], neutral_lists = neutral_lists, group_lists = group_lists, do_individual_neutral_words = do_individual_neutral_words, do_individual_group_words = do_individual_group_words)
\ No newline at end of file
+            with timer('label', label = label):
+                main(data_sources.filenames(label), label = label, csvname = row['csvname'], neutral_lists = neutral_lists, group_lists = group_lists, do_individual_neutral_words = do_individual_neutral_words, do_individual_group_words = do_individual_group_words, stream_decades = args.stream_decades, engine = args.engine)
+
+    write_report('changes_over_time')
@@ -0,0 +1,128 @@
+'''
+Sparse word co-occurrence counts for training embeddings on a tokenized corpus (the Newsroom shards
+of corpus_stream), replacing the notebook's build_cooc loop over every token and window position.
+
+Tokens are mapped to int32 ids (-1 outside the vocabulary, but still taking up a position as in
+the notebook). For every distance d = 1..window_size the pairs are the id array against itself
+shifted by d, kept where both ids are in the vocabulary and weighted by 1 (the notebook's counts)
+or 1/d (GloVe's harmonic weighting); the other direction is added as the transpose. The pairs of a chunk are summed with
+np.bincount on the flat index i*V+j when V*V is small and as a coalesced COO matrix otherwise, and
+chunks are added into one scipy.sparse CSR matrix, so memory stays at one chunk of ids plus the
+nonzero counts.
+
+With span_articles=True the articles are one token stream, as when the notebook joins the window's
+text into one string; with False no window reaches across an article boundary.
+
+build_cooc_ids does the same on arrays of ids into a larger vocabulary (corpus_tokenizer's int32
+shards), mapping them to the vocabulary's rows with one lookup array instead of a dict per token.
+'''
+import collections
+
+import numpy as np
+from scipy import sparse
+
+weightings = ['count', 'harmonic']
+chunk_tokens = 10000000
+# largest V*V for which a chunk is summed with a dense bincount
+dense_limit = 1 << 22
+
+
+def count_tokens(articles):
+    counts = collections.Counter()
+    for tokens in articles:
+        counts.update(tokens)
+    return counts
+
+
+def build_vocab(articles, vocab_size=6000):
+    '''
+    the vocab_size most frequent tokens, ties in order of first appearance (Counter.most_common)
+    '''
+    counts = articles if isinstance(articles, collections.Counter) else count_tokens(articles)
+    return [w for w, c in counts.most_common(vocab_size)]
+
+
+def encode(tokens, vocab_index):
+    return np.array([vocab_index.get(t, -1) for t in tokens], dtype=np.int32)
+
+
+def _chunk_matrix(ids, start, V, window_size, weighting):
+    '''
+    co-occurrences of ids whose later position is at or after start (earlier ones were counted
+    with the previous chunk)
+    '''
+    rows, cols, weights = [], [], []
+    for d in range(1, window_size + 1):
+        left = ids[max(start - d, 0):len(ids) - d]
+        right = ids[max(start, d):]
+        both = (left >= 0) & (right >= 0)
+        rows.append(left[both].astype(np.int64))
+        cols.append(right[both].astype(np.int64))
+        weights.append(np.full(int(both.sum()), 1.0 if weighting == 'count' else 1.0 / d))
+    rows, cols, weights = np.concatenate(rows), np.concatenate(cols), np.concatenate(weights)
+    # only the left-to-right pairs are summed, the matrix is symmetric
+    if V * V <= dense_limit:
+        forward = sparse.csr_matrix(np.bincount(rows * V + cols, weights, minlength=V * V).reshape(V, V))
+    else:
+        forward = sparse.coo_matrix((weights, (rows, cols)), shape=(V, V)).tocsr()
+    return forward + forward.T
+
+
+def build_cooc(articles, vocab, window_size=4, weighting='count', span_articles=True, chunk=chunk_tokens):
+    '''
+    (V x V CSR matrix of co-occurrences, vocab_index) over an iterable of token lists
+    '''
+    vocab_index = {w: i for i, w in enumerate(vocab)}
+    id_arrays = (encode(tokens, vocab_index) for tokens in articles)
+    return _sum_chunks(id_arrays, len(vocab), window_size, weighting, span_articles, chunk), vocab_index
+
+
+def build_cooc_ids(id_articles, vocab_ids, n_words, window_size=4, weighting='count', span_articles=True, chunk=chunk_tokens):
+    '''
+    V x V CSR matrix of co-occurrences over arrays of global token ids (corpus_tokenizer's shards),
+    row i being the word of id vocab_ids[i]; n_words is the size of the global vocabulary
+    '''
+    lookup = np.full(n_words, -1, dtype=np.int32)
+    lookup[np.asarray(vocab_ids, dtype=np.int64)] = np.arange(len(vocab_ids), dtype=np.int32)
+    id_arrays = (lookup[ids] for ids in id_articles)
+    return _sum_chunks(id_arrays, len(vocab_ids), window_size, weighting, span_articles, chunk)
+
+
+def _sum_chunks(id_arrays, V, window_size, weighting, span_articles, chunk):
+    if weighting not in weightings:
+        raise ValueError('unknown weighting: {}'.format(weighting))
+    total = sparse.csr_matrix((V, V))
+    # ids of the last window_size positions of the previous chunk, so pairs across chunks are counted once
+    tail = np.zeros(0, dtype=np.int32)
+    separator = np.full(window_size, -1, dtype=np.int32)
+    pending, pending_len = [], 0
+
+    def flush(tail):
+        ids = np.concatenate([tail] + pending)
+        matrix = _chunk_matrix(ids, len(tail), V, window_size, weighting)
+        return matrix, ids[-window_size:] if window_size > 0 else ids[:0]
+
+    for ids in id_arrays:
+        if not span_articles and pending_len + len(tail) > 0:
+            # window_size out-of-vocabulary positions keep every window inside its article
+            pending.append(separator)
+            pending_len += window_size
+        pending.append(ids)
+        pending_len += len(ids)
+        if pending_len >= chunk:
+            matrix, tail = flush(tail)
+            total = total + matrix
+            pending, pending_len = [], 0
+    if pending_len > 0:
+        matrix, tail = flush(tail)
+        total = total + matrix
+    total.sum_duplicates()
+    return total
+
+
+def as_pairs(matrix):
+    '''
+    {(i, j): value} of the nonzero entries, the notebook's cooc dict
+    '''
+    coo = matrix.tocoo()
+    return {(int(i), int(j)): float(v) for i, j, v in zip(coo.row, coo.col, coo.data)}
@@ -0,0 +1,224 @@
+'''
+Streams a Newsroom JSONL file (one article per line, plain or .gz) into per-year token shards, for
+the extended figure (Embeddings_extend_figure.ipynb) without loading the corpus into memory.
+
+Articles are read one line at a time, tokenized as in the notebook (lowercase [a-z]+ runs longer
+than two characters, without the stopwords) and appended to the open shard of their year:
+
+    <output>/<year>/shard_00000.txt     one article per line, tokens separated by spaces
+    <output>/manifest.json              per year: articles, tokens, raw_words and shard files
+
+A shard is closed once it holds shard_tokens tokens, so memory stays at one line plus one write
+buffer per year however large the input (the full train split as well as newsroom_test.jsonl).
+Shards are written under a .tmp name and renamed when complete; the manifest is written last.
+iter_window_articles(output, year) then yields the token lists of a 3-year window article by
+article, so nothing downstream needs the window as one string. raw_words is the year's whitespace
+word count before tokenizing (len(text.split()) summed over all its articles, the empty ones
+included), the size the notebook picks a window's vocabulary size by.
+'''
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+
+import profiling
+
+# the notebook's preprocessing
+stopwords = set([
+    "the", "a", "and", "of", "in", "to", "for", "on", "at", "by", "with", "from", "that",
+    "this", "it", "is", "as", "an", "be", "are", "was", "were"
+])
+token_pattern = re.compile(r"[a-z]+")
+first_year = 1998
+last_year = 2016
+shard_tokens = 5000000
+manifest_name = 'manifest.json'
+
+
+def tokenize(text):
+    return [t for t in token_pattern.findall(text.lower()) if t not in stopwords and len(t) > 2]
+
+
+def open_input(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='ignore')
+    return open(path, 'r', encoding='utf-8', errors='ignore')
+
+
+def article_year(record):
+    '''
+    year of an article from the first four characters of its date, None if there is none
+    '''
+    date = record.get('date')
+    if date is None:
+        return None
+    try:
+        return int(str(date)[:4])
+    except ValueError:
+        return None
+
+
+def iter_articles(path, years=None):
+    '''
+    (year, text) per article with a date and a text, skipping lines that are not valid JSON
+    '''
+    with open_input(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            text = record.get('text')
+            year = article_year(record)
+            if text is None or year is None:
+                continue
+            if years is not None and year not in years:
+                continue
+            yield year, str(text)
+
+
+class ShardWriter(object):
+    '''
+    appends tokenized articles of one year to numbered shard files of at most max_tokens tokens
+    '''
+    def __init__(self, folder, max_tokens):
+        self.folder = folder
+        self.max_tokens = max_tokens
+        self.shards = []
+        self.articles = 0
+        self.tokens = 0
+        self._file = None
+        self._shard_tokens = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self):
+        return os.path.join(self.folder, 'shard_{:05d}.txt'.format(len(self.shards)))
+
+    def write(self, tokens):
+        if self._file is None:
+            self._file = open(self._path() + '.tmp', 'w', encoding='utf-8')
+        self._file.write(' '.join(tokens) + '\n')
+        self._shard_tokens += len(tokens)
+        self.articles += 1
+        self.tokens += len(tokens)
+        if self._shard_tokens >= self.max_tokens:
+            self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            os.replace(self._path() + '.tmp', self._path())
+            self.shards.append(os.path.basename(self._path()))
+            self._file = None
+            self._shard_tokens = 0
+
+
+def write_shards(path, output, years=None, max_tokens=shard_tokens):
+    '''
+    streams path into per-year shards under output (replacing earlier shards there), returns the manifest
+    '''
+    if years is None: years = range(first_year, last_year + 1)
+    years = set(years)
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    writers = {}
+    raw_words = {}
+    skipped = 0
+    try:
+        for year, text in iter_articles(path, years):
+            raw_words[year] = raw_words.get(year, 0) + len(text.split())
+            tokens = tokenize(text)
+            if len(tokens) == 0:
+                skipped += 1
+                continue
+            if year not in writers:
+                writers[year] = ShardWriter(os.path.join(output, str(year)), max_tokens)
+            writers[year].write(tokens)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    manifest = {'input': os.path.abspath(path), 'stopwords': sorted(stopwords), 'empty_articles': skipped,
+                'years': {str(year): {'articles': w.articles, 'tokens': w.tokens, 'raw_words': raw_words[year], 'shards': w.shards}
+                          for year, w in sorted(writers.items())}}
+    with open(os.path.join(output, manifest_name + '.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(os.path.join(output, manifest_name + '.tmp'), os.path.join(output, manifest_name))
+    return manifest
+
+
+def load_manifest(output):
+    with open(os.path.join(output, manifest_name), 'r') as f:
+        return json.load(f)
+
+
+def shard_files(output, year, manifest=None):
+    if manifest is None: manifest = load_manifest(output)
+    entry = manifest['years'].get(str(year))
+    if entry is None:
+        return []
+    return [os.path.join(output, str(year), shard) for shard in entry['shards']]
+
+
+def iter_year_articles(output, year, manifest=None):
+    '''
+    token list per article of one year, read shard by shard
+    '''
+    for filename in shard_files(output, year, manifest):
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield line.split()
+
+
+def iter_window_articles(output, year, half_width=1, manifest=None):
+    '''
+    token list per article of the window year-half_width .. year+half_width (the notebook's
+    3-year windows for half_width=1)
+    '''
+    if manifest is None: manifest = load_manifest(output)
+    for yr in range(year - half_width, year + half_width + 1):
+        for tokens in iter_year_articles(output, yr, manifest):
+            yield tokens
+
+
+def raw_words(manifest, years):
+    '''
+    the notebook's len(text.split()) of the window made of years
+    '''
+    entries = [manifest['years'][str(yr)] for yr in years if str(yr) in manifest['years']]
+    if any('raw_words' not in e for e in entries):
+        raise ValueError('the manifest has no raw word counts, run corpus_stream.py again')
+    return sum(e['raw_words'] for e in entries)
+
+
+def window_sizes(output, window_years, half_width=1, manifest=None):
+    '''
+    (articles, tokens, raw words) per window, from the manifest alone
+    '''
+    if manifest is None: manifest = load_manifest(output)
+    sizes = {}
+    for year in window_years:
+        years = range(year - half_width, year + half_width + 1)
+        entries = [manifest['years'].get(str(yr), {'articles': 0, 'tokens': 0}) for yr in years]
+        sizes[year] = (sum(e['articles'] for e in entries), sum(e['tokens'] for e in entries), raw_words(manifest, years))
+    return sizes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', default='../output/plots/extend_figure/data/newsroom_test.jsonl',
+                        help='Newsroom jsonl file (.jsonl or .jsonl.gz), e.g. the train split')
+    parser.add_argument('--output', default='../output/newsroom/shards')
+    parser.add_argument('--first-year', type=int, default=first_year)
+    parser.add_argument('--last-year', type=int, default=last_year)
+    parser.add_argument('--shard-tokens', type=int, default=shard_tokens)
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'corpus_stream')
+
+    with profiling.phase('write_shards', {'input': os.path.basename(args.input)}):
+        manifest = write_shards(args.input, args.output, range(args.first_year, args.last_year + 1), args.shard_tokens)
+    for year, entry in sorted(manifest['years'].items()):
+        print(year, '→', entry['articles'], 'articles,', entry['tokens'], 'tokens,', entry['raw_words'], 'raw words,', len(entry['shards']), 'shards')
@@ -0,0 +1,345 @@
+'''
+Tokenizes corpora into int32 token-id shards with one vocabulary counted as it goes, for the
+Newsroom JSONL as well as year files of plain text (COHA, NYT: one article per line, as the
+authors' create_yrly_datasets.py writes them to databyyr/<corpus>/<year>.txt).
+
+Text is processed in large pieces of whole articles: lowercased and turned into ASCII bytes (every
+other character becomes '?'), then one bytes.translate per mode makes every byte that cannot be
+part of a token a space (newsroom) or '?' (clean, whitespace alone separates words there) and
+bytes.split cuts the piece into tokens, an article end ('\\n') becoming the token '|'. A token is
+kept by the mode's rule, decided once per distinct token:
+
+    newsroom    the notebook's tokenize: [a-z]+ runs longer than two characters, without the stopwords
+    clean       create_yrly_datasets.clean_string: whitespace-separated words of fewer than 20
+                characters that are all a-z (other whitespace is made a space first, as str.split
+                splits on it)
+
+so both give the same tokens as the python functions. Tokens map to ids through one dict lookup per
+token in C (a defaultdict that numbers new tokens) and an array from those numbers to word ids (-1
+for tokens not kept), and counts are added per piece with np.bincount, per year and in total.
+
+    <output>/<year>/shard_00000.int32           token ids of the year's articles, one after the other
+    <output>/<year>/shard_00000.lengths.int32   tokens per article
+    <output>/<year>/counts.npy                  count of every id in the year
+    <output>/vocab.txt                          word count, one line per id
+    <output>/manifest.json                      per year: articles, tokens, shards (written last)
+
+iter_id_articles reads the shards back as np.memmap, so the ids of a year are never all in memory,
+and cooccurrence.build_cooc_ids counts co-occurrences on them without going back to strings.
+Empty articles are left out, as in corpus_stream.
+'''
+import argparse
+import collections
+import glob
+import itertools
+import json
+import os
+import shutil
+
+import numpy as np
+
+import corpus_stream
+import profiling
+
+modes = ['newsroom', 'clean']
+letters = set(range(ord('a'), ord('z') + 1))
+whitespace = set(b' \t\n\r\x0b\x0c')
+# bytes.translate tables: letters stay, the article end becomes '|', the rest separates (newsroom)
+# or marks the word as not all letters (clean)
+translate_tables = {
+    'newsroom': bytes(c if c in letters else ord('|') if c == ord('\n') else ord(' ') for c in range(256)),
+    'clean': bytes(c if c in letters else ord('|') if c == ord('\n') else ord(' ') if c in whitespace else ord('?')
+                   for c in range(256)),
+}
+chunk_bytes = 1 << 24
+shard_tokens = 50000000
+manifest_name = 'manifest.json'
+# the characters str.split splits on that bytes.split does not know, made spaces before the text
+# becomes ASCII
+_unicode_spaces = {c: ' ' for c in [0x1c, 0x1d, 0x1e, 0x1f, 0x85, 0xa0, 0x1680] + list(range(0x2000, 0x200b)) +
+                   [0x2028, 0x2029, 0x202f, 0x205f, 0x3000]}
+
+
+def prepare(text, mode, article=False):
+    '''
+    lowercased ASCII bytes of text; article=True makes its line breaks spaces (one article)
+    '''
+    text = text.lower()
+    if mode == 'clean':
+        text = text.translate(_unicode_spaces)
+    if article:
+        text = text.replace('\n', ' ').replace('\r', ' ')
+    else:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text.encode('ascii', 'replace')
+
+
+def split_tokens(data, mode):
+    '''
+    the tokens of prepared bytes, b'|' at every article end
+    '''
+    return data.translate(translate_tables[mode]).replace(b'|', b' | ').split()
+
+
+def kept(token, mode):
+    '''
+    whether a token of split_tokens is a word of the mode
+    '''
+    if mode == 'newsroom':
+        return len(token) > 2 and token.decode('ascii') not in corpus_stream.stopwords
+    return len(token) < 20 and b'?' not in token
+
+
+class Vocabulary(object):
+    '''
+    word <-> id with counts per year, ids in order of first appearance
+    '''
+    def __init__(self, mode):
+        self.mode = mode
+        # every distinct token is numbered, the article end first; numbers map to word ids or -1
+        self.tokens = collections.defaultdict()
+        self.tokens.default_factory = self.tokens.__len__
+        self.tokens[b'|']
+        self.lookup = np.full(1, -1, dtype=np.int32)
+        self._words = []
+        self.counts = {}
+
+    def __len__(self):
+        return len(self._words)
+
+    def words(self):
+        return list(self._words)
+
+    def _extend_lookup(self):
+        new = itertools.islice(self.tokens, len(self.lookup), None)
+        extension = np.full(len(self.tokens) - len(self.lookup), -1, dtype=np.int32)
+        for en, token in enumerate(new):
+            if kept(token, self.mode):
+                extension[en] = len(self._words)
+                self._words.append(token.decode('ascii'))
+        self.lookup = np.concatenate([self.lookup, extension])
+
+    def encode(self, data, year=None):
+        '''
+        (token ids, tokens per article) of prepared bytes with articles ending in '\\n', empty articles left out
+        '''
+        tokens = split_tokens(data, self.mode)
+        if not data.endswith(b'\n'):
+            tokens.append(b'|')
+        numbers = np.fromiter(map(self.tokens.__getitem__, tokens), dtype=np.int32, count=len(tokens))
+        if len(self.tokens) > len(self.lookup):
+            self._extend_lookup()
+        ids = self.lookup[numbers]
+        ends = numbers == 0
+        ids, ends = ids[(ids >= 0) | ends], ends[(ids >= 0) | ends]
+        lengths = np.diff(np.concatenate([[-1], np.flatnonzero(ends)])) - 1
+        ids = ids[~ends]
+        if year is not None:
+            self.add_counts(year, ids)
+        return ids, lengths[lengths > 0].astype(np.int32)
+
+    def add_counts(self, year, ids):
+        counts = np.bincount(ids, minlength=len(self)).astype(np.int64)
+        previous = self.counts.get(year, np.zeros(0, dtype=np.int64))
+        counts[:len(previous)] += previous
+        self.counts[year] = counts
+
+    def total_counts(self):
+        total = np.zeros(len(self), dtype=np.int64)
+        for counts in self.counts.values():
+            total[:len(counts)] += counts
+        return total
+
+
+def tokenize(text, mode='newsroom'):
+    '''
+    the tokens of one article as strings, the bytes path on a single text
+    '''
+    return [t.decode('ascii') for t in split_tokens(prepare(text, mode, article=True), mode) if kept(t, mode)]
+
+
+class IdShardWriter(object):
+    '''
+    appends the token ids and article lengths of one year to numbered shards of about max_tokens ids
+    '''
+    def __init__(self, folder, max_tokens):
+        self.folder = folder
+        self.max_tokens = max_tokens
+        self.shards = []
+        self.articles = 0
+        self.tokens = 0
+        self._files = None
+        self._shard_tokens = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self):
+        return os.path.join(self.folder, 'shard_{:05d}'.format(len(self.shards)))
+
+    def write(self, ids, lengths):
+        if len(lengths) == 0:
+            return
+        if self._files is None:
+            self._files = (open(self._path() + '.int32.tmp', 'wb'), open(self._path() + '.lengths.int32.tmp', 'wb'))
+        self._files[0].write(ids.astype(np.int32).tobytes())
+        self._files[1].write(lengths.astype(np.int32).tobytes())
+        self._shard_tokens += len(ids)
+        self.articles += len(lengths)
+        self.tokens += len(ids)
+        if self._shard_tokens >= self.max_tokens:
+            self.close()
+
+    def close(self):
+        if self._files is not None:
+            for f in self._files:
+                f.close()
+            for suffix in ['.int32', '.lengths.int32']:
+                os.replace(self._path() + suffix + '.tmp', self._path() + suffix)
+            self.shards.append(os.path.basename(self._path()))
+            self._files = None
+            self._shard_tokens = 0
+
+
+def iter_text_pieces(path, mode, size=chunk_bytes):
+    '''
+    prepared bytes of a text file in pieces of whole lines of about size bytes
+    '''
+    carry = b''
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                break
+            chunk = carry + chunk
+            cut = chunk.rfind(b'\n') + 1
+            carry = chunk[cut:]
+            if cut > 0:
+                yield prepare(chunk[:cut].decode('utf-8', errors='ignore'), mode)
+    if carry:
+        yield prepare(carry.decode('utf-8', errors='ignore'), mode)
+
+
+def iter_newsroom_pieces(path, mode, years=None, size=chunk_bytes):
+    '''
+    (year, prepared bytes) of the Newsroom articles, articles of a year batched into pieces
+    '''
+    pending, sizes = {}, collections.Counter()
+    for year, text in corpus_stream.iter_articles(path, years):
+        data = prepare(text, mode, article=True) + b'\n'
+        pending.setdefault(year, []).append(data)
+        sizes[year] += len(data)
+        if sizes[year] >= size:
+            yield year, b''.join(pending.pop(year))
+            del sizes[year]
+    for year, batch in pending.items():
+        yield year, b''.join(batch)
+
+
+def write_id_shards(pieces, output, mode, max_tokens=shard_tokens, source=None):
+    '''
+    tokenizes (year, bytes) pieces into shards under output (replacing earlier shards there), returns the manifest
+    '''
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    os.makedirs(output)
+    vocab = Vocabulary(mode)
+    writers = {}
+    try:
+        for year, data in pieces:
+            ids, lengths = vocab.encode(data, year)
+            if year not in writers:
+                writers[year] = IdShardWriter(os.path.join(output, str(year)), max_tokens)
+            writers[year].write(ids, lengths)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    words = vocab.words()
+    for year, counts in vocab.counts.items():
+        np.save(os.path.join(output, str(year), 'counts.npy'), np.concatenate([counts, np.zeros(len(words) - len(counts), dtype=np.int64)]))
+    with open(os.path.join(output, 'vocab.txt'), 'w', encoding='utf-8') as f:
+        for word, count in zip(words, vocab.total_counts()):
+            f.write('{} {}\n'.format(word, count))
+    manifest = {'source': source, 'mode': mode, 'words': len(words),
+                'years': {str(year): {'articles': w.articles, 'tokens': w.tokens, 'shards': w.shards}
+                          for year, w in sorted(writers.items())}}
+    with open(os.path.join(output, manifest_name + '.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(os.path.join(output, manifest_name + '.tmp'), os.path.join(output, manifest_name))
+    return manifest
+
+
+def tokenize_newsroom(path, output, years=None, mode='newsroom', max_tokens=shard_tokens):
+    if years is None: years = range(corpus_stream.first_year, corpus_stream.last_year + 1)
+    return write_id_shards(iter_newsroom_pieces(path, mode, set(years)), output, mode, max_tokens, os.path.abspath(path))
+
+
+def tokenize_year_files(folder, output, mode='clean', max_tokens=shard_tokens):
+    '''
+    the <year>.txt files of folder (create_yrly_datasets' databyyr layout)
+    '''
+    files = sorted((int(os.path.basename(f)[:-4]), f) for f in glob.glob(os.path.join(folder, '*.txt'))
+                   if os.path.basename(f)[:-4].isdigit())
+    pieces = ((year, piece) for year, f in files for piece in iter_text_pieces(f, mode))
+    return write_id_shards(pieces, output, mode, max_tokens, os.path.abspath(folder))
+
+
+def load_manifest(output):
+    with open(os.path.join(output, manifest_name), 'r') as f:
+        return json.load(f)
+
+
+def load_vocab(output):
+    '''
+    (words in id order, total counts)
+    '''
+    words, counts = [], []
+    with open(os.path.join(output, 'vocab.txt'), 'r', encoding='utf-8') as f:
+        for line in f:
+            word, count = line.split()
+            words.append(word)
+            counts.append(int(count))
+    return words, np.array(counts, dtype=np.int64)
+
+
+def year_counts(output, year):
+    return np.load(os.path.join(output, str(year), 'counts.npy'))
+
+
+def iter_id_articles(output, year, manifest=None):
+    '''
+    int32 token ids per article of one year, views of the memory-mapped shards
+    '''
+    if manifest is None: manifest = load_manifest(output)
+    entry = manifest['years'].get(str(year))
+    if entry is None:
+        return
+    for shard in entry['shards']:
+        path = os.path.join(output, str(year), shard)
+        ids = np.memmap(path + '.int32', dtype=np.int32, mode='r')
+        lengths = np.fromfile(path + '.lengths.int32', dtype=np.int32)
+        starts = np.concatenate([[0], np.cumsum(lengths)])
+        for en in range(len(lengths)):
+            yield ids[starts[en]:starts[en + 1]]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--newsroom', default='../output/plots/extend_figure/data/newsroom_test.jsonl',
+                        help='Newsroom jsonl file (.jsonl or .jsonl.gz)')
+    source.add_argument('--year-files', help='folder of <year>.txt files, one article per line (COHA, NYT)')
+    parser.add_argument('--output', default='../output/newsroom/ids')
+    parser.add_argument('--mode', choices=modes, help='newsroom for --newsroom, clean for --year-files by default')
+    parser.add_argument('--shard-tokens', type=int, default=shard_tokens)
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'corpus_tokenizer')
+
+    with profiling.phase('tokenize', {'input': os.path.basename(args.year_files or args.newsroom)}):
+        if args.year_files is not None:
+            manifest = tokenize_year_files(args.year_files, args.output, args.mode or 'clean', args.shard_tokens)
+        else:
+            manifest = tokenize_newsroom(args.newsroom, args.output, mode=args.mode or 'newsroom', max_tokens=args.shard_tokens)
+    print(manifest['words'], 'words')
+    for year, entry in sorted(manifest['years'].items()):
+        print(year, '→', entry['articles'], 'articles,', entry['tokens'], 'tokens,', len(entry['shards']), 'shards')
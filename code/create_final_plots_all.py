@@ -4,145 +4,195 @@
 Python 3 compatible version of create_final_plots_all.py
 """
 
-import latexify
 import numpy as np
 import csv
-import pandas as pd
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import seaborn as sns
 import random
 import ast
 import sys
-import pylab
 from utilities import *
-from statsmodels.formula.api import ols
-from statsmodels.iolib.summary2 import summary_col
-import statsmodels.api as sm
-from scipy.stats import kendalltau
-import copy
-import scipy
-from scipy.stats.stats import pearsonr
+# plot_creation imports matplotlib, seaborn, pandas and scipy.stats lazily (see lazy_modules.py)
 from plot_creation import *
+from instrumentation import timer, merge_records, write_report
+import profiling
+import argparse
+import contextlib
+import io
+import multiprocessing
+import plot_cache
+import ols_engine
+import regression_store
 
 pretty_axis_labels = {'male_pairs': 'Men', 'female_pairs': 'Women', 'names_asian': 'Asian', 'names_white': 'White', 'names_hispanic': 'Hispanic'}
 
-def main(filenametodo='../output/run_results/finalrun.csv'):
-    plots_folder = '../output/plots/'
-    set_plots_folder(plots_folder)
-
+# decoded finalrun rows, set once per process; jobs only carry the label and look the row up here
+_rows = {}
+# pool workers keep each job's printed tables to themselves, the parent prints them in job order
+_capture = False
+
+def init_worker(rows, profile_mode, render='publication', check_regressions=False, capture=False):
+    global _rows, _capture
+    _rows = rows
+    _capture = capture
+    mpl.use('Agg')
+    set_render_profile(render)
+    ols_engine.set_cross_check(check_regressions)
+    profiling.enable(profile_mode, 'create_final_plots_all')
+
+def run_plot(job):
+    '''
+    runs one (folder, function, args) job with the row of args[0], returns its timing record, the
+    files it wrote and what it printed (None when not captured, it went to stdout)
+    '''
+    folder, func, args = job
+    out = io.StringIO() if _capture else None
+    with contextlib.redirect_stdout(out) if _capture else contextlib.nullcontext():
+        print(func, args)
+        reset_written_outputs()
+        with timer(func.__name__, label=args[0]) as record:
+            func(_rows[args[0]], *args, folder=folder)
+    return record, list(written_outputs), None if out is None else out.getvalue()
+
+def run_plots(rows, jobs, n_jobs=1, profile_mode=None, force=False, render='publication', check_regressions=False):
+    '''
+    runs the jobs whose inputs changed since the last run (all of them with force), in order with
+    n_jobs=1, otherwise in a pool of n_jobs processes; the manifest records what ran and why
+    '''
+    missing = sorted(set(args[0] for _, _, args in jobs) - set(rows))
+    if missing:
+        raise KeyError('labels missing from the results file: {}'.format(missing))
+
+    manifest = plot_cache.load_manifest()
+    ids, digests, todo, reasons = plot_cache.plan(jobs, rows, manifest, force, render)
+    print('{} plot jobs, {} to rebuild, {} unchanged'.format(len(ids), len(todo), len(ids) - len(todo)))
+    outputs = {}
+    try:
+        if n_jobs == 1:
+            init_worker(rows, profile_mode, render, check_regressions)
+            for job in todo:
+                outputs[plot_cache.job_id(job)] = run_plot(job)[1]
+        else:
+            # fork shares the decoded rows with the workers without pickling them
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            with ctx.Pool(n_jobs, initializer=init_worker, initargs=(rows, profile_mode, render, check_regressions, True)) as pool:
+                for job, (record, written, text) in zip(todo, pool.imap(run_plot, todo, chunksize=1)):
+                    sys.stdout.write(text)
+                    merge_records([record])
+                    outputs[plot_cache.job_id(job)] = written
+    finally:
+        plot_cache.write_manifest(plot_cache.update_manifest(manifest, ids, digests, reasons, outputs))
+
+def main(filenametodo='../output/run_results/finalrun.csv', n_jobs=1, profile_mode=None, force=False, render='publication', check_regressions=False):
     rows = load_file(filenametodo)
 
     print(rows.keys())
 
     plots_to_do_gender_static = [
-        [scatter_occupation_percents_distances, [rows['google'], 'google', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_percent, [-.15, .15], [-100, 100], False, False, 'norm', 'png']],
-        [scatter_occupation_percents_distances, [rows['google'], 'google', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_logitprop, [-.15, .15], [-5, 3], False, False, 'norm', 'pdf']],
-        [residual_analysis_with_stereotypes, [rows['google'], 'google', 'occupations1950', 'male_pairs', 'female_pairs', '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_percent, '../data/word_lists/mturk_stereotypes.csv', load_mturkstereotype_data, 'norm', 'pdf']],
+        [scatter_occupation_percents_distances, ['google', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_percent, [-.15, .15], [-100, 100], False, False, 'norm', 'png']],
+        [scatter_occupation_percents_distances, ['google', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_logitprop, [-.15, .15], [-5, 3], False, False, 'norm', 'pdf']],
+        [residual_analysis_with_stereotypes, ['google', 'occupations1950', 'male_pairs', 'female_pairs', '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_percent, '../data/word_lists/mturk_stereotypes.csv', load_mturkstereotype_data, 'norm', 'pdf']],
     ]
 
     plots_to_do_gender_dynamic = [
-        [plot_overtime_scatter, [rows['sgns'], 'sgns', 'occupations1950', 'male_pairs', 'female_pairs', '../data/word_lists/occupation_percentages_gender_occ1950.csv', occupation_func_female_percent, None, None, False, None, None]],
-        [plot_overtime_scatter, [rows['svd'], 'svd', 'occupations1950', 'male_pairs', 'female_pairs', '../data/word_lists/occupation_percentages_gender_occ1950.csv', occupation_func_female_percent, None, None, False, None, None]],
-
-        [plot_averagebias_over_time_consistentoccupations, [rows['sgns'], 'sgns', 'occupations1950', 'male_pairs', 'female_pairs', True, '../data/word_lists/occupation_percentages_gender_occ1950.csv', occupation_func_female_logitprop, 0, False, '', None, None, False]],
-        [plot_averagebias_over_time_consistentoccupations, [rows['sgns'], 'sgns', 'occupations1950', 'male_pairs', 'female_pairs', True, '../data/word_lists/occupation_percentages_gender_occ1950.csv', occupation_func_female_percent, 0, False, '', None, None, False]],
-        [plot_averagebias_over_time_consistentoccupations, [rows['svd'], 'svd', 'occupations1950', 'male_pairs', 'female_pairs', True, '../data/word_lists/occupation_percentages_gender_occ1950.csv', occupation_func_female_percent, 0, False, '', None, None, False]],
-        [create_cross_time_correlation_heatmap_differencestoself, [rows['sgns'], 'sgns', 'personalitytraits_original', 'male_pairs', 'female_pairs', None, 'pdf']],
-        [create_cross_time_correlation_heatmap_differencestoself, [rows['svd'], 'svd', 'personalitytraits_original', 'male_pairs', 'female_pairs', None, 'pdf']],
-        [create_cross_time_correlation_heatmap_differencestoself, [rows['sgns'], 'sgns', 'occupations1950', 'male_pairs', 'female_pairs', None, 'pdf']],
-        [create_cross_time_correlation_heatmap_differencestoself, [rows['svd'], 'svd', 'occupations1950', 'male_pairs', 'female_pairs', None, 'pdf']],
+        [plot_overtime_scatter, ['sgns', 'occupations1950', 'male_pairs', 'female_pairs', '../data/word_lists/occupation_percentages_gender_occ1950.csv', occupation_func_female_percent, None, None, False, None, None, 10]],
+        [plot_overtime_scatter, ['svd', 'occupations1950', 'male_pairs', 'female_pairs', '../data/word_lists/occupation_percentages_gender_occ1950.csv', occupation_func_female_percent, None, None, False, None, None, 10]],
+
+        [plot_averagebias_over_time_consistentoccupations, ['sgns', 'occupations1950', 'male_pairs', 'female_pairs', True, '../data/word_lists/occupation_percentages_gender_occ1950.csv', occupation_func_female_logitprop, 0, False, '', None, None, False]],
+        [plot_averagebias_over_time_consistentoccupations, ['sgns', 'occupations1950', 'male_pairs', 'female_pairs', True, '../data/word_lists/occupation_percentages_gender_occ1950.csv', occupation_func_female_percent, 0, False, '', None, None, False]],
+        [plot_averagebias_over_time_consistentoccupations, ['svd', 'occupations1950', 'male_pairs', 'female_pairs', True, '../data/word_lists/occupation_percentages_gender_occ1950.csv', occupation_func_female_percent, 0, False, '', None, None, False]],
+        [create_cross_time_correlation_heatmap_differencestoself, ['sgns', 'personalitytraits_original', 'male_pairs', 'female_pairs', None, 'pdf']],
+        [create_cross_time_correlation_heatmap_differencestoself, ['svd', 'personalitytraits_original', 'male_pairs', 'female_pairs', None, 'pdf']],
+        [create_cross_time_correlation_heatmap_differencestoself, ['sgns', 'occupations1950', 'male_pairs', 'female_pairs', None, 'pdf']],
+        [create_cross_time_correlation_heatmap_differencestoself, ['svd', 'occupations1950', 'male_pairs', 'female_pairs', None, 'pdf']],
     ]
 
     plots_to_do_race_dynamic = [
-        [create_cross_time_correlation_heatmap_differencestoself, [rows['sgns'], 'sgns', 'personalitytraits_original', 'names_white', 'names_hispanic', None, 'pdf']],
-        [create_cross_time_correlation_heatmap_differencestoself, [rows['sgns'], 'sgns', 'personalitytraits_original', 'names_white', 'names_asian']],
-        [create_cross_time_correlation_heatmap_differencestoself, [rows['sgns'], 'sgns', 'personalitytraits_original', 'names_white', 'names_russian']],
-        [plot_averagebias_over_time_consistentoccupations, [rows['sgns'], 'sgns', 'occupations1950', 'names_white', 'names_asian', True, '../data/word_lists/occupation_percentages_race_occ1950.csv', occupation_func_whiteasian_logitprop, 0, False, '', None, None, False]],
-        [plot_averagebias_over_time_consistentoccupations, [rows['sgns'], 'sgns', 'occupations1950', 'names_white', 'names_asian', True, '../data/word_lists/occupation_percentages_race_occ1950.csv', occupation_func_whiteasian_percent, 0, False, '', None, None, False]],
-        [plot_averagebias_over_time_consistentoccupations, [rows['sgns'], 'sgns', 'occupations1950', 'names_white', 'names_hispanic', True, '../data/word_lists/occupation_percentages_race_occ1950.csv', occupation_func_whitehispanic_logitprop, 0, False, '', None, None, False]],
-        [plot_averagebias_over_time_consistentoccupations, [rows['sgns'], 'sgns', 'occupations1950', 'names_white', 'names_hispanic', True, '../data/word_lists/occupation_percentages_race_occ1950.csv', occupation_func_whitehispanic_percent, 0, False, '', None, None, False]],
-    #   [plot_averagebias_over_time_consistentoccupations, [rows['nyt'], 'nyt', 'words_terrorism', 'words_christianity', 'words_islam', False, None, None, 0, False, '', None, None, False, '', None, 1]],
-        [plot_averagebias_over_time_consistentoccupations, [rows['sgns'], 'sgns', 'adjectives_otherization', 'names_white', 'names_asian', False]],
+        [create_cross_time_correlation_heatmap_differencestoself, ['sgns', 'personalitytraits_original', 'names_white', 'names_hispanic', None, 'pdf']],
+        [create_cross_time_correlation_heatmap_differencestoself, ['sgns', 'personalitytraits_original', 'names_white', 'names_asian']],
+        [create_cross_time_correlation_heatmap_differencestoself, ['sgns', 'personalitytraits_original', 'names_white', 'names_russian']],
+        [plot_averagebias_over_time_consistentoccupations, ['sgns', 'occupations1950', 'names_white', 'names_asian', True, '../data/word_lists/occupation_percentages_race_occ1950.csv', occupation_func_whiteasian_logitprop, 0, False, '', None, None, False]],
+        [plot_averagebias_over_time_consistentoccupations, ['sgns', 'occupations1950', 'names_white', 'names_asian', True, '../data/word_lists/occupation_percentages_race_occ1950.csv', occupation_func_whiteasian_percent, 0, False, '', None, None, False]],
+        [plot_averagebias_over_time_consistentoccupations, ['sgns', 'occupations1950', 'names_white', 'names_hispanic', True, '../data/word_lists/occupation_percentages_race_occ1950.csv', occupation_func_whitehispanic_logitprop, 0, False, '', None, None, False]],
+        [plot_averagebias_over_time_consistentoccupations, ['sgns', 'occupations1950', 'names_white', 'names_hispanic', True, '../data/word_lists/occupation_percentages_race_occ1950.csv', occupation_func_whitehispanic_percent, 0, False, '', None, None, False]],
+    #   [plot_averagebias_over_time_consistentoccupations, ['nyt', 'words_terrorism', 'words_christianity', 'words_islam', False, None, None, 0, False, '', None, None, False, '', None, 1]],
+        [plot_averagebias_over_time_consistentoccupations, ['sgns', 'adjectives_otherization', 'names_white', 'names_asian', False]],
+
+    ]
 
+    # the Newsroom windows replace the NYT series of the original paper; only plotted once changes_over_time has run on them
+    plots_to_do_newsroom = [
+        [plot_averagebias_over_time_consistentoccupations, ['newsroom', 'words_terrorism', 'words_christianity', 'words_islam', False]],
     ]
 
     plots_to_do_appendix_general = [
-        [plot_mean_counts_together, [rows['sgns'], 'sgns', ['names_chinese', 'names_white', 'names_asian', 'names_hispanic', 'names_russian', 'male_pairs', 'female_pairs'], 'groups']],
-        [plot_vector_variances_together, [rows['sgns'], 'sgns', ['names_chinese', 'names_white', 'names_asian', 'names_hispanic', 'names_russian', 'male_pairs', 'female_pairs'], 'groups']],
-        [plot_mean_counts_together, [rows['sgns'], 'sgns', ['adjectives_princeton', 'adjectives_otherization', 'personalitytraits_original', 'occupations1950', 'adjectives_williamsbest', 'adjectives_appearance', 'adjectives_intelligencegeneral'], 'neutrals']],
-        [plot_vector_variances_together, [rows['sgns'], 'sgns', ['adjectives_princeton', 'adjectives_otherization', 'personalitytraits_original', 'occupations1950', 'adjectives_williamsbest', 'adjectives_appearance', 'adjectives_intelligencegeneral'], 'neutrals']],
+        [plot_mean_counts_together, ['sgns', ['names_chinese', 'names_white', 'names_asian', 'names_hispanic', 'names_russian', 'male_pairs', 'female_pairs'], 'groups']],
+        [plot_vector_variances_together, ['sgns', ['names_chinese', 'names_white', 'names_asian', 'names_hispanic', 'names_russian', 'male_pairs', 'female_pairs'], 'groups']],
+        [plot_mean_counts_together, ['sgns', ['adjectives_princeton', 'adjectives_otherization', 'personalitytraits_original', 'occupations1950', 'adjectives_williamsbest', 'adjectives_appearance', 'adjectives_intelligencegeneral'], 'neutrals']],
+        [plot_vector_variances_together, ['sgns', ['adjectives_princeton', 'adjectives_otherization', 'personalitytraits_original', 'occupations1950', 'adjectives_williamsbest', 'adjectives_appearance', 'adjectives_intelligencegeneral'], 'neutrals']],
     ]
 
     plots_to_do_appendix_gender_static = [
-        [scatter_occupation_percents_distances, [rows['google'], 'google', 'occupations1950_professional', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_percent, [-.15, .15], [-100, 100], False, False, 'norm', 'pdf']],
-        [scatter_occupation_percents_distances, [rows['google'], 'google', 'occupations1950_professional', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_logitprop, [-.15, .15], [-5, 3], False, False, 'norm', 'pdf']],
-        [scatter_occupation_percents_distances, [rows['commoncrawlglove'], 'commoncrawlglove', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_percent, [-.07, .07], [-100, 100], False, False, 'norm', 'pdf']],
-        [scatter_occupation_percents_distances, [rows['commoncrawlglove'], 'commoncrawlglove', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_logitprop, [-.07, .07], [-5, 3], False, False, 'norm', 'pdf']],
-        [scatter_occupation_percents_distances, [rows['wikipedia'], 'wikipedia', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_percent, [-.07, .07], [-100, 100], False, False, 'norm', 'pdf']],
-        [scatter_occupation_percents_distances, [rows['wikipedia'], 'wikipedia', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_logitprop, [-.07, .07], [-5, 3], False, False, 'norm', 'pdf']],
+        [scatter_occupation_percents_distances, ['google', 'occupations1950_professional', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_percent, [-.15, .15], [-100, 100], False, False, 'norm', 'pdf']],
+        [scatter_occupation_percents_distances, ['google', 'occupations1950_professional', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_logitprop, [-.15, .15], [-5, 3], False, False, 'norm', 'pdf']],
+        [scatter_occupation_percents_distances, ['commoncrawlglove', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_percent, [-.07, .07], [-100, 100], False, False, 'norm', 'pdf']],
+        [scatter_occupation_percents_distances, ['commoncrawlglove', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_logitprop, [-.07, .07], [-5, 3], False, False, 'norm', 'pdf']],
+        [scatter_occupation_percents_distances, ['wikipedia', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_percent, [-.07, .07], [-100, 100], False, False, 'norm', 'pdf']],
+        [scatter_occupation_percents_distances, ['wikipedia', 'occupations1950', 'male_pairs', 'female_pairs', -1, '../data/word_lists/occupation_percentages_gender_occ1950.csv', load_occupationpercent_data, occupation_func_female_logitprop, [-.07, .07], [-5, 3], False, False, 'norm', 'pdf']],
         #
-        [scatter_occupation_percents_distances, [rows['sgns'], 'sgns', 'adjectives_williamsbest', 'male_pairs', 'female_pairs', -1, '../data/word_lists/adjectives_williamsbest.csv', load_williamsbestadjectives, occupation_func_williamsbestadject, None, [-500, 500], True, False, 'norm']],
-        [scatter_occupation_percents_distances, [rows['sgns'], 'sgns', 'adjectives_williamsbest', 'male_pairs', 'female_pairs', -3, '../data/word_lists/adjectives_williamsbest.csv', load_williamsbestadjectives, occupation_func_williamsbestadject, None, [-500, 500], True, False, 'norm']],
+        [scatter_occupation_percents_distances, ['sgns', 'adjectives_williamsbest', 'male_pairs', 'female_pairs', -1, '../data/word_lists/adjectives_williamsbest.csv', load_williamsbestadjectives, occupation_func_williamsbestadject, None, [-500, 500], True, False, 'norm']],
+        [scatter_occupation_percents_distances, ['sgns', 'adjectives_williamsbest', 'male_pairs', 'female_pairs', -3, '../data/word_lists/adjectives_williamsbest.csv', load_williamsbestadjectives, occupation_func_williamsbestadject, None, [-500, 500], True, False, 'norm']],
         #
-        [scatter_occupation_percents_distances, [rows['svd'], 'svd', 'adjectives_williamsbest', 'male_pairs', 'female_pairs', -1, '../data/word_lists/adjectives_williamsbest.csv', load_williamsbestadjectives, occupation_func_williamsbestadject, None, [-500, 500], True, False, 'norm']],
-        [scatter_occupation_percents_distances, [rows['svd'], 'svd', 'adjectives_williamsbest', 'male_pairs', 'female_pairs', -3, '../data/word_lists/adjectives_williamsbest.csv', load_williamsbestadjectives, occupation_func_williamsbestadject, None, [-500, 500], True, False, 'norm']],
+        [scatter_occupation_percents_distances, ['svd', 'adjectives_williamsbest', 'male_pairs', 'female_pairs', -1, '../data/word_lists/adjectives_williamsbest.csv', load_williamsbestadjectives, occupation_func_williamsbestadject, None, [-500, 500], True, False, 'norm']],
+        [scatter_occupation_percents_distances, ['svd', 'adjectives_williamsbest', 'male_pairs', 'female_pairs', -3, '../data/word_lists/adjectives_williamsbest.csv', load_williamsbestadjectives, occupation_func_williamsbestadject, None, [-500, 500], True, False, 'norm']],
     ]
 
     plots_to_do_appendix_raceasian_static = [
-        [princeton_trilogy_plots, [rows['sgns'], 'sgns', 'names_white', 'names_chinese', 'chinese']],
-        [scatter_occupation_percents_distances, [rows['google'], 'google', 'occupations1950', 'names_white', 'names_asian', -1, '../data/word_lists/occupation_percentages_race_occ1950.csv', load_occupationpercent_data, occupation_func_whiteasian_logitprop, None, None, False, False, 'norm', 'pdf']],
-        [scatter_occupation_percents_distances, [rows['google'], 'google', 'occupations1950', 'names_white', 'names_asian', -1, '../data/word_lists/occupation_percentages_race_occ1950.csv', load_occupationpercent_data, occupation_func_whiteasian_percent, None, None, False, False, 'norm', 'pdf']],
+        [princeton_trilogy_plots, ['sgns', 'names_white', 'names_chinese', 'chinese']],
+        [scatter_occupation_percents_distances, ['google', 'occupations1950', 'names_white', 'names_asian', -1, '../data/word_lists/occupation_percentages_race_occ1950.csv', load_occupationpercent_data, occupation_func_whiteasian_logitprop, None, None, False, False, 'norm', 'pdf']],
+        [scatter_occupation_percents_distances, ['google', 'occupations1950', 'names_white', 'names_asian', -1, '../data/word_lists/occupation_percentages_race_occ1950.csv', load_occupationpercent_data, occupation_func_whiteasian_percent, None, None, False, False, 'norm', 'pdf']],
 
     ]
 
     plots_to_do_appendix_racehispanic_static = [
-        [scatter_occupation_percents_distances, [rows['google'], 'google', 'occupations1950', 'names_white', 'names_hispanic', -1, '../data/word_lists/occupation_percentages_race_occ1950.csv', load_occupationpercent_data, occupation_func_whitehispanic_logitprop, None, None, False, False, 'norm', 'pdf']],
-        [scatter_occupation_percents_distances, [rows['google'], 'google', 'occupations1950', 'names_white', 'names_hispanic', -1, '../data/word_lists/occupation_percentages_race_occ1950.csv', load_occupationpercent_data, occupation_func_whitehispanic_percent, None, None, False, False, 'norm', 'pdf']],
+        [scatter_occupation_percents_distances, ['google', 'occupations1950', 'names_white', 'names_hispanic', -1, '../data/word_lists/occupation_percentages_race_occ1950.csv', load_occupationpercent_data, occupation_func_whitehispanic_logitprop, None, None, False, False, 'norm', 'pdf']],
+        [scatter_occupation_percents_distances, ['google', 'occupations1950', 'names_white', 'names_hispanic', -1, '../data/word_lists/occupation_percentages_race_occ1950.csv', load_occupationpercent_data, occupation_func_whitehispanic_percent, None, None, False, False, 'norm', 'pdf']],
 
     ]
 
     plots_to_do_appendix_gender_dynamic = [
-        [do_over_time_trend_test, [rows['sgns'], 'sgns', 'adjectives_intelligencegeneral', 'male_pairs', 'female_pairs', False, '', range(1960, 2000, 10)]],
-        [do_over_time_trend_test, [rows['sgns'], 'sgns', 'adjectives_appearance', 'male_pairs', 'female_pairs', False, '', range(1960, 2000, 10)]],
+        [do_over_time_trend_test, ['sgns', 'adjectives_intelligencegeneral', 'male_pairs', 'female_pairs', False, '', range(1960, 2000, 10)]],
+        [do_over_time_trend_test, ['sgns', 'adjectives_appearance', 'male_pairs', 'female_pairs', False, '', range(1960, 2000, 10)]],
+    ]
+
+    groups = [
+        [plots_folder + 'gender/', plots_to_do_gender_static + plots_to_do_gender_dynamic],
+        [plots_folder + 'ethnicity/', plots_to_do_race_dynamic],
+        [plots_folder + 'appendix/', plots_to_do_appendix_general],
+        [plots_folder + 'appendix/' + 'gender/', plots_to_do_appendix_gender_static + plots_to_do_appendix_gender_dynamic],
+        [plots_folder + 'appendix/' + 'ethnicity/', plots_to_do_appendix_raceasian_static + plots_to_do_appendix_racehispanic_static],
     ]
+    if 'newsroom' in rows:
+        groups.append([plots_folder + 'ethnicity/', plots_to_do_newsroom])
+    jobs = [(folder, plot[0], plot[1]) for folder, plots in groups for plot in plots]
 
-    plots_to_do = []
-
-    set_plots_folder(plots_folder + 'gender/')
-
-    for plot in plots_to_do_gender_static:
-        print(plot[0], plot[1][1:])
-        plot[0](*plot[1])
-    for plot in plots_to_do_gender_dynamic:
-        print(plot[0], plot[1][1:])
-        plot[0](*plot[1])
-
-    set_plots_folder(plots_folder + 'ethnicity/')
-    for plot in plots_to_do_race_dynamic:
-        print(plot[0], plot[1][1:])
-        plot[0](*plot[1])
-
-    set_plots_folder(plots_folder + 'appendix/')
-    for plot in plots_to_do_appendix_general:
-        print(plot[0], plot[1][1:])
-        plot[0](*plot[1])
-
-    set_plots_folder(plots_folder + 'appendix/' + 'gender/')
-    for plot in plots_to_do_appendix_gender_static:
-        print(plot[0], plot[1][1:])
-        plot[0](*plot[1])
-    for plot in plots_to_do_appendix_gender_dynamic:
-        print(plot[0], plot[1][1:])
-        plot[0](*plot[1])
-    set_plots_folder(plots_folder + 'appendix/' + 'ethnicity/')
-    for plot in plots_to_do_appendix_raceasian_static:
-        print(plot[0], plot[1][1:])
-        plot[0](*plot[1])
-    for plot in plots_to_do_appendix_racehispanic_static:
-        print(plot[0], plot[1][1:])
-        plot[0](*plot[1])
+    run_plots(rows, jobs, n_jobs, profile_mode, force, render, check_regressions)
+    # the per-plot csvs in output/regressions are rewritten from the store so they follow every run
+    written = regression_store.export_csvs()
+    print('{} regression csvs written to {}'.format(len(written), regression_store.regressions_folder))
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=multiprocessing.cpu_count(), help='number of plot jobs run in parallel, 1 runs them in order in this process')
+    parser.add_argument('--render', choices=sorted(render_profiles), default='publication', help='draft renders at low dpi without regression confidence bands')
+    parser.add_argument('--check-regressions', action='store_true', help='refit every regression with statsmodels and stop if the results differ')
+    parser.add_argument('--force', action='store_true', help='rebuild every plot, also the ones whose inputs did not change')
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    n_jobs = args.jobs
+    if args.profile is not None and n_jobs != 1:
+        print('--profile runs the plot jobs one at a time so each profile covers a single job')
+        n_jobs = 1
+
+    main(n_jobs=max(1, n_jobs), profile_mode=args.profile, force=args.force, render=args.render, check_regressions=args.check_regressions)
+    write_report('create_final_plots_all')
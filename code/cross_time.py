@@ -0,0 +1,106 @@
+'''
+Decade x decade correlation matrices of word biases and the phase-shift test on them.
+
+correlation_matrix(values, method) takes a (words x decades) array without missing values (the
+complete rows of a bias frame) and returns the correlation of every pair of decade columns and
+its p-value in one go:
+    pearson:  np.corrcoef, p-value from the t distribution with n-2 dof (what scipy's pearsonr gives)
+    spearman: pearson on the column ranks, same p-value as scipy's spearmanr
+    kendall:  tau-b from the sign matrix of all word pairs, asymptotic normal p-value with tie
+              correction (scipy's kendalltau uses the exact distribution for n <= 33 without ties)
+With n = 2 words the p-values are those of scipy as well: 1 for pearson and kendall (two points
+always agree perfectly), NaN for spearman.
+phase_shift_ks_pvalues(heatmap) runs the KS test of every year's adjacent-correlation changes
+against all other years' in one batched scipy call.
+'''
+import numpy as np
+from lazy_modules import lazy_module
+
+stats = lazy_module('scipy.stats')
+
+methods = ['pearson', 'spearman', 'kendall']
+
+
+def _t_pvalues(r, n):
+    if n == 2:
+        # as pearsonr: two points always lie on a line, so the correlation says nothing
+        return np.ones_like(r)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = r * np.sqrt((n - 2) / ((1.0 - r) * (1.0 + r)))
+    p = 2 * stats.t.sf(np.abs(t), n - 2)
+    # perfect correlations (e.g. the diagonal) have p = 0 as in scipy
+    p[np.abs(r) >= 1] = 0.0
+    return p
+
+
+def pearson_matrix(values):
+    values = np.asarray(values, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.clip(np.corrcoef(values, rowvar=False), -1, 1)
+    return r, _t_pvalues(r, values.shape[0])
+
+
+def spearman_matrix(values):
+    rho, p = pearson_matrix(stats.rankdata(np.asarray(values, dtype=float), axis=0))
+    if np.shape(values)[0] == 2:
+        # spearmanr gives no p-value for two points
+        p = np.full_like(rho, np.nan)
+    return rho, p
+
+
+def _tie_sums(column):
+    counts = np.unique(column, return_counts=True)[1].astype(float)
+    counts = counts[counts > 1]
+    return (np.sum(counts * (counts - 1) / 2), np.sum(counts * (counts - 1) * (counts - 2)),
+            np.sum(counts * (counts - 1) * (2 * counts + 5)))
+
+
+def kendall_matrix(values):
+    values = np.asarray(values, dtype=float)
+    n, k = values.shape
+    # S[a, b] = sum over word pairs i<j of sign(v_ja - v_ia) * sign(v_jb - v_ib)
+    S = np.zeros((k, k))
+    for i in range(n - 1):
+        signs = np.sign(values[i + 1:] - values[i])
+        S += signs.T.dot(signs)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tau = np.clip(S / np.sqrt(np.outer(np.diag(S), np.diag(S))), -1, 1)
+
+    if n == 2:
+        # as kendalltau (exact for n = 2): one pair of words, p = 1
+        return tau, np.ones_like(tau)
+    ties = np.array([_tie_sums(values[:, c]) for c in range(k)])
+    m = n * (n - 1.0)
+    var = ((m * (2 * n + 5) - ties[:, 2][:, None] - ties[:, 2][None, :]) / 18.0
+           + 2 * np.outer(ties[:, 0], ties[:, 0]) / m
+           + np.outer(ties[:, 1], ties[:, 1]) / (9 * m * (n - 2)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = S / np.sqrt(var)
+    p = 2 * stats.norm.sf(np.abs(z))
+    p[np.abs(tau) >= 1] = 0.0
+    return tau, p
+
+
+def correlation_matrix(values, method='pearson'):
+    '''
+    (decades x decades correlations, p-values) of the columns of a complete (words x decades) array
+    '''
+    if method == 'pearson':
+        return pearson_matrix(values)
+    if method == 'spearman':
+        return spearman_matrix(values)
+    if method == 'kendall':
+        return kendall_matrix(values)
+    raise ValueError('unknown correlation method: {}'.format(method))
+
+
+def phase_shift_ks_pvalues(heatmap):
+    '''
+    for every year i: KS test of |heatmap[i+1] - heatmap[i]| against the same changes of all other
+    years, returns one p-value per year transition
+    '''
+    adjacent = np.abs(np.diff(np.asarray(heatmap, dtype=float), axis=0))
+    if len(adjacent) < 2:
+        return np.array([np.nan] * len(adjacent))
+    others = np.array([np.delete(adjacent, i, axis=0).ravel() for i in range(len(adjacent))])
+    return stats.ks_2samp(adjacent, others, axis=1).pvalue
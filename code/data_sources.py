@@ -0,0 +1,94 @@
+'''
+Registry of the embedding time series the analysis runs on: per label its years and the vector
+file of every year, in place of changes_over_time's filename_map and the substring matching of
+utilities.get_years (where any label containing 'svd', e.g. newsroom_svd, got the HistWords
+decades).
+
+    data_sources.get_years('newsroom')      [1999, ..., 2015]
+    data_sources.filenames('sgns')          what changes_over_time.main takes
+
+The HistWords decades (sgns, svd), the static embeddings (google, wikipedia, commoncrawlglove),
+the original NYT windows and the Newsroom windows (train_windows, ppmi_svd and merge_windows
+under their default labels) are registered here; register adds others. A label that is not
+registered is looked up in the vector store: its years are those of the vectors_<label><year>.txt
+files there, so any series written with embedding_io is usable by its label alone.
+'''
+import os
+import re
+
+import embedding_io
+
+folder = embedding_io.folder
+
+
+class DataSource(object):
+    def __init__(self, label, years, filenames, description=''):
+        self.label = label
+        self.years = years
+        self.filenames = filenames
+        self.description = description
+
+    def available(self):
+        return all(os.path.exists(f) for f in self.filenames)
+
+
+sources = {}
+
+
+def register(label, years, filenames=None, description=''):
+    '''
+    registers a series, by default with the store's vectors_<label><year>.txt files
+    '''
+    years = list(years)
+    if filenames is None:
+        filenames = embedding_io.filenames(label, years, folder)
+    if len(filenames) != len(years):
+        raise ValueError('{}: {} years but {} files'.format(label, len(years), len(filenames)))
+    sources[label] = DataSource(label, years, list(filenames), description)
+    return sources[label]
+
+
+def discover(label, folder=folder):
+    '''
+    the years of the store's vectors_<label><year>.txt files
+    '''
+    if not os.path.isdir(folder):
+        return []
+    pattern = re.compile(re.escape('vectors_' + label) + r'(\d{4})\.txt$')
+    return sorted(int(m.group(1)) for m in (pattern.match(f) for f in os.listdir(folder)) if m)
+
+
+def get(label):
+    '''
+    the DataSource of label, None if it is neither registered nor in the store
+    '''
+    if label not in sources:
+        years = discover(label)
+        if not years:
+            return None
+        register(label, years, description='found in the vector store')
+    return sources[label]
+
+
+def get_years(label):
+    source = get(label)
+    return None if source is None else source.years
+
+
+def filenames(label):
+    source = get(label)
+    if source is None:
+        raise KeyError('unknown data source: {}'.format(label))
+    return source.filenames
+
+
+register('sgns', range(1910, 2000, 10), description='HistWords SGNS, COHA/eng-all decades')
+register('svd', range(1910, 2000, 10), description='HistWords SVD, COHA/eng-all decades')
+register('google', [2015], [folder + 'vectorsGoogleNews_exactclean.txt'], 'word2vec Google News')
+register('wikipedia', [2015], [folder + 'vectorswikipedia.txt'], 'GloVe Wikipedia + Gigaword')
+register('commoncrawlglove', [2015], [folder + 'vectorscommoncrawlglove.txt'], 'GloVe Common Crawl 42B')
+register('nyt', range(1987, 2005), [folder + 'vectorsnyt{}-{}.txt'.format(x, x + 3) for x in range(1987, 2005)],
+         'original NYT windows (not distributed)')
+register('newsroom', range(1999, 2016), description='Newsroom 3-year windows, train_windows.py --label newsroom')
+register('newsroom_svd', range(1999, 2016), description='Newsroom 3-year windows, ppmi_svd.py')
+register('newsroom_merged', range(2000, 2015), description='Newsroom windows averaged by merge_windows.py')
@@ -0,0 +1,115 @@
+'''
+Vectorized drop-in for changes_over_time.single_set_distances_to_single_set.
+
+The legacy code walks every (target word, other word) pair in python and converts both vectors
+from lists for every pair and decade. Here each decade's target and other words are gathered into
+two matrices once and all pairwise euclidean distances and cosine similarities come out of a few
+array operations. The word filtering (vocab count limits, words missing from the vectors or the
+vocab) reproduces the legacy rules exactly, including the quirk that a pair is not count-filtered
+when either word is absent from the vocab file. Numbers agree with the legacy path up to float
+summation order; verify_equivalence.py checks that.
+'''
+import numpy as np
+
+from instrumentation import add
+
+# rows of the (targets x others x dims) difference tensor computed at once
+chunk_elements = 2 ** 22
+
+
+def _gather(vectors, words):
+    present = np.array([w in vectors for w in words], dtype=bool)
+    matrix = np.array([vectors[w] for w in words if w in vectors], dtype=float)
+    return present, matrix
+
+
+def _in_limits(vocab, words, lims):
+    invocab = np.array([w in vocab for w in words], dtype=bool)
+    counts = np.array([vocab.get(w, np.nan) for w in words], dtype=float)
+    with np.errstate(invalid='ignore'):
+        inlims = invocab & ~(counts < lims[0]) & ~(counts > lims[1])
+    return invocab, inlims
+
+
+def _pairwise_norms(m1, m2):
+    out = np.empty((len(m1), len(m2)))
+    step = max(1, chunk_elements // max(1, len(m2) * m1.shape[1]))
+    for start in range(0, len(m1), step):
+        diff = m1[start:start + step, None, :] - m2[None, :, :]
+        out[start:start + step] = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+    return out
+
+
+def _pair_means(vectors, vocab, targetset, otherset, word1lims, word2lims):
+    present1, m1 = _gather(vectors, targetset)
+    present2, m2 = _gather(vectors, otherset)
+    if len(m1) == 0 or len(m2) == 0:
+        return np.nan, np.nan
+
+    if vocab is None:
+        mask = np.ones((len(m1), len(m2)), dtype=bool)
+    else:
+        invocab1, inlims1 = _in_limits(vocab, targetset, word1lims)
+        invocab2, inlims2 = _in_limits(vocab, otherset, word2lims)
+        invocab1, inlims1 = invocab1[present1], inlims1[present1]
+        invocab2, inlims2 = invocab2[present2], inlims2[present2]
+        # legacy: count limits only apply when both words are in the vocab file
+        mask = ~(invocab1[:, None] & invocab2[None, :]) | (inlims1[:, None] & inlims2[None, :])
+
+    dists = _pairwise_norms(m1, m2)
+    norms1 = np.sqrt(np.einsum('ij,ij->i', m1, m1))
+    norms2 = np.sqrt(np.einsum('ij,ij->i', m2, m2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cossims = m1.dot(m2.T) / norms1[:, None] / norms2[None, :]
+
+    mask &= ~np.isnan(dists)
+    if not mask.any():
+        return np.nan, np.nan
+    return np.mean(dists[mask]), np.mean(cossims[mask])
+
+
+def _valid_for_average(vectors, vocab, words, lims):
+    if vocab is None:
+        return [w for w in words if w in vectors]
+    return [w for w in words if w in vocab and w in vectors and not (vocab[w] < lims[0] or vocab[w] > lims[1])]
+
+
+def _averaged(vectors, vocab, targetset, otherset, word1lims, word2lims):
+    valid1 = _valid_for_average(vectors, vocab, targetset, word1lims)
+    valid2 = _valid_for_average(vectors, vocab, otherset, word2lims)
+    if len(valid1) == 0 or len(valid2) == 0:
+        return [np.nan] * 6
+
+    m1 = np.array([vectors[w] for w in valid1], dtype=float)
+    m2 = np.array([vectors[w] for w in valid2], dtype=float)
+    avg1 = np.mean(m1, axis=0)
+    avg2 = np.mean(m2, axis=0)
+    norm_avg1 = np.linalg.norm(avg1)
+    norm_avg2 = np.linalg.norm(avg2)
+    norms1 = np.sqrt(np.einsum('ij,ij->i', m1, m1))
+    norms2 = np.sqrt(np.einsum('ij,ij->i', m2, m2))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        both = np.linalg.norm(avg1 - avg2)
+        first = np.mean(np.sqrt(np.einsum('ij,ij->i', m2 - avg1, m2 - avg1)))
+        second = np.mean(np.sqrt(np.einsum('ij,ij->i', m1 - avg2, m1 - avg2)))
+        both_cossim = np.dot(avg1, avg2) / norm_avg1 / norm_avg2
+        first_cossim = np.mean(m2.dot(avg1) / norm_avg1 / norms2)
+        second_cossim = np.mean(m1.dot(avg2) / norms1 / norm_avg2)
+    return [both, first, second, both_cossim, first_cossim, second_cossim]
+
+
+def single_set_distances_to_single_set(vectors_mult, targetset, otherset, vocabd, word1lims = [50, 1e25], word2lims = [50, 1e25]):
+    '''
+    same inputs and output layout as changes_over_time.single_set_distances_to_single_set:
+    [toset, toset_cossim, averageboth, averagefirst, averagesecond, averageboth_cossim, averagefirst_cossim, averagesecond_cossim]
+    '''
+    add('pairs', len(targetset) * len(otherset) * len(vectors_mult))
+    ret = [[] for _ in range(8)]
+    for en, vectors in enumerate(vectors_mult):
+        vocab = None if vocabd is None else vocabd[en]
+        toset, toset_cossim = _pair_means(vectors, vocab, targetset, otherset, word1lims, word2lims)
+        averaged = _averaged(vectors, vocab, targetset, otherset, word1lims, word2lims)
+        for i, value in enumerate([toset, toset_cossim] + averaged):
+            ret[i].append(value)
+    return ret
@@ -0,0 +1,77 @@
+'''
+Writes embeddings trained here (ppmi_svd, glove_trainer) into the vector store changes_over_time
+reads, the layout orgnize_COHA.py and the normalizers produce:
+
+    ../data/vectors/normalized_clean/vectors_<label><year>.txt          word v1 v2 ... (unit length)
+    ../data/vectors/normalized_clean/vocab/vocab_<label><year>.txt      word count
+
+Vectors are normalized and vectors of norm below 1e-2 are left out, as in the normalizers. Both
+files are written under a .tmp name and renamed when complete.
+'''
+import csv
+import os
+
+import numpy as np
+
+folder = '../data/vectors/normalized_clean/'
+min_norm = 1e-2
+
+
+def vectors_filename(label, year, folder=folder):
+    return os.path.join(folder, 'vectors_{}{}.txt'.format(label, year))
+
+
+def vocab_filename(label, year, folder=folder):
+    return os.path.join(folder, 'vocab', 'vocab_{}{}.txt'.format(label, year))
+
+
+def filenames(label, years, folder=folder):
+    '''
+    the vector files of a label's years, what changes_over_time.main takes
+    '''
+    return [vectors_filename(label, year, folder) for year in years]
+
+
+def write_embeddings(vectors, words, counts, label, year, folder=folder):
+    '''
+    writes the rows of vectors (one per word) and the word counts (no vocab file when counts is
+    None), returns the vector file
+    '''
+    vectors = np.asarray(vectors, dtype=float)
+    norms = np.linalg.norm(vectors, axis=1)
+    keep = norms >= min_norm
+    out_vectors, out_vocab = vectors_filename(label, year, folder), vocab_filename(label, year, folder)
+    os.makedirs(os.path.dirname(out_vocab), exist_ok=True)
+    with open(out_vectors + '.tmp', 'w', newline='', encoding='utf-8') as f_vec:
+        vec_writer = csv.writer(f_vec, delimiter=' ')
+        for en in np.flatnonzero(keep):
+            vec_writer.writerow([words[en]] + (vectors[en] / norms[en]).tolist())
+    if counts is not None:
+        with open(out_vocab + '.tmp', 'w', newline='', encoding='utf-8') as f_vocab:
+            vocab_writer = csv.writer(f_vocab, delimiter=' ')
+            for en in np.flatnonzero(keep):
+                vocab_writer.writerow([words[en], counts[en]])
+        os.replace(out_vocab + '.tmp', out_vocab)
+    elif os.path.exists(out_vocab):
+        # a vocab file of an earlier run would not match these vectors
+        os.remove(out_vocab)
+    os.replace(out_vectors + '.tmp', out_vectors)
+    print('{}: {} vectors, {} left out with norm < {}'.format(out_vectors, int(keep.sum()), int((~keep).sum()), min_norm))
+    return out_vectors
+
+
+def read_embeddings(label, year, folder=folder):
+    '''
+    (words, vectors, counts) of a label's year, counts None without a vocab file
+    '''
+    words, rows = [], []
+    with open(vectors_filename(label, year, folder), 'r', encoding='utf-8') as f:
+        for row in csv.reader(f, delimiter=' '):
+            words.append(row[0])
+            rows.append([float(x) for x in row[1:] if len(x) > 0])
+    counts = None
+    if os.path.exists(vocab_filename(label, year, folder)):
+        with open(vocab_filename(label, year, folder), 'r', encoding='utf-8') as f:
+            vocab = {row[0]: float(row[1]) for row in csv.reader(f, delimiter=' ')}
+        counts = np.array([vocab.get(w, 0) for w in words], dtype=float)
+    return words, np.array(rows, dtype=float).reshape(len(words), -1), counts
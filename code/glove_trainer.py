@@ -0,0 +1,181 @@
+'''
+GloVe trained on the nonzero co-occurrences only, in place of the notebook's train_glove, which
+densified the counts into a vocab x vocab matrix for mittens (and so capped the vocabulary at a few
+thousand words).
+
+The model and loss are GloVe's (and mittens'): word vectors W, context vectors C and biases bw, bc
+minimize sum_ij f(X_ij) (W_i.C_j + bw_i + bc_j - log X_ij)^2 with f(x) = min(1, (x/xmax)^alpha),
+trained with AdaGrad. Every epoch the nonzeros are shuffled and processed in minibatches with
+array operations: the gradients of a minibatch are summed per word (one sparse product), the
+word's squared gradient is added to its accumulator (starting at 1) and the step is
+lr * gradient / sqrt(accumulator). Adding before stepping bounds every step by lr however often a
+frequent word occurs in a batch, which is what keeps large minibatches stable; GloVe's C code,
+which is sequential, adds after the step. The embeddings returned are W + C, which is what
+mittens' fit returns.
+
+With workers > 1 the parameters and accumulators live in shared memory and the worker processes
+train on disjoint parts of each epoch's shuffled nonzeros without locks (Hogwild). With a
+checkpoint file the full training state is saved every checkpoint_every epochs (atomically) and a
+later call with the same file resumes after the last saved epoch.
+'''
+import ctypes
+import multiprocessing
+import os
+
+import numpy as np
+from scipy import sparse
+
+xmax = 100.0
+alpha = 0.75
+learning_rate = 0.05
+batch_size = 4096
+checkpoint_every = 5
+parameter_names = ['W', 'C', 'bw', 'bc', 'GW', 'GC', 'Gbw', 'Gbc']
+
+
+def as_coo(cooc, vocab_size=None):
+    '''
+    a scipy.sparse matrix, or the notebook's {(i, j): count} dict with its vocab_size, as COO
+    '''
+    if sparse.issparse(cooc):
+        return cooc.tocoo()
+    keys = np.array(list(cooc.keys()), dtype=np.int64).reshape(-1, 2)
+    values = np.array(list(cooc.values()), dtype=float)
+    return sparse.coo_matrix((values, (keys[:, 0], keys[:, 1])), shape=(vocab_size, vocab_size))
+
+
+def initial_state(vocab_size, embed_dim, seed):
+    '''
+    parameters uniform in [-0.5, 0.5) / embed_dim, AdaGrad accumulators at 1, as in GloVe's C code
+    '''
+    rng = np.random.RandomState(seed)
+    state = {}
+    for name, shape in [('W', (vocab_size, embed_dim)), ('C', (vocab_size, embed_dim)), ('bw', (vocab_size,)), ('bc', (vocab_size,))]:
+        state[name] = (rng.rand(*shape) - 0.5) / embed_dim
+        state['G' + name] = np.ones(shape)
+    return state
+
+
+def sum_by_index(index, values):
+    '''
+    (distinct indices, values summed per distinct index) for 1-d or 2-d values
+    '''
+    distinct, inverse = np.unique(index, return_inverse=True)
+    if values.ndim == 1:
+        return distinct, np.bincount(inverse, values, minlength=len(distinct))
+    summing = sparse.csr_matrix((np.ones(len(index)), (inverse, np.arange(len(index)))), shape=(len(distinct), len(index)))
+    return distinct, summing.dot(values)
+
+
+def adagrad_step(param, accumulator, index, grad, lr):
+    rows, grad = sum_by_index(index, grad)
+    accumulator[rows] += grad ** 2
+    param[rows] -= lr * grad / np.sqrt(accumulator[rows])
+
+
+def train_batch(state, i, j, logx, fx, lr):
+    '''
+    one AdaGrad step on the pairs (i, j), returns their share of the cost
+    '''
+    W, C, bw, bc = state['W'], state['C'], state['bw'], state['bc']
+    wi, cj = W[i], C[j]
+    diff = np.einsum('nd,nd->n', wi, cj) + bw[i] + bc[j] - logx
+    fdiff = fx * diff
+    adagrad_step(W, state['GW'], i, fdiff[:, None] * cj, lr)
+    adagrad_step(C, state['GC'], j, fdiff[:, None] * wi, lr)
+    adagrad_step(bw, state['Gbw'], i, fdiff, lr)
+    adagrad_step(bc, state['Gbc'], j, fdiff, lr)
+    return 0.5 * np.dot(fdiff, diff)
+
+
+def train_part(state, data, order, batch, lr):
+    i, j, logx, fx = data
+    cost = 0.0
+    for start in range(0, len(order), batch):
+        idx = order[start:start + batch]
+        cost += train_batch(state, i[idx], j[idx], logx[idx], fx[idx], lr)
+    return cost
+
+
+def epoch_order(nnz, seed, epoch):
+    # seeded per epoch so a resumed run shuffles like an uninterrupted one
+    return np.random.RandomState((seed, epoch)).permutation(nnz)
+
+
+# shared memory of the Hogwild workers, set in the parent before the pool forks
+_shared = {}
+
+
+def _shared_array(values, ctype):
+    raw = multiprocessing.RawArray(ctype, values.size)
+    array = np.frombuffer(raw, dtype=values.dtype).reshape(values.shape)
+    array[...] = values
+    return array
+
+
+def _train_worker_part(job):
+    part, parts, batch, lr = job
+    order = _shared['order']
+    bounds = np.linspace(0, len(order), parts + 1).astype(int)
+    return train_part(_shared['state'], _shared['data'], order[bounds[part]:bounds[part + 1]], batch, lr)
+
+
+def save_checkpoint(filename, state, epoch, costs):
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    # np.savez adds .npz to names without it
+    tmp = filename + '.tmp.npz'
+    np.savez(tmp, epoch=epoch, costs=np.array(costs), **{name: state[name] for name in parameter_names})
+    os.replace(tmp, filename)
+
+
+def load_checkpoint(filename):
+    with np.load(filename) as f:
+        return {name: f[name].copy() for name in parameter_names}, int(f['epoch']), f['costs'].tolist()
+
+
+def train_glove(cooc, vocab_size=None, embed_dim=50, max_iter=50, xmax=xmax, alpha=alpha, learning_rate=learning_rate,
+                batch_size=batch_size, workers=1, seed=0, checkpoint=None, checkpoint_every=checkpoint_every, verbose=True):
+    '''
+    (vocab_size x embed_dim) GloVe embeddings W + C from a sparse co-occurrence matrix (or the
+    notebook's cooc dict with its vocab_size)
+    '''
+    coo = as_coo(cooc, vocab_size)
+    coo.sum_duplicates()
+    positive = coo.data > 0
+    i, j, x = coo.row[positive].astype(np.int64), coo.col[positive].astype(np.int64), coo.data[positive]
+    data = (i, j, np.log(x), np.minimum(1.0, (x / xmax) ** alpha))
+    V = coo.shape[0]
+
+    state, start_epoch, costs = initial_state(V, embed_dim, seed), 0, []
+    if checkpoint is not None and os.path.exists(checkpoint):
+        state, start_epoch, costs = load_checkpoint(checkpoint)
+        if state['W'].shape != (V, embed_dim):
+            raise ValueError('checkpoint {} is for a {} model, not {}'.format(checkpoint, state['W'].shape, (V, embed_dim)))
+        if verbose: print('resuming from epoch {} of {}'.format(start_epoch, checkpoint))
+
+    pool = None
+    if workers > 1:
+        _shared['state'] = {name: _shared_array(state[name], ctypes.c_double) for name in parameter_names}
+        _shared['data'] = tuple(_shared_array(a, ctypes.c_double if a.dtype == float else ctypes.c_int64) for a in data)
+        _shared['order'] = _shared_array(np.zeros(len(i), dtype=np.int64), ctypes.c_int64)
+        state = _shared['state']
+        pool = multiprocessing.get_context('fork').Pool(workers)
+    try:
+        for epoch in range(start_epoch, max_iter):
+            order = epoch_order(len(i), seed, epoch)
+            if pool is None:
+                cost = train_part(state, data, order, batch_size, learning_rate)
+            else:
+                _shared['order'][...] = order
+                cost = sum(pool.map(_train_worker_part, [(part, workers, batch_size, learning_rate) for part in range(workers)]))
+            costs.append(cost / max(len(i), 1))
+            if verbose: print('epoch {}: cost {:.6f}'.format(epoch + 1, costs[-1]))
+            if checkpoint is not None and ((epoch + 1) % checkpoint_every == 0 or epoch + 1 == max_iter):
+                save_checkpoint(checkpoint, state, epoch + 1, costs)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+            _shared.clear()
+
+    return state['W'] + state['C']
@@ -0,0 +1,107 @@
+'''
+Lightweight timing and throughput instrumentation for the pipeline.
+
+Wrap a phase in a timer and it is recorded with its wall time:
+
+    with timer('load_vectors', file=filename, bytes=os.path.getsize(filename)):
+        ...
+
+Numeric keyword arguments are counters and get a <name>_per_sec throughput in the report,
+anything else is stored as a tag. add() increments a counter of the innermost open phase,
+so code deep inside a phase (e.g. the pair loop) can report how much work it did.
+write_report() dumps everything recorded in this run as JSON to output/timing/; records timed in
+worker processes are sent back and added with merge_records().
+Each phase is also handed to profiling.phase, which does nothing unless --profile was given.
+'''
+import contextlib
+import datetime
+import json
+import os
+import time
+
+import profiling
+
+timing_folder = '../output/timing/'
+
+_phases = []
+_open = []
+_run_started = datetime.datetime.now()
+
+
+def reset():
+    global _run_started
+    del _phases[:]
+    del _open[:]
+    _run_started = datetime.datetime.now()
+
+
+@contextlib.contextmanager
+def timer(name, **info):
+    record = {'name': name, 'parent': _open[-1]['name'] if _open else None, 'tags': {}, 'counts': {}}
+    for key, value in info.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            record['counts'][key] = value
+        else:
+            record['tags'][key] = str(value)
+    _open.append(record)
+    start = time.perf_counter()
+    try:
+        with profiling.phase(name, record['tags']):
+            yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        _open.remove(record)
+        for key, value in record['counts'].items():
+            record[key + '_per_sec'] = value / record['seconds'] if record['seconds'] > 0 else None
+        _phases.append(record)
+
+
+def add(counter, n=1):
+    '''
+    adds n to counter of the innermost open phase, does nothing when no phase is open
+    '''
+    if _open:
+        _open[-1]['counts'][counter] = _open[-1]['counts'].get(counter, 0) + n
+
+
+def merge_records(records):
+    '''
+    adds phase records timed in another process (e.g. a plot worker) to this run's report
+    '''
+    _phases.extend(records)
+
+
+def summary():
+    '''
+    totals per phase name: number of calls, total seconds and total counts with overall throughput
+    '''
+    totals = {}
+    for record in _phases:
+        tot = totals.setdefault(record['name'], {'calls': 0, 'seconds': 0.0, 'counts': {}})
+        tot['calls'] += 1
+        tot['seconds'] += record['seconds']
+        for key, value in record['counts'].items():
+            tot['counts'][key] = tot['counts'].get(key, 0) + value
+    for tot in totals.values():
+        for key, value in tot['counts'].items():
+            tot[key + '_per_sec'] = value / tot['seconds'] if tot['seconds'] > 0 else None
+    return totals
+
+
+def write_report(script, folder=None):
+    if folder is None: folder = timing_folder
+    os.makedirs(folder, exist_ok=True)
+    finished = datetime.datetime.now()
+    report = {
+        'script': script,
+        'started': _run_started.isoformat(),
+        'finished': finished.isoformat(),
+        'wall_seconds': (finished - _run_started).total_seconds(),
+        'summary': summary(),
+        'phases': _phases,
+    }
+    filename = os.path.join(folder, '{}_{}.json'.format(script, _run_started.strftime('%Y%m%d-%H%M%S')))
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=1)
+    print('timing report written to ' + filename)
+    return filename
@@ -0,0 +1,41 @@
+'''
+Lazily imported modules.
+
+lazy_module('seaborn') returns a stand-in that imports seaborn the first time one of its attributes
+is used, so importing utilities or plot_creation does not pay for matplotlib, seaborn, pandas or
+scipy.stats until a plot or a regression actually needs them. on_load runs once right after the
+import, e.g. to set the plot style before the first figure is drawn.
+'''
+import importlib
+
+
+class LazyModule(object):
+    def __init__(self, name, on_load=None):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_on_load'] = on_load
+
+    def _load(self):
+        if self._module is None:
+            # set before on_load, which may use this module itself
+            self.__dict__['_module'] = importlib.import_module(self._name)
+            if self._on_load is not None:
+                self._on_load()
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return '<lazy module {} ({})>'.format(self._name, state)
+
+
+def lazy_module(name, on_load=None):
+    return LazyModule(name, on_load)
@@ -0,0 +1,165 @@
+'''
+Averages the embeddings of consecutive years into windows as arrays, in place of the notebook's
+merge that intersects the years' dict keys and averages word by word.
+
+For a window year-half_width .. year+half_width the years' vocabularies are put in one union index
+(words in order of first appearance), every year's matrix is gathered into a
+(years x words x dim) array with a (years x words) presence mask, and the window vectors are the
+masked mean over the years. Words present in fewer than min_years of the window's years are left
+out; the default, every year of the window, is the notebook's intersection. As in the notebook a
+window is merged only when all of its years exist.
+
+The inputs are any run of years, the pickles of train_windows (or of the notebook) or a label of the
+vector store, and with align=True every year is first rotated onto the window's centre year by
+orthogonal Procrustes over the words both have. The merged windows are written into the vector
+store as a new label, with the window's summed word counts when the inputs have counts.
+
+    python merge_windows.py --input ../output/newsroom/embeddings --label newsroom_merged
+'''
+import argparse
+import glob
+import os
+import pickle
+
+import numpy as np
+
+import embedding_io
+import profiling
+
+
+def load_pickles(folder):
+    '''
+    {year: (words, vectors, counts)} of the embeddings_<year>.pkl files in folder
+    '''
+    years = {}
+    for path in glob.glob(os.path.join(folder, 'embeddings_*.pkl')):
+        year = int(os.path.basename(path).replace('embeddings_', '').replace('.pkl', ''))
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        words = [None] * len(data['vocab_index'])
+        for word, idx in data['vocab_index'].items():
+            words[idx] = word
+        counts = data.get('counts')
+        years[year] = (words, np.asarray(data['embeddings'], dtype=float), None if counts is None else np.asarray(counts))
+    return years
+
+
+def load_label(label, years, folder=embedding_io.folder):
+    return {year: embedding_io.read_embeddings(label, year, folder) for year in years
+            if os.path.exists(embedding_io.vectors_filename(label, year, folder))}
+
+
+def union_index(vocabs):
+    '''
+    (words in order of first appearance, per vocabulary the positions of its words in them)
+    '''
+    index = {}
+    positions = []
+    for vocab in vocabs:
+        for w in vocab:
+            if w not in index:
+                index[w] = len(index)
+        positions.append(np.array([index[w] for w in vocab], dtype=np.int64))
+    return list(index), positions
+
+
+def stack(embeddings):
+    '''
+    (words, positions of every year's words in them, years x words x dim array, years x words
+    presence mask) of a list of (words, vectors)
+    '''
+    words, positions = union_index([w for w, _ in embeddings])
+    dim = embeddings[0][1].shape[1]
+    values = np.zeros((len(embeddings), len(words), dim))
+    mask = np.zeros((len(embeddings), len(words)), dtype=bool)
+    for en, ((_, vectors), pos) in enumerate(zip(embeddings, positions)):
+        values[en, pos] = vectors
+        mask[en, pos] = True
+    return words, positions, values, mask
+
+
+def procrustes(values, mask, reference):
+    '''
+    every year of values rotated onto the year reference over the words both have
+    '''
+    aligned = values.copy()
+    for en in range(len(values)):
+        if en == reference:
+            continue
+        shared = mask[en] & mask[reference]
+        u, _, vt = np.linalg.svd(values[en, shared].T.dot(values[reference, shared]))
+        aligned[en] = values[en].dot(u.dot(vt))
+    return aligned
+
+
+def masked_mean(values, mask, min_years=None):
+    '''
+    (mean over the years where present, words kept) with words kept present in at least min_years
+    years (all of them by default)
+    '''
+    if min_years is None: min_years = len(values)
+    present = mask.sum(axis=0)
+    keep = present >= max(min_years, 1)
+    total = np.einsum('ywd,yw->wd', values[:, keep], mask[:, keep].astype(float))
+    return total / present[keep][:, None], keep
+
+
+def merge_window(year_embeddings, year, half_width=1, min_years=None, align=False):
+    '''
+    (words, vectors, counts) of the window around year, None when one of its years is missing
+    '''
+    years = list(range(year - half_width, year + half_width + 1))
+    if any(yr not in year_embeddings for yr in years):
+        return None
+    entries = [year_embeddings[yr] for yr in years]
+    words, positions, values, mask = stack([(w, v) for w, v, _ in entries])
+    if align:
+        values = procrustes(values, mask, half_width)
+    vectors, keep = masked_mean(values, mask, min_years)
+    counts = None
+    if all(c is not None for _, _, c in entries):
+        summed = np.zeros(len(words), dtype=np.result_type(*[c for _, _, c in entries]))
+        for (_, _, c), pos in zip(entries, positions):
+            summed[pos] += c
+        counts = summed[keep]
+    return [w for w, k in zip(words, keep) if k], vectors, counts
+
+
+def merge_windows(year_embeddings, half_width=1, min_years=None, align=False):
+    '''
+    {year: (words, vectors, counts)} of every window whose years all exist
+    '''
+    windows = {}
+    for year in sorted(year_embeddings):
+        merged = merge_window(year_embeddings, year, half_width, min_years, align)
+        if merged is not None:
+            windows[year] = merged
+    return windows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', default='../output/newsroom/embeddings', help='folder of embeddings_<year>.pkl files')
+    parser.add_argument('--input-label', help='read the years of this label of the vector store instead')
+    parser.add_argument('--first-year', type=int, default=1998)
+    parser.add_argument('--last-year', type=int, default=2016)
+    parser.add_argument('--label', default='newsroom_merged', help='label the merged windows are written under')
+    parser.add_argument('--vectors-folder', default=embedding_io.folder)
+    parser.add_argument('--half-width', type=int, default=1)
+    parser.add_argument('--min-years', type=int, help='keep words present in this many years of a window (default all)')
+    parser.add_argument('--align', action='store_true', help='rotate the years onto the centre year (orthogonal Procrustes) first')
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'merge_windows')
+
+    years = range(args.first_year, args.last_year + 1)
+    with profiling.phase('load', {'input': args.input_label or args.input}):
+        if args.input_label is not None:
+            year_embeddings = load_label(args.input_label, years, args.vectors_folder)
+        else:
+            year_embeddings = {yr: e for yr, e in load_pickles(args.input).items() if yr in years}
+    with profiling.phase('merge', {'years': len(year_embeddings)}):
+        windows = merge_windows(year_embeddings, args.half_width, args.min_years, args.align)
+    print('Valid {}-year windows:'.format(2 * args.half_width + 1), sorted(windows))
+    for year, (words, vectors, counts) in sorted(windows.items()):
+        embedding_io.write_embeddings(vectors, words, counts, args.label, year, args.vectors_folder)
@@ -2,6 +2,8 @@ import numpy as np
 import os
 import csv
 import re
+import argparse
+import profiling
 import sys
 
 def normalize(filename, filename_output):
@@ -37,6 +39,12 @@ def normalize(filename, filename_output):
     print(countnorm0, countnormal)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'normalizer_glove')
+
     filename = "../data/vectors/raw/glove.42B.300d.txt"
     filename_output = "../data/vectors/normalized_clean/vectorscommoncrawlglove.txt"
-    normalize(filename, filename_output)
+    with profiling.phase('normalize', {'output': os.path.basename(filename_output)}):
+        normalize(filename, filename_output)
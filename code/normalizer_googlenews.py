@@ -1,6 +1,8 @@
 import numpy as np
 import os
 import re
+import argparse
+import profiling
 from gensim.models import KeyedVectors
 
 def normalize_googlenews(bin_filename, filename_output):
@@ -33,6 +35,12 @@ def normalize_googlenews(bin_filename, filename_output):
     print(countnorm0, countnormal)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'normalizer_googlenews')
+
     filename = "../data/vectors/raw/GoogleNews-vectors-negative300.bin"
     filename_output = "../data/vectors/normalized_clean/vectorsGoogleNews_exactclean.txt"
-    normalize_googlenews(filename, filename_output)
\ No newline at end of file
+    with profiling.phase('normalize', {'output': os.path.basename(filename_output)}):
+        normalize_googlenews(filename, filename_output)
\ No newline at end of file
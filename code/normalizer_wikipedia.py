@@ -2,6 +2,8 @@ import numpy as np
 import os
 import csv
 import re
+import argparse
+import profiling
 import sys
 
 def normalize(filename, filename_output):
@@ -41,6 +43,12 @@ def normalize(filename, filename_output):
     print(countnorm0, countnormal)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'normalizer_wikipedia')
+
     filename = "../data/vectors/raw/wiki_giga_2024_300_MFT20_vectors_seed_2024_alpha_0.75_eta_0.05_combined.txt"
     filename_output = "../data/vectors/normalized_clean/vectorswikipedia.txt"
-    normalize(filename, filename_output)
+    with profiling.phase('normalize', {'output': os.path.basename(filename_output)}):
+        normalize(filename, filename_output)
@@ -0,0 +1,223 @@
+'''
+Closed-form OLS for the regressions in plot_creation, without statsmodels.
+
+fit(y, X) solves one least squares problem, fit_groups(y, X, groups) solves one per group (e.g. per
+year) in a single batch: the groups' design matrices are stacked (zero-padded to the largest group)
+and solved with one stacked pseudo-inverse. As in statsmodels' OLS, which also uses pinv(X), rank
+deficient designs (const + all year dummies) get the minimum-norm solution and the degrees of
+freedom use the rank.
+
+Results carry the statsmodels attributes the plot code reads (params, bse, tvalues, pvalues,
+rsquared, rsquared_adj, fvalue, f_pvalue, resid, fittedvalues, predict), as pandas Series indexed
+by the column names, so regression_store.summarize_model writes the same regression csvs.
+
+cross_validate(y, X, folds) does leave-one-group-out (e.g. leave-one-year-out) cross-validation
+from per-fold sufficient statistics; kfold_labels makes k folds over items such as occupations.
+
+set_cross_check(True) refits every model with statsmodels and raises if they disagree.
+'''
+import numpy as np
+from lazy_modules import lazy_module
+
+pd = lazy_module('pandas')
+stats = lazy_module('scipy.stats')
+
+cross_check = False
+rtol = 1e-6
+atol = 1e-9
+
+
+def set_cross_check(enabled):
+    global cross_check
+    cross_check = enabled
+
+
+class OLSResult(object):
+    def __init__(self, names, params, cov_unscaled, rank, k_constant, nobs, ssr, tss):
+        self.nobs = nobs
+        self.rank = rank
+        self.k_constant = k_constant
+        # numpy floats as in statsmodels, so a fit without residual degrees of freedom gives nan, not an error
+        self.df_model = np.float64(rank - k_constant)
+        self.df_resid = np.float64(nobs - rank)
+        self.ssr = ssr
+        self.centered_tss = tss
+        self.ess = tss - ssr
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.scale = ssr / self.df_resid
+            bse = np.sqrt(np.diag(cov_unscaled) * self.scale)
+            tvalues = params / bse
+            self.rsquared = 1 - ssr / tss
+            self.rsquared_adj = 1 - (nobs - k_constant) / self.df_resid * (1 - self.rsquared)
+            self.fvalue = (self.ess / self.df_model) / self.scale
+        self.params = pd.Series(params, index=names)
+        self.bse = pd.Series(bse, index=names)
+        self.tvalues = pd.Series(tvalues, index=names)
+        self.pvalues = pd.Series(2 * stats.t.sf(np.abs(tvalues), self.df_resid), index=names)
+        self.f_pvalue = stats.f.sf(self.fvalue, self.df_model, self.df_resid)
+
+    def predict(self, exog):
+        return np.atleast_1d(np.dot(np.asarray(exog, dtype=float), self.params.values))
+
+
+def _as_arrays(endog, exog, names):
+    if names is None:
+        if isinstance(exog, pd.DataFrame):
+            names = [str(c) for c in exog.columns]
+        else:
+            names = ['x{}'.format(i + 1) for i in range(np.shape(exog)[1])]
+    index = endog.index if isinstance(endog, pd.Series) else None
+    y = np.asarray(endog, dtype=float)
+    X = np.asarray(exog, dtype=float)
+    if X.ndim == 1:
+        X = X[:, None]
+    return y, X, list(names), index
+
+
+def _k_constant(X):
+    '''
+    1 if the design has a constant column or the columns add up to one (e.g. a full set of dummies)
+    '''
+    if X.shape[0] == 0:
+        return 0
+    if np.any((np.ptp(X, axis=0) == 0) & (X[0] != 0)):
+        return 1
+    augmented = np.column_stack([X, np.ones(X.shape[0])])
+    return int(np.linalg.matrix_rank(augmented) == np.linalg.matrix_rank(X))
+
+
+def fit_groups(endog, exog, groups, names=None):
+    '''
+    separate OLS fit of endog on exog for every distinct value of groups, returns {group: OLSResult}
+    '''
+    y, X, names, index = _as_arrays(endog, exog, names)
+    keys, codes = np.unique(np.asarray(groups), return_inverse=True)
+    codes = codes.ravel()
+    if len(keys) == 0:
+        return {}
+    # every group's rows in one zero-padded (groups x rows x columns) stack; zero rows change
+    # neither the pseudo-inverse solution nor the rank
+    nobs = np.bincount(codes, minlength=len(keys))
+    order = np.argsort(codes, kind='stable')
+    position = np.arange(len(y)) - np.repeat(np.cumsum(nobs) - nobs, nobs)
+    Xs = np.zeros((len(keys), nobs.max(), X.shape[1]))
+    ys = np.zeros((len(keys), nobs.max()))
+    Xs[codes[order], position] = X[order]
+    ys[codes[order], position] = y[order]
+
+    pinv = np.linalg.pinv(Xs)
+    params = np.einsum('gin,gn->gi', pinv, ys)
+    cov_unscaled = np.einsum('gin,gjn->gij', pinv, pinv)
+    ranks = np.linalg.matrix_rank(Xs)
+
+    resid = y - np.einsum('ni,ni->n', X, params[codes])
+    ssr = np.bincount(codes, resid ** 2, minlength=len(keys))
+    sums = np.bincount(codes, y, minlength=len(keys))
+
+    ret = {}
+    for g, key in enumerate(keys):
+        rows = codes == g
+        k_constant = _k_constant(X[rows])
+        tss = np.sum((y[rows] - sums[g] / nobs[g]) ** 2) if k_constant else np.sum(y[rows] ** 2)
+        res = OLSResult(names, params[g], cov_unscaled[g], int(np.atleast_1d(ranks)[g]), k_constant, int(nobs[g]), ssr[g], tss)
+        res.resid = pd.Series(resid[rows], index=None if index is None else index[rows])
+        res.fittedvalues = pd.Series(y[rows] - resid[rows], index=res.resid.index)
+        ret[key.item() if hasattr(key, 'item') else key] = res
+        if cross_check:
+            check_against_statsmodels(res, y[rows], X[rows], names)
+    return ret
+
+
+def fit(endog, exog, names=None):
+    '''
+    OLS fit of endog on exog (no constant is added), the closed-form counterpart of sm.OLS(endog, exog).fit()
+    '''
+    y, X, names, index = _as_arrays(endog, exog, names)
+    res = fit_groups(y, X, np.zeros(len(y), dtype=int), names)[0]
+    if index is not None:
+        res.resid.index = index
+        res.fittedvalues.index = index
+    return res
+
+
+def cross_validate(endog, exog, folds):
+    '''
+    leave-one-group-out cross-validation: for every distinct value of folds the model is fitted on
+    all other rows and predicts the held-out rows. All fits come from the per-fold sufficient
+    statistics X'X and X'y (total minus the fold's own) in one stacked solve. Returns a dict with
+    the fold keys, the held-out predictions for every row, and per fold the fitted params and the
+    held-out mean squared error.
+    '''
+    y, X, names, index = _as_arrays(endog, exog, None)
+    keys, codes = np.unique(np.asarray(folds), return_inverse=True)
+    codes = codes.ravel()
+    onehot = np.zeros((len(y), len(keys)))
+    onehot[np.arange(len(y)), codes] = 1
+    xtx = np.einsum('ng,ni,nj->gij', onehot, X, X)
+    xty = np.einsum('ng,ni,n->gi', onehot, X, y)
+
+    params = np.einsum('gij,gj->gi', np.linalg.pinv(xtx.sum(axis=0) - xtx, hermitian=True), xty.sum(axis=0) - xty)
+    predictions = np.einsum('ni,ni->n', X, params[codes])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mse = np.bincount(codes, (y - predictions) ** 2, minlength=len(keys)) / np.bincount(codes, minlength=len(keys))
+    keys = [k.item() if hasattr(k, 'item') else k for k in keys]
+    return {'folds': keys, 'predictions': predictions,
+            'params': dict(zip(keys, params)), 'mse': dict(zip(keys, mse.tolist()))}
+
+
+def kfold_labels(items, k, seed=0):
+    '''
+    fold label for every entry of items such that all entries of the same item (e.g. one occupation
+    over all years) land in the same of k folds, for k-fold cross_validate over items
+    '''
+    distinct = sorted(set(items))
+    rng = np.random.RandomState(seed)
+    assignment = dict(zip([distinct[i] for i in rng.permutation(len(distinct))], np.arange(len(distinct)) % k))
+    return np.array([assignment[item] for item in items])
+
+
+def design(columns, constant=True, dummies=None, prefix='yr'):
+    '''
+    design matrix with the given (name, values) columns, then 'const', then one dummy column per
+    distinct value of dummies named <prefix>_<value> (the column order of the pandas code it replaces)
+    '''
+    names = [name for name, _ in columns]
+    values = [np.asarray(v, dtype=float) for _, v in columns]
+    n = len(values[0]) if values else len(dummies)
+    if constant:
+        names.append('const')
+        values.append(np.ones(n))
+    if dummies is not None:
+        dummies = np.asarray(dummies)
+        for level in np.unique(dummies):
+            names.append('{}_{}'.format(prefix, level))
+            values.append((dummies == level).astype(float))
+    X = np.column_stack(values) if values else np.zeros((n, 0))
+    return X, names
+
+
+def summary_latex(res):
+    '''
+    coefficient table of a result as a latex tabular, in place of statsmodels' summary().as_latex()
+    '''
+    lines = ['\\begin{tabular}{lrrrr}', '\\hline', ' & coef & std err & t & P$>|$t$|$ \\\\', '\\hline']
+    for name in res.params.index:
+        lines.append('{} & {:.4f} & {:.4f} & {:.3f} & {:.3f} \\\\'.format(
+            str(name).replace('_', '\\_'), res.params[name], res.bse[name], res.tvalues[name], res.pvalues[name]))
+    lines += ['\\hline',
+              'R-squared & {:.3f} & Adj. R-squared & {:.3f} & \\\\'.format(res.rsquared, res.rsquared_adj),
+              'F-statistic & {:.4g} & Prob (F) & {:.3g} & \\\\'.format(res.fvalue, res.f_pvalue),
+              'No. Observations & {} & Df Residuals & {:.0f} & \\\\'.format(res.nobs, res.df_resid),
+              '\\hline', '\\end{tabular}']
+    return '\n'.join(lines)
+
+
+def check_against_statsmodels(res, y, X, names):
+    import statsmodels.api as sm
+    model = sm.OLS(y, X).fit()
+    for attr in ['params', 'bse', 'pvalues']:
+        if not np.allclose(getattr(res, attr).values, np.asarray(getattr(model, attr)), rtol=rtol, atol=atol, equal_nan=True):
+            raise ValueError('statsmodels cross-check failed for {} of regression on {}: {} vs {}'.format(
+                attr, names, getattr(res, attr).values, np.asarray(getattr(model, attr))))
+    if not np.allclose(res.rsquared, model.rsquared, rtol=rtol, atol=atol, equal_nan=True):
+        raise ValueError('statsmodels cross-check failed for rsquared of regression on {}: {} vs {}'.format(names, res.rsquared, model.rsquared))
@@ -0,0 +1,189 @@
+'''
+Content-addressed cache for the plot jobs of create_final_plots_all.
+
+Every job (output folder, plot function, args) is keyed by digests of
+    row:        the part of the results row the job can read (entries of the word lists in its args)
+    inputs:     word list files named in its args and the reference files in data/word_lists
+                that are not computed lists (census percentages, stereotype scores, limit lists)
+    code:       plot_creation.py and the modules it builds on (bias_frame, ols_engine, cross_time,
+                regression_store, reference_data, lazy_modules, utilities, latexify)
+    render:     the render profile (draft figures never stand in for publication ones)
+The job's id is its folder, function and all its arguments, so a job with changed parameters is a
+new job. A job whose digests match the previous run and whose outputs still exist is skipped (jobs
+that only print, e.g. the trend tests, always run). After every run the manifest (output/plot_cache/manifest.json) lists for each job its digests, the files it
+wrote, whether it was rebuilt or skipped and why.
+'''
+import datetime
+import hashlib
+import json
+import os
+
+code_files = ['plot_creation.py', 'bias_frame.py', 'ols_engine.py', 'cross_time.py', 'regression_store.py', 'reference_data.py', 'lazy_modules.py', 'utilities.py', 'data_sources.py', 'embedding_io.py', 'latexify.py']
+word_lists_folder = '../data/word_lists/'
+manifest_file = '../output/plot_cache/manifest.json'
+
+_file_digests = {}
+
+
+def file_digest(filename):
+    '''
+    sha256 of a file, cached by path, size and mtime for the lifetime of the process
+    '''
+    if not os.path.exists(filename):
+        return None
+    st = os.stat(filename)
+    key = (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+    if key not in _file_digests:
+        h = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        _file_digests[key] = h.hexdigest()
+    return _file_digests[key]
+
+
+def digest(obj):
+    return hashlib.sha256(repr(obj).encode('utf-8')).hexdigest()
+
+
+def code_version():
+    folder = os.path.dirname(os.path.abspath(__file__))
+    return digest([file_digest(os.path.join(folder, f)) for f in code_files])
+
+
+def describe(arg):
+    '''
+    stable description of a job argument, functions by name instead of by address
+    '''
+    if callable(arg) and hasattr(arg, '__name__'):
+        return '{}.{}'.format(getattr(arg, '__module__', ''), arg.__name__)
+    if isinstance(arg, (list, tuple)):
+        return [describe(a) for a in arg]
+    return repr(arg)
+
+
+def list_names(args, rows):
+    '''
+    word list names in the args, i.e. strings (also inside lists) that are lists computed in the rows
+    '''
+    computed = set()
+    for row in rows.values():
+        computed.update(row.get('counts_all', {}).keys())
+    names = set()
+    for arg in args:
+        for a in (arg if isinstance(arg, (list, tuple)) else [arg]):
+            if isinstance(a, str) and a in computed:
+                names.add(a)
+    return sorted(names), computed
+
+
+def row_slice(row, names):
+    '''
+    entries of row that belong to the given word lists: per-list dicts (counts_all,
+    variance_over_time) restricted to them and every other entry whose key mentions one of them
+    '''
+    ret = {}
+    for key in sorted(row):
+        value = row[key]
+        if key in ('counts_all', 'variance_over_time'):
+            ret[key] = {n: value[n] for n in names if n in value}
+        elif any(n in key for n in names):
+            ret[key] = value
+    return ret
+
+
+def reference_inputs(computed):
+    if not os.path.isdir(word_lists_folder):
+        return []
+    return sorted(os.path.join(word_lists_folder, f) for f in os.listdir(word_lists_folder)
+                  if os.path.splitext(f)[0] not in computed)
+
+
+def job_id(job):
+    folder, func, args = job
+    return '{}:{}({})'.format(folder, func.__name__, ', '.join(json.dumps(describe(a)) for a in args))
+
+
+def job_digests(job, rows, code=None, render=None):
+    folder, func, args = job
+    names, computed = list_names(args, rows)
+    files = sorted(set([a for a in args if isinstance(a, str) and os.path.isfile(a)] +
+                       [os.path.join(word_lists_folder, n + '.txt') for n in names]))
+    return {
+        'row': digest(row_slice(rows[args[0]], names)),
+        'inputs': digest([(f, file_digest(f)) for f in files + reference_inputs(computed)]),
+        'code': code or code_version(),
+        'render': render,
+    }
+
+
+def load_manifest(filename=None):
+    if filename is None: filename = manifest_file
+    if not os.path.exists(filename):
+        return {'jobs': {}}
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def write_manifest(manifest, filename=None):
+    if filename is None: filename = manifest_file
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    manifest['written'] = datetime.datetime.now().isoformat()
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(filename + '.tmp', filename)
+
+
+def plan(jobs, rows, manifest, force=False, render=None):
+    '''
+    splits jobs into the ones to rebuild and the ones to skip, returns (ids, digests, todo, reasons)
+    with reasons[id] saying why a job is rebuilt ('skipped: unchanged' otherwise)
+    '''
+    code = code_version()
+    ids, digests, todo, reasons = [], {}, [], {}
+    for job in jobs:
+        jid = job_id(job)
+        # identical jobs listed twice share one entry
+        if jid in digests:
+            continue
+        ids.append(jid)
+        digests[jid] = job_digests(job, rows, code, render)
+        previous = manifest['jobs'].get(jid)
+        if force:
+            reason = 'forced'
+        elif previous is None or previous.get('status') == 'not built':
+            reason = 'new job' if previous is None else 'not built last time'
+        else:
+            changed = [k for k in sorted(digests[jid]) if previous['digests'].get(k) != digests[jid][k]]
+            missing = [o for o in previous.get('outputs', []) if not os.path.exists(o)]
+            if changed:
+                reason = 'changed: ' + ', '.join(changed)
+            elif missing:
+                reason = 'outputs missing'
+            elif len(previous.get('outputs', [])) == 0:
+                reason = 'no recorded outputs'
+            else:
+                reason = None
+        if reason is None:
+            reasons[jid] = 'skipped: unchanged'
+        else:
+            reasons[jid] = reason
+            todo.append(job)
+    return ids, digests, todo, reasons
+
+
+def update_manifest(manifest, ids, digests, reasons, outputs):
+    '''
+    records this run: rebuilt jobs get their new outputs, skipped ones keep the previous entry and
+    jobs that should have been rebuilt but did not finish (error, interrupt) are marked 'not built'
+    '''
+    jobs = {}
+    for jid in ids:
+        if reasons[jid].startswith('skipped'):
+            entry = dict(manifest['jobs'][jid], status='skipped', reason=reasons[jid])
+        else:
+            entry = {'digests': digests[jid], 'outputs': outputs.get(jid, []),
+                     'status': 'rebuilt' if jid in outputs else 'not built', 'reason': reasons[jid]}
+        jobs[jid] = entry
+    manifest['jobs'] = jobs
+    return manifest
@@ -4,37 +4,103 @@
 Python 3 compatible version of plot_creation.py
 """
 
-import latexify
 import numpy as np
 import csv
-import pandas as pd
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import seaborn as sns
 import random
 import ast
+import os
 import sys
-import pylab
 from utilities import *
-from statsmodels.formula.api import ols
-from statsmodels.iolib.summary2 import summary_col
-import statsmodels.api as sm
-from scipy.stats import kendalltau
+import ols_engine
+import cross_time
+import regression_store
+import reference_data
 import copy
-import scipy
-from scipy.stats.stats import pearsonr
-from more_itertools import unique_everseen
-sns.set(style="whitegrid") #TODO test this whitegrid, otherwise remove
+from bias_frame import get_bias_frame
+from lazy_modules import lazy_module
 
-# the plots/final/ here is covered in create_final_plots_all.py by simply plots/ 
-plotsfolder = 'plots/final/'
-pretty_axis_labels = {'male_pairs': 'Men', 'female_pairs': 'Women', 'names_asian': 'Asian', 'names_white': 'White', 'names_hispanic': 'Hispanic', 'words_islam': "Islam", 'words_christianity': 'Christianity'}
+# the plotting and statistics backends are imported on first use, so importing this module (e.g.
+# for a single plot or a results query) stays fast
+style_applied = False
 
-def set_plots_folder(folder):
-    global plotsfolder
-    plotsfolder = folder
+def apply_style():
+    '''
+    LaTeX-style rcParams and the seaborn whitegrid style, applied once before the first figure
+    '''
+    global style_applied
+    if style_applied:
+        return
+    style_applied = True
+    latexify.latexify()
+    sns.set(style="whitegrid") #TODO test this whitegrid, otherwise remove
+
+latexify = lazy_module('latexify')
+pd = lazy_module('pandas')
+mpl = lazy_module('matplotlib')
+plt = lazy_module('matplotlib.pyplot', on_load=apply_style)
+sns = lazy_module('seaborn', on_load=apply_style)
+stats = lazy_module('scipy.stats')
+more_itertools = lazy_module('more_itertools')
+
+# figures go to the folder a plot function is given (create_final_plots_all passes each job's), here by default
+plots_folder = '../output/plots/'
+pretty_axis_labels = {'male_pairs': 'Men', 'female_pairs': 'Women', 'names_asian': 'Asian', 'names_white': 'White', 'names_hispanic': 'Hispanic', 'words_islam': "Islam", 'words_christianity': 'Christianity'}
 
-def do_over_time_trend_test(row, label='', neutral_words='', group1='male', group2='female', limit_to_certain_words=False, limit_words_file='', yrs_to_do=None, saveformat='pdf'):
+# publication reproduces the paper's figures (explicit dpi=1000, bootstrapped 95% regression bands),
+# draft is for exploring: Agg backend, every figure at 100 dpi and no confidence bands to bootstrap, written
+# under their own root so they never overwrite the tracked publication figures
+render_profiles = {
+    'publication': {'backend': None, 'dpi': None, 'regression_ci': 95, 'plots_root': None},
+    'draft': {'backend': 'Agg', 'dpi': 100, 'regression_ci': None, 'plots_root': '../output/plots_draft/'},
+}
+render_profile = 'publication'
+
+def set_render_profile(name):
+    global render_profile
+    if name not in render_profiles:
+        raise ValueError('unknown render profile: {}'.format(name))
+    render_profile = name
+    if render_profiles[name]['backend'] is not None:
+        plt.switch_backend(render_profiles[name]['backend'])
+
+def regression_ci():
+    return render_profiles[render_profile]['regression_ci']
+
+# files written by the plot functions since the last reset_written_outputs(), read by plot_cache
+written_outputs = []
+
+def reset_written_outputs():
+    del written_outputs[:]
+
+def render_folder(folder):
+    '''
+    The folder a figure meant for folder is written to under the current render profile: draft figures
+    go to the same subfolder of the draft root, or get a _draft suffix outside of plots_folder
+    '''
+    root = render_profiles[render_profile]['plots_root']
+    if root is None:
+        return folder, ''
+    relative = os.path.relpath(folder, plots_folder)
+    if relative.startswith('..'):
+        return folder, '_draft'
+    return os.path.join(root, relative), ''
+
+def save_figure(folder, filename, **kwargs):
+    if render_profiles[render_profile]['dpi'] is not None:
+        kwargs['dpi'] = render_profiles[render_profile]['dpi']
+    folder, suffix = render_folder(folder)
+    os.makedirs(folder, exist_ok=True)
+    base, ext = os.path.splitext(filename)
+    path = os.path.join(folder, base + suffix + ext)
+    plt.savefig(path, **kwargs)
+    written_outputs.append(path)
+
+def save_regression(model, name, specification, key=None):
+    regression_store.record(model, name, specification, key)
+    if regression_store.store_file not in written_outputs:
+        written_outputs.append(regression_store.store_file)
+
+def do_over_time_trend_test(row, label='', neutral_words='', group1='male', group2='female', limit_to_certain_words=False, limit_words_file='', yrs_to_do=None, saveformat='pdf', folder=plots_folder):
     yrs = get_years(label)
     if yrs is None:
         return
@@ -46,26 +112,20 @@ def do_over_time_trend_test(row, label='', neutral_words='', group1='male', grou
         limit_words = [word.strip() for word in limit_words]
         print(limit_words)
 
-    occ_differences_dist = []
-    years_all = []
-    done_occups = []
-    for occup in row['indiv_distances_neutral_{}'.format(neutral_words)]:
-        if limit_to_certain_words and occup not in limit_words: continue
-        difs = differences(row['indiv_distances_neutral_{}'.format(neutral_words)][occup][
-                                    group1 + ''][4], row['indiv_distances_neutral_{}'.format(neutral_words)][occup][group2 + ''][4])
-
-        difs_limitedyears = [difs[en] for en,yr in enumerate(yrs) if yr in yrs_to_do]
-        if any(np.isnan(difs_limitedyears)):continue
-
-        occ_differences_dist.extend(difs_limitedyears)
-        years_all.extend(yrs_to_do)
+    frame = get_bias_frame(row, neutral_words, group1, group2)
+    columns = [en for en,yr in enumerate(yrs) if yr in yrs_to_do]
+    keep = frame.complete(columns)
+    if limit_to_certain_words:
+        keep &= np.array([occup in limit_words for occup in frame.words], dtype=bool)
 
-        done_occups.append(occup)
+    occ_differences_dist = frame.values[keep][:, columns].ravel()
+    years_all = list(yrs_to_do) * int(keep.sum())
+    done_occups = [occup for occup, k in zip(frame.words, keep) if k]
 
     plot_scatter_and_regression(x=np.array(years_all), y=np.array(occ_differences_dist), label='trendtest_{}{}{}{}{}{}.{}'.format(label,neutral_words,limit_words_file,stryrstodo,group1, group2, saveformat),\
-     xlabel='Year', ylabel='Embedding Bias')
+     xlabel='Year', ylabel='Embedding Bias', regression_key=regression_store.regression_key(label, neutral_words, group1, group2, plot='trendtest', variant=limit_words_file + stryrstodo), folder=folder)
 
-def plot_averagebias_over_time_consistentoccupations(row, label='', neutral_words='', group1='male', group2='female', overlay_with_occ_percents=False, occ_percents_file=None, occ_func=None, shift=0, limit_to_certain_words=False, limit_words_file='', ylim1=None, ylim2=None, normalize_by_pairsdist=False, pairs_dist_row_file='run_results/finalrun.csv', yrs_to_do=None, shift_yrs_plot_labels=0):
+def plot_averagebias_over_time_consistentoccupations(row, label='', neutral_words='', group1='male', group2='female', overlay_with_occ_percents=False, occ_percents_file=None, occ_func=None, shift=0, limit_to_certain_words=False, limit_words_file='', ylim1=None, ylim2=None, normalize_by_pairsdist=False, pairs_dist_row_file='run_results/finalrun.csv', yrs_to_do=None, shift_yrs_plot_labels=0, folder=plots_folder):
     yrs = get_years(label)
     if yrs is None:
         return
@@ -94,21 +154,19 @@ def plot_averagebias_over_time_consistentoccupations(row, label='', neutral_word
 
     if overlay_with_occ_percents:
             occpercents, occ_weights = load_occupationpercent_data(occ_percents_file, occ_func, yrs_to_do=yrs)
-    for occup in row['indiv_distances_neutral_{}'.format(neutral_words)]:
-        if limit_to_certain_words and occup not in limit_words: continue
-        if overlay_with_occ_percents and occup not in occpercents: continue
-        if overlay_with_occ_percents and any(np.isnan(occpercents[occup])):continue
-        difs = differences(row['indiv_distances_neutral_{}'.format(neutral_words)][occup][
-                                    group1 + ''][4], row['indiv_distances_neutral_{}'.format(neutral_words)][occup][group2 + ''][4])[shift:]
-        if any(np.isnan(difs)):continue
-        if normalize_by_pairsdist:
-            difs = [difs[en]/group_distances[en] for en in range(len(difs))]
-
-        occ_differences_dist.append([difs[en] for en,yr in enumerate(yrs) if yr in yrs_to_do])
-
-        done_occups.append(occup)
+    frame = get_bias_frame(row, neutral_words, group1, group2)
+    difs = frame.values[:, shift:]
+    keep = ~frame.mask[:, shift:].any(axis=1)
+    for en, occup in enumerate(frame.words):
+        if limit_to_certain_words and occup not in limit_words: keep[en] = False
+        elif overlay_with_occ_percents and occup not in occpercents: keep[en] = False
+        elif overlay_with_occ_percents and any(np.isnan(occpercents[occup])): keep[en] = False
+    difs = difs[keep]
+    if normalize_by_pairsdist:
+        difs = difs / np.array(group_distances, dtype=float)[:difs.shape[1]]
 
-    arembed = np.array(occ_differences_dist)
+    arembed = difs[:, [en for en,yr in enumerate(yrs) if yr in yrs_to_do]]
+    done_occups = [occup for occup, k in zip(frame.words, keep) if k]
     if shift!=0: yrs= yrs[0:-shift]
     yrs_plot = [x + shift_yrs_plot_labels for x in yrs]
     # I directly comment the line below as tsplot is not supported anymore
@@ -134,12 +192,12 @@ def plot_averagebias_over_time_consistentoccupations(row, label='', neutral_word
         ax1.legend(h1, l1)
         sns.despine()
     plt.tight_layout()
-    plt.grid(b=True)
+    plt.grid(visible=True)
     if occ_func is None:
         occfuncstr = 'None'
     else:
         occfuncstr = occ_func.savelabel
-    plt.savefig(plotsfolder + '{}{}{}{}{}{}{}_overtimebiases_{}.pdf'.format(
+    save_figure(folder, '{}{}{}{}{}{}{}_overtimebiases_{}.pdf'.format(
         label, neutral_words, limit_words_file, group1, group2,normalize_by_pairsdist, occfuncstr, 'norm'))
     plt.close()
 
@@ -171,9 +229,9 @@ def identify_top_biases_individual_threegroups(row, label='', neutral_words='',
         # print('most {}: {}'.format(group2, [occups_valid[en] for en in np.argsort(occup_differences_group2)[0:15]]))
         # print('most {}: {}'.format(group3, [occups_valid[en] for en in np.argsort(occup_differences_group3)[0:15]]))
 
-        group1order = list(unique_everseen([occups_valid[en] for en in np.argsort(occup_differences_group1)[0:15]]))
-        group2order = list(unique_everseen([occups_valid[en] for en in np.argsort(occup_differences_group2)[0:15]]))
-        group3order = list(unique_everseen([occups_valid[en] for en in np.argsort(occup_differences_group3)[0:15]]))
+        group1order = list(more_itertools.unique_everseen([occups_valid[en] for en in np.argsort(occup_differences_group1)[0:15]]))
+        group2order = list(more_itertools.unique_everseen([occups_valid[en] for en in np.argsort(occup_differences_group2)[0:15]]))
+        group3order = list(more_itertools.unique_everseen([occups_valid[en] for en in np.argsort(occup_differences_group3)[0:15]]))
 
         tab = "\\begin{table}%{width=\\linewidth}\n\\centering\n\\begin{tabular}{ccc}\n"
         tab+='Hispanic & White & Asian \\\\\\hline\n'
@@ -198,9 +256,9 @@ def identify_top_biases_individual(row, label='', neutral_words='', group1='male
 
     occupraw_time0 = []
     occupraw_timelast = []
-    for occup in row['indiv_distances_neutral_{}'.format(neutral_words)]:
-        dif = differences(row['indiv_distances_neutral_{}'.format(neutral_words)][occup][
-                          group1 + ''][4], row['indiv_distances_neutral_{}'.format(neutral_words)][occup][group2 + ''][4])
+    frame = get_bias_frame(row, neutral_words, group1, group2)
+    for occup in frame.words:
+        dif = frame[occup]
         if len(dif)>1:
             firstindex = 3
         else: firstindex = 0
@@ -219,9 +277,9 @@ def identify_top_biases_individual(row, label='', neutral_words='', group1='male
     occup_differences_cossim = []
     occups_cossim = []
     occup_raw_cossim = []
-    for occup in row['indiv_distances_neutral_{}'.format(neutral_words)]:
-        dif = differences(row['indiv_distances_neutral_{}'.format(neutral_words)][occup][
-                          group2 + ''][7], row['indiv_distances_neutral_{}'.format(neutral_words)][occup][group1 + ''][7])
+    frame_cossim = get_bias_frame(row, neutral_words, group1, group2, 'cossim')
+    for occup in frame_cossim.words:
+        dif = frame_cossim[occup]
         if len(dif)>1:
             firstindex = 1
         else: firstindex = 0
@@ -292,8 +350,8 @@ def identify_top_biases_individual(row, label='', neutral_words='', group1='male
         for en in reversed(argsortted_reg[-15:-1]):
             print(occups[en])
 
-        ranks_time0 = scipy.stats.rankdata(occupraw_time0) #rank 0 is most negative, ie most group1
-        ranks_timelast = scipy.stats.rankdata(occupraw_timelast)
+        ranks_time0 = stats.rankdata(occupraw_time0) #rank 0 is most negative, ie most group1
+        ranks_timelast = stats.rankdata(occupraw_timelast)
         ranks_differences = np.subtract(ranks_time0, ranks_timelast) #more negative, more shifted toward group2
         ranks_differences_argsorted = np.argsort(ranks_differences) #index 0 is most negative, i.e. most shifted toward group2
         num_total = float(len(ranks_time0))
@@ -371,46 +429,27 @@ def static_cross_correlation_table(rows, labels, neutral_list_name='occupations1
 
         for en1 in range(len(rows)):
             for en2 in range(len(rows)):
-                corr, pvalue = pearsonr(differences_all_lists[en1], differences_all_lists[en2])
+                corr, pvalue = stats.pearsonr(differences_all_lists[en1], differences_all_lists[en2])
                 print("{}{}{} vs {}{}{}: corr: {} ({})".format(labels[en1], norm_types[en1], indices[en1], labels[en2], norm_types[en2], indices[en2], corr, pvalue))
 
 def test_phase_shift_heatmap(yrs_to_include, heatmap):
-    adjacent_difs_to_test = [[] for _ in range(len(yrs_to_include)-1)]
-    for en1 in range(len(yrs_to_include)-1):
-        for end in range(len(heatmap[en1,:])):
-            adjacent_difs_to_test[en1].append(abs(heatmap[en1+1,end] - heatmap[en1,end]))
+    pvalues = cross_time.phase_shift_ks_pvalues(heatmap)
     for current_checking in range(len(yrs_to_include)-1):
         print('current checking: ', current_checking)
-        adjacent_difs_actualtestones = adjacent_difs_to_test[current_checking]# for x in yr_indices_to_check_change]
-        all_others = []
-        for i in range(len(yrs_to_include)-1):
-            if i != current_checking:  # Fixed: changed 'is not' to '!='
-                all_others.extend(adjacent_difs_to_test[i])
-#         plt.hist([adjacent_difs_actualtestones, all_others], density=True)  # Note: 'normed' deprecated, use 'density'
-#         plt.show()
-
-        print(scipy.stats.ks_2samp(adjacent_difs_actualtestones, all_others)[1])
+        print(pvalues[current_checking])
 
 
-def create_cross_time_correlation_heatmap_differencestoself(row, label='', neutral_words='', group1='', group2='', yrs_to_include=None, saveformat='png'):
+def create_cross_time_correlation_heatmap_differencestoself(row, label='', neutral_words='', group1='', group2='', yrs_to_include=None, saveformat='png', correlation='pearson', folder=plots_folder):
     # 1. Identify list of occupations that are present at every time step
     # 2. For each year, create a rank of relative distances, rank of log proportions
-    consistent_neutral_words_list = []
     if yrs_to_include is None: yrs_to_include = get_years(label)
-    difs_by_year = [[] for _ in yrs_to_include]
 
     yrs_in_distances = get_years(label)
     indices_to_do = [yrs_in_distances.index(yr) for yr in yrs_to_include]
 
-    # print(row['indiv_distances_neutral_{}'.format(neutral_words)])
-    for occup in row['indiv_distances_neutral_{}'.format(neutral_words)]:
-        difs = differences(row['indiv_distances_neutral_{}'.format(neutral_words)][occup][
-                                    group1 + ''][4], row['indiv_distances_neutral_{}'.format(neutral_words)][occup][group2 + ''][4])
-        isnan = np.isnan(difs)
-        if any([isnan[en] for en in indices_to_do]): continue
-        consistent_neutral_words_list.append(occup)
-        for en, i in enumerate(indices_to_do):
-            difs_by_year[en].append(difs[i])
+    frame = get_bias_frame(row, neutral_words, group1, group2)
+    keep = frame.complete(indices_to_do)
+    consistent_neutral_words_list = [occup for occup, k in zip(frame.words, keep) if k]
     #original:        
     # heatmap = np.zeros((len(yrs_to_include), len(yrs_to_include)))
     # heatmap_pvalues = np.zeros((len(yrs_to_include), len(yrs_to_include)))
@@ -421,28 +460,14 @@ def create_cross_time_correlation_heatmap_differencestoself(row, label='', neutr
     #         # heatmap[en1, en2], heatmap_pvalues[en1, en2]  = kendalltau(xrank, yrank)
     #         heatmap[en1, en2], heatmap_pvalues[en1, en2] = pearsonr(difs_by_year[en1], difs_by_year[en2])
     #         # heatmap[en1, en2], heatmap_pvalues[en1, en2]  = scipy.stats.spearmanr(xrank, yrank)
-    heatmap = np.zeros((len(yrs_to_include), len(yrs_to_include)))
-    heatmap_pvalues = np.zeros((len(yrs_to_include), len(yrs_to_include)))
-    for en1 in range(len(yrs_to_include)):
-        for en2 in range(len(yrs_to_include)):
-            # If there are fewer than 2 data points, Pearson’s r is undefined.
-            if len(difs_by_year[en1]) < 2 or len(difs_by_year[en2]) < 2:
-                # Put a neutral value so the rest of the code keeps running
-                heatmap[en1, en2] = 0.0      # "no correlation"
-                heatmap_pvalues[en1, en2] = 1.0
-                continue
-
-            xrank = scipy.stats.stats.rankdata(difs_by_year[en1])
-            yrank = scipy.stats.stats.rankdata(difs_by_year[en2])
-            # heatmap[en1, en2], heatmap_pvalues[en1, en2]  = kendalltau(xrank, yrank)
-            heatmap[en1, en2], heatmap_pvalues[en1, en2] = pearsonr(
-                difs_by_year[en1], difs_by_year[en2]
-                )
-                # heatmap[en1, en2], heatmap_pvalues[en1, en2]  = scipy.stats.spearmanr(xrank, yrank)
-# above are modified lines
-
-#     print(difs_by_year)
-#     print(heatmap)
+    # If there are fewer than 2 data points, the correlations are undefined.
+    if len(consistent_neutral_words_list) < 2:
+        # Put a neutral value so the rest of the code keeps running
+        heatmap = np.zeros((len(yrs_to_include), len(yrs_to_include)))      # "no correlation"
+        heatmap_pvalues = np.ones((len(yrs_to_include), len(yrs_to_include)))
+    else:
+        heatmap, heatmap_pvalues = cross_time.correlation_matrix(frame.values[keep][:, indices_to_do], correlation)
+
     test_phase_shift_heatmap(yrs_to_include, heatmap)
     axx = sns.heatmap(heatmap, annot=True, fmt=".2f", xticklabels=yrs_to_include, yticklabels=yrs_to_include, robust=True, cbar=False, cmap='YlGnBu', annot_kws={"color": 'black'})
     # plt.xlabel('Year')
@@ -455,19 +480,19 @@ def create_cross_time_correlation_heatmap_differencestoself(row, label='', neutr
         labelll.set_weight("bold")
     plt.yticks(rotation=0)
     plt.tight_layout()
-    plt.savefig(plotsfolder + 'correlationheatmap_distancestoself{}{}{}{}.{}'.format(
-        label, neutral_words, group1, group2, saveformat), dpi=1000)
+    save_figure(folder, 'correlationheatmap_distancestoself{}{}{}{}{}.{}'.format(
+        label, neutral_words, group1, group2, '' if correlation == 'pearson' else correlation, saveformat), dpi=1000)
     plt.close()
 
     # sns.heatmap(heatmap_pvalues, annot = True, fmt = ".3f", cmap="YlGnBu", xticklabels = yrs_to_include, yticklabels = yrs_to_include, robust = True)
     # plt.xlabel('Year')
     # plt.ylabel('Year')
     # plt.tight_layout()
-    # plt.savefig(plotsfolder + 'correlationheatmap_pvalues_distancestoself_{}{}{}{}.pdf'.format(
+    # plt.savefig(folder + 'correlationheatmap_pvalues_distancestoself_{}{}{}{}.pdf'.format(
     #     label, neutral_words, group1, group2))
     # plt.close()
 
-def plot_overtime_scatter(row, label='', neutral_words='', group1='male', group2='female', occ_percents_file=None, occ_func=None, ylim1=None, ylim2=None, normalize_by_pairsdist=False, pairs_dist_row_file='run_results/all_selfdist.csv', yrs=None):
+def plot_overtime_scatter(row, label='', neutral_words='', group1='male', group2='female', occ_percents_file=None, occ_func=None, ylim1=None, ylim2=None, normalize_by_pairsdist=False, pairs_dist_row_file='run_results/all_selfdist.csv', yrs=None, kfolds=None, folder=plots_folder):
 
     if yrs is None:
         yrs = get_years(label)
@@ -481,11 +506,12 @@ def plot_overtime_scatter(row, label='', neutral_words='', group1='male', group2
     occ_dist_all = []
     occpercents_all = []
     yrs_all = []
+    occs_all = []
     occpercents, occ_weights = load_occupationpercent_data(occ_percents_file, occ_func, yrs_to_do=yrs)
 
-    for occup in row['indiv_distances_neutral_{}'.format(neutral_words)]:
-        difs = differences(row['indiv_distances_neutral_{}'.format(neutral_words)][occup][
-                                    group1 + ''][4], row['indiv_distances_neutral_{}'.format(neutral_words)][occup][group2 + ''][4])
+    frame = get_bias_frame(row, neutral_words, group1, group2)
+    for occup in frame.words:
+        difs = frame[occup]
         if normalize_by_pairsdist:
             difs = [difs[en]/group_distances[en] for en in range(len(difs))]
         for ind, yr in enumerate(yrs):
@@ -493,80 +519,68 @@ def plot_overtime_scatter(row, label='', neutral_words='', group1='male', group2
             occ_dist_all.append(difs[ind])
             occpercents_all.append(occpercents[occup][ind])
             yrs_all.append(yr)
+            occs_all.append(occup)
 
 #     plot_scatter_and_regression(occpercents_all, occ_dist_all, 'all_differences_dynamic{}{}{}{}{}'.format(label, neutral_words, group1, group2,normalize_by_pairsdist), ylabel = '{} Bias'.format(pretty_axis_labels[group2]), xlabel = occ_func.label, sizes = None, ylim = None, xlim = None,do_regression_with_counts = False, counts = None, condensed_print = True, yrs_for_regression = yrs_all, saveformat = 'png')
 
-    plot_scatter_and_regression(occpercents_all, occ_dist_all, 'all_differences_dynamic{}{}{}{}{}'.format(label, neutral_words, group1, group2,normalize_by_pairsdist), ylabel='{} Bias'.format(pretty_axis_labels[group2]), xlabel=occ_func.label, sizes=None, ylim=None, xlim=None,do_regression_with_counts=False, counts=None, condensed_print=True, yrs_for_regression=yrs_all, saveformat='pdf')
+    plot_scatter_and_regression(occpercents_all, occ_dist_all, 'all_differences_dynamic{}{}{}{}{}'.format(label, neutral_words, group1, group2,normalize_by_pairsdist), ylabel='{} Bias'.format(pretty_axis_labels[group2]), xlabel=occ_func.label, sizes=None, ylim=None, xlim=None,do_regression_with_counts=False, counts=None, condensed_print=True, yrs_for_regression=yrs_all, saveformat='pdf',
+     regression_key=regression_store.regression_key(label, neutral_words, group1, group2, occ_func, plot='all_differences_dynamic', variant='normalized' if normalize_by_pairsdist else ''), folder=folder)
 
     # plot_scatter_and_regression(occ_dist_all, occpercents_all, 'all_differences_dynamic{}{}{}{}{}'.format(label, neutral_words, group1, group2,normalize_by_pairsdist), xlabel = '{} Bias'.format(pretty_axis_labels[group2]), ylabel = occ_func.label, sizes = None, ylim = None, xlim = None,do_regression_with_counts = False, counts = None, condensed_print = True, yrs_for_regression = yrs_all, saveformat = 'pdf', confidenceintervalsoff = True)
 
 
     individual_regression_coefficients_for_overtime_scatter(occ_dist_all, occpercents_all, yrs_all, 'all_differences_dynamic{}{}{}{}{}'.format(label, neutral_words, group1, group2,normalize_by_pairsdist))
 
-    overtime_scatter_errorusingallotheryears(occpercents_all, occ_dist_all, yrs_all, 'all_differences_dynamic{}{}{}{}{}'.format(label, neutral_words, group1, group2,normalize_by_pairsdist), ylabel='{} Bias'.format(pretty_axis_labels[group2]), xlabel=occ_func.label)
+    overtime_scatter_errorusingallotheryears(occpercents_all, occ_dist_all, yrs_all, 'all_differences_dynamic{}{}{}{}{}'.format(label, neutral_words, group1, group2,normalize_by_pairsdist), ylabel='{} Bias'.format(pretty_axis_labels[group2]), xlabel=occ_func.label, occupations=occs_all, kfolds=kfolds, folder=folder)
 
 
 def individual_regression_coefficients_for_overtime_scatter(occup_distances_all, occup_percents_all, years_all, label):
     #train a separate model for each year, report the coefficient, r^2, and p-value for each year in a table in the appendix
     yrs_order = list(sorted(set(years_all)))
     print('{} & {} & {} & {} & {} & {} \\\\'.format('Year', 'r^2', 'coefficient p-value', 'coefficient value', 'intercept p-value', 'intercept value'))
+    X, names = ols_engine.design([('occup percent', occup_percents_all)])
+    models = ols_engine.fit_groups(occup_distances_all, X, years_all, names)
     for yr in yrs_order:
-        y = [occup_distances_all[en] for en in range(len(occup_distances_all)) if years_all[en] == yr]
-        x = [occup_percents_all[en] for en in range(len(occup_percents_all)) if years_all[en] == yr]
-        df = pd.DataFrame([y, x])
-        df = df.transpose()
-        df.columns = ['embedding bias', 'occup percent']
-        df['const'] = 1
-        model = sm.OLS(df['embedding bias'], df[['occup percent', 'const']]).fit()
-        print('{} & ${:.4}$ & ${:.4}$ & ${:.4} \pm {:.4}$& ${:.4}$ & ${:.4} \pm {:.4}$\\\\'.format(yr,model.rsquared,model.pvalues[0], model.params[0], model.bse[0],model.pvalues[1], model.params[1], model.bse[1])) # summarize_model(model)
-
-
-def overtime_scatter_errorusingallotheryears(x, y, years_all, label, xlabel='', ylabel='', saveformat='pdf'):
-    df = pd.DataFrame([y, x])
-    df = df.transpose()
-    df.columns = ['y', 'x']
-    df['const'] = 1
-    model_allyears = sm.OLS(df['y'], df[df.columns[1:]]).fit()
-
-    yrs_order = list(sorted(set(years_all)))
+        model = models[yr]
+        print('{} & ${:.4}$ & ${:.4}$ & ${:.4} \pm {:.4}$& ${:.4}$ & ${:.4} \pm {:.4}$\\\\'.format(yr,model.rsquared,model.pvalues.iloc[0], model.params.iloc[0], model.bse.iloc[0],model.pvalues.iloc[1], model.params.iloc[1], model.bse.iloc[1])) # summarize_model(model)
+
+
+def overtime_scatter_errorusingallotheryears(x, y, years_all, label, xlabel='', ylabel='', saveformat='pdf', occupations=None, kfolds=None, folder=plots_folder):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    years_all = np.asarray(years_all)
+    X, names = ols_engine.design([('x', x)])
+    model_allyears = ols_engine.fit(y, X, names)
+    models_thisyear = ols_engine.fit_groups(y, X, years_all, names)
+    predicted_allyears = model_allyears.predict(X)
+    #train model on all other years, get MSE
+    leave_one_year_out = ols_engine.cross_validate(y, X, years_all)
+
+    yrs_order = list(sorted(set(years_all.tolist())))
     pallete = sns.color_palette("hls", len(yrs_order))
-    print('{} & {} & {} \\\\'.format('Year', 'MSE using own model', 'MSE using model from other years'))
+    print('{} & {} & {} & {} \\\\'.format('Year', 'MSE using own model', 'MSE using model from all years', 'MSE using model from other years'))
     for enn, yr in enumerate(yrs_order):
         #train model on specific year only, get MSE;
-        xloc_thisyear = [x[en] for en in range(len(x)) if years_all[en] == yr]
-        yloc_thisyear = [y[en] for en in range(len(y)) if years_all[en] == yr]
-        sns.regplot(x=np.array(xloc_thisyear), y=np.array(yloc_thisyear), scatter=True, color=pallete[enn],scatter_kws={'s':10})
-
-        df = pd.DataFrame([yloc_thisyear, xloc_thisyear])
-        df = df.transpose()
-        df.columns = ['y', 'x']
-        df['const'] = 1
-        model_thisyear = sm.OLS(df['y'], df[df.columns[1:]]).fit()
-        mse_thisyear = np.average(np.power(np.subtract(yloc_thisyear, model_thisyear.fittedvalues), 2))
-
-        #train model on all other years, get MSE
-        xloc = [x[en] for en in range(len(x)) if years_all[en] != yr]
-        yloc = [y[en] for en in range(len(y)) if years_all[en] != yr]
-        df = pd.DataFrame([yloc, xloc])
-        df = df.transpose()
-        df.columns = ['y', 'x']
-        df['const'] = 1
-        model_exceptthisyear = sm.OLS(df['y'], df[df.columns[1:]]).fit()
-        mse_exceptthisyear = np.average(np.power(np.subtract(yloc_thisyear, [model_exceptthisyear.predict((xx,1))[0] for xx in xloc_thisyear]), 2))
+        thisyear = years_all == yr
+        sns.regplot(x=x[thisyear], y=y[thisyear], scatter=True, color=pallete[enn],scatter_kws={'s':10}, ci=regression_ci())
 
+        mse_thisyear = np.average(np.power(y[thisyear] - models_thisyear[yr].fittedvalues.values, 2))
         #MSE using all years model
-        mse_forallyears = np.average(np.power(np.subtract(yloc_thisyear, [model_allyears.predict((xx,1))[0] for xx in xloc_thisyear]), 2))
-        print('{} & ${:.4}$ & ${:.4}$ \\\\'.format(yr, mse_thisyear, mse_forallyears))
-    sns.regplot(x=np.array(x), y=np.array(y), scatter=False, color='b')
+        mse_forallyears = np.average(np.power(y[thisyear] - predicted_allyears[thisyear], 2))
+        print('{} & ${:.4}$ & ${:.4}$ & ${:.4}$ \\\\'.format(yr, mse_thisyear, mse_forallyears, leave_one_year_out['mse'][yr]))
+    if occupations is not None and kfolds is not None:
+        kfold = ols_engine.cross_validate(y, X, ols_engine.kfold_labels(occupations, kfolds))
+        print('{}-fold cross-validation over occupations, held-out MSE: {:.4}'.format(kfolds, np.average(np.power(y - kfold['predictions'], 2))))
+    sns.regplot(x=np.array(x), y=np.array(y), scatter=False, color='b', ci=regression_ci())
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
     plt.tight_layout()
-    plt.grid(b=True)
+    plt.grid(visible=True)
     sns.despine()
-    plt.savefig(plotsfolder + 'regression_allyears_withoutscatter{}.{}'.format(label, saveformat), dpi=1000)
+    save_figure(folder, 'regression_allyears_withoutscatter{}.{}'.format(label, saveformat), dpi=1000)
     plt.close()
 
-def residual_analysis_with_stereotypes(row, label, neutral_list_name='occupations1950', group1='male_pairs', group2='female_pairs', occ_percents_file='../data/word_lists/occupation_percentages_gender_occ1950.csv', load_objective_data=load_occupationpercent_data, occ_func=occupation_func_female_percent, stereotype_file='../data/word_lists/mturk_stereotypes.csv', load_stereotype_data=load_mturkstereotype_data, norm_type='norm', saveformat='pdf'):
+def residual_analysis_with_stereotypes(row, label, neutral_list_name='occupations1950', group1='male_pairs', group2='female_pairs', occ_percents_file='../data/word_lists/occupation_percentages_gender_occ1950.csv', load_objective_data=load_occupationpercent_data, occ_func=occupation_func_female_percent, stereotype_file='../data/word_lists/mturk_stereotypes.csv', load_stereotype_data=load_mturkstereotype_data, norm_type='norm', saveformat='pdf', folder=plots_folder):
 
     differences, differences_cossim = get_biases_individual(row, label=label, neutral_words=neutral_list_name, group1=group1, group2=group2)
     occpercents, occ_weights = load_objective_data(occ_percents_file, occ_func, yrs_to_do=get_years(label))
@@ -591,22 +605,25 @@ def residual_analysis_with_stereotypes(row, label, neutral_list_name='occupation
 
     #scatter limited occupations (for which have turk scores): embeddings bias vs occupation percent
     plot_scatter_and_regression(occ_props, embedding_difs,'{}{}_distancedifferencessameyear_vs_percents_{}{}{}{}'.format(label, get_years(label)[-1],neutral_list_name, group1, group2, 'occupationsMturk'),sizes=None, ylabel='{} Bias'.format(pretty_axis_labels[group2]), xlabel=occ_func.label, xlim=None\
-    , ylim=None, do_regression_with_counts=False, counts=None, condensed_print=False, saveformat=saveformat, includesquared=False)
+    , ylim=None, do_regression_with_counts=False, counts=None, condensed_print=False, saveformat=saveformat, includesquared=False,
+    regression_key=regression_store.regression_key(label, neutral_list_name, group1, group2, occ_func, plot='distancedifferencessameyear_vs_percents', variant='stereotypes', year=get_years(label)[-1]), folder=folder)
 
     #scatter stereotype score vs occupation proportion
     plot_scatter_and_regression(occ_props,stereotype_scores,'{}{}turkstereotypescores_vs_percents_{}{}{}'.format(label, get_years(label)[-1],neutral_list_name, group1, group2),sizes=None, ylabel='Stereotype Score', xlabel=occ_func.label, xlim=None\
-    , ylim=None, do_regression_with_counts=False, counts=None, condensed_print=False, saveformat=saveformat, includesquared=False)
+    , ylim=None, do_regression_with_counts=False, counts=None, condensed_print=False, saveformat=saveformat, includesquared=False,
+    regression_key=regression_store.regression_key(label, neutral_list_name, group1, group2, occ_func, plot='turkstereotypescores_vs_percents', year=get_years(label)[-1]), folder=folder)
 
     #scatter stereotype score vs embedding bias
     plot_scatter_and_regression(stereotype_scores, embedding_difs,'{}{}turkstereotypescores_vs_embedding_{}{}{}'.format(label, get_years(label)[-1],neutral_list_name, group1, group2),sizes=None, ylabel='{} Bias'.format(pretty_axis_labels[group2]), xlabel="Stereotype Score", ylim=[-.15, .15]\
-    , xlim=None, do_regression_with_counts=False, counts=None, condensed_print=False, saveformat=saveformat, includesquared=False)
+    , xlim=None, do_regression_with_counts=False, counts=None, condensed_print=False, saveformat=saveformat, includesquared=False,
+    regression_key=regression_store.regression_key(label, neutral_list_name, group1, group2, plot='turkstereotypescores_vs_embedding', year=get_years(label)[-1]), folder=folder)
 
     print('occupations: ', str(occupations_in_order))
 
     #look at residuals of each vs occupation to see if correlated
     resids_embedding = get_model_residuals(embedding_difs, occ_props)
     resids_stereotypes = get_model_residuals(stereotype_scores, occ_props)
-    print('Pearson Correlation of residuals: {}'.format(pearsonr(resids_embedding, resids_stereotypes)))
+    print('Pearson Correlation of residuals: {}'.format(stats.pearsonr(resids_embedding, resids_stereotypes)))
     order = np.argsort(resids_embedding)
     for en in order:
         print('{}: {:.2f}, {:.2f}'.format(occupations_in_order[en], resids_embedding[en], resids_stereotypes[en]))
@@ -618,31 +635,12 @@ def residual_analysis_with_stereotypes(row, label, neutral_list_name='occupation
     # print(pearsonr(resids_embedding, embedding_difs))
     # print(pearsonr(resids_stereotypes, stereotype_scores))
     #look at models for predicting embedding bias using either score, or both together
-    df = pd.DataFrame([embedding_difs, occ_props])
-    df = df.transpose()
-    df.columns = ['embedding bias', 'occupation proportion']
-    df['const'] = 1
-    model = sm.OLS(df['embedding bias'], df[['occupation proportion', 'const']]).fit()
-    print(model.summary().as_latex())
-    print(model.pvalues)
-
-    df = pd.DataFrame([embedding_difs, stereotype_scores])
-    df = df.transpose()
-    df.columns = ['embedding bias', 'stereotype_scores']
-    df['const'] = 1
-    model = sm.OLS(df['embedding bias'], df[['stereotype_scores', 'const']]).fit()
-    print(model.summary().as_latex())
-    print(model.pvalues)
-
-    df = pd.DataFrame([embedding_difs, occ_props, stereotype_scores])
-    df = df.transpose()
-    df.columns = ['embedding bias', 'occupation proportion', 'stereotype_scores']
-    df['const'] = 1
-    model = sm.OLS(df['embedding bias'], df[['occupation proportion', 'stereotype_scores', 'const']]).fit()
-    print(model.summary().as_latex())
-    print(model.pvalues)
+    for columns in [[('occupation proportion', occ_props)], [('stereotype_scores', stereotype_scores)], [('occupation proportion', occ_props), ('stereotype_scores', stereotype_scores)]]:
+        model = ols_engine.fit(embedding_difs, *ols_engine.design(columns))
+        print(ols_engine.summary_latex(model))
+        print(model.pvalues)
 
-def scatter_occupation_percents_distances(row, label, neutral_list_name='occupations1950', group1='male_pairs', group2='female_pairs', index=0, occ_percents_file='../data/word_lists/occupation_percentages_gender_occ1950.csv', load_objective_data=load_occupationpercent_data, occ_func=occupation_func_female_percent, ylim=[-6, 6], xlim=[-.15, .15], do_regression_with_counts=False, condensed_print=False, norm_type='norm', saveformat='pdf', toskip=[], limitfile=None):
+def scatter_occupation_percents_distances(row, label, neutral_list_name='occupations1950', group1='male_pairs', group2='female_pairs', index=0, occ_percents_file='../data/word_lists/occupation_percentages_gender_occ1950.csv', load_objective_data=load_occupationpercent_data, occ_func=occupation_func_female_percent, ylim=[-6, 6], xlim=[-.15, .15], do_regression_with_counts=False, condensed_print=False, norm_type='norm', saveformat='pdf', toskip=[], limitfile=None, folder=plots_folder):
 
     differences, differences_cossim = get_biases_individual(row, label=label, neutral_words=neutral_list_name, group1=group1, group2=group2)
     occpercents, occ_weights = load_objective_data(occ_percents_file, occ_func, yrs_to_do=get_years(label))
@@ -683,11 +681,13 @@ def scatter_occupation_percents_distances(row, label, neutral_list_name='occupat
     print('most y axis negative: {}'.format([(occupations_in_order[en], scatter_vals[0][en], scatter_vals[1][en]) for en in np.argsort(scatter_vals[0])[0:5]]))
 
     if norm_type == 'norm':
-        plot_scatter_and_regression(scatter_vals[1],scatter_vals[0],'{}{}_distancedifferencessameyear_vs_percents_{}{}{}{}{}'.format(label, get_years(label)[index],neutral_list_name, group1, group2, limitfile,occ_func.savelabel),sizes=scatter_sizes, ylabel='{} Bias'.format(pretty_axis_labels[group2]), xlabel=occ_func.label, ylim=ylim, xlim=xlim, do_regression_with_counts=do_regression_with_counts, counts=occ_freq_counts, condensed_print=condensed_print, saveformat=saveformat)
+        plot_scatter_and_regression(scatter_vals[1],scatter_vals[0],'{}{}_distancedifferencessameyear_vs_percents_{}{}{}{}{}'.format(label, get_years(label)[index],neutral_list_name, group1, group2, limitfile,occ_func.savelabel),sizes=scatter_sizes, ylabel='{} Bias'.format(pretty_axis_labels[group2]), xlabel=occ_func.label, ylim=ylim, xlim=xlim, do_regression_with_counts=do_regression_with_counts, counts=occ_freq_counts, condensed_print=condensed_print, saveformat=saveformat,
+            regression_key=regression_store.regression_key(label, neutral_list_name, group1, group2, occ_func, plot='distancedifferencessameyear_vs_percents', variant=limitfile, year=get_years(label)[index]), folder=folder)
         return scatter_vals[0]
 
     else:
-        plot_scatter_and_regression(scatter_vals_cossim[0], scatter_vals_cossim[1],'{}{}_distancedifferencessameyear_vs_percents_{}{}{}_{}'.format(label, get_years(label)[index],neutral_list_name, group1, group2, 'cossim'),sizes=scatter_sizes, xlabel='{} Bias'.format(pretty_axis_labels[group2]), ylabel=occ_func.label, ylim=ylim, xlim=None, do_regression_with_counts=do_regression_with_counts, counts=occ_freq_counts, condensed_print=condensed_print, saveformat=saveformat)
+        plot_scatter_and_regression(scatter_vals_cossim[0], scatter_vals_cossim[1],'{}{}_distancedifferencessameyear_vs_percents_{}{}{}_{}'.format(label, get_years(label)[index],neutral_list_name, group1, group2, 'cossim'),sizes=scatter_sizes, xlabel='{} Bias'.format(pretty_axis_labels[group2]), ylabel=occ_func.label, ylim=ylim, xlim=None, do_regression_with_counts=do_regression_with_counts, counts=occ_freq_counts, condensed_print=condensed_print, saveformat=saveformat,
+            regression_key=regression_store.regression_key(label, neutral_list_name, group1, group2, occ_func, plot='distancedifferencessameyear_vs_percents', variant='cossim', year=get_years(label)[index]), folder=folder)
         return scatter_vals_cossim[0]
 
 def get_highest_residual_occupations(distances, percents, group1, group2, occupations_in_order):
@@ -714,45 +714,23 @@ def get_highest_residual_occupations(distances, percents, group1, group2, occupa
     print('More {} biased than percent implies: {}'.format(group2, [(occupations_in_order[order_highest_residuals[-inn]], residuals[order_highest_residuals[-inn]]) for inn in range(1, 16)]))
 
 def get_biases_individual(row, label='', neutral_words='', group1='male', group2='female'):
-    yrs = get_years(label)
-    occ_differences_dist = {}
-    occ_differences_cossim = {}
-
-    for occup in row['indiv_distances_neutral_{}'.format(neutral_words)]:
-        occ_differences_dist[occup] = differences(row['indiv_distances_neutral_{}'.format(neutral_words)][occup][
-                                                  group1 + ''][4], row['indiv_distances_neutral_{}'.format(neutral_words)][occup][group2 + ''][4])
-
-    for occup in row['indiv_distances_neutral_{}'.format(neutral_words)]:
-        occ_differences_cossim[occup] = differences(row['indiv_distances_neutral_{}'.format(neutral_words)][
-                                                    occup][group2 + ''][7], row['indiv_distances_neutral_{}'.format(neutral_words)][occup][group1 + ''][7])
+    occ_differences_dist = get_bias_frame(row, neutral_words, group1, group2).as_dict()
+    occ_differences_cossim = get_bias_frame(row, neutral_words, group1, group2, 'cossim').as_dict()
     return occ_differences_dist, occ_differences_cossim
 
 def get_model_residuals(x, y):
-    df = pd.DataFrame([y, x, [xx*xx for xx in x]])
-    df = df.transpose()
-    df.columns = ['y', 'x', 'x_squared']
-    df['const'] = 1
-    model = sm.OLS(df['y'], df[['x', 'x_squared', 'const']]).fit()
+    model = ols_engine.fit(y, *ols_engine.design([('x', x), ('x_squared', [xx*xx for xx in x])]))
     return model.resid
 
-def princeton_trilogy_plots(row, label, group1em, group2em, group2princeton):
+def princeton_trilogy_plots(row, label, group1em, group2em, group2princeton, folder=plots_folder):
     differences, differences_cossim = get_biases_individual(row, label=label, neutral_words='adjectives_princeton', group1=group1em, group2=group2em)
 #     print(differences)
     yr_strings = ['1930', '1950', '1960']
     yr_indices = [2, 4, 5]
     #load the stereotypes csv file
-    sscores = {}
     with open('../data/word_lists/adjectives_princeton.txt', 'r') as f:
         allwords = [x[0] for x in list(csv.reader(f))]
-    with open('../data/word_lists/princeton_stereotypes.csv', 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            yrdict = sscores.get(row['group'], {})
-            yrdictyr = yrdict.get(row['year'], {})
-            if len(row['score'])>0:
-                yrdictyr[row['word']] = (float(row['score']), row['top151933'] == 'TRUE')
-                yrdict[row['year']] = yrdictyr
-                sscores[row['group']] = yrdict
+    sscores = reference_data.princeton_stereotypes('../data/word_lists/princeton_stereotypes.csv')
 
     #then, for these top 15, plot a scatter of differences between 1930 and 1960s embeddings vs differences in scores
     emdifs = []
@@ -763,7 +741,8 @@ def princeton_trilogy_plots(row, label, group1em, group2em, group2princeton):
             scores.append(sscores[group2princeton]['1960'][wrd][0] - sscores[group2princeton]['1930'][wrd][0])
             print(wrd, emdifs[-1],scores[-1])
 
-    plot_scatter_and_regression(x=np.array(scores), y=np.array(emdifs), label="princetontrilogy_differencesbwyears_{}{}{}".format(label, group1em, group2em), xlabel='Chinese Score(1967) - Score(1933)', ylabel='Chinese Embedding bias change')
+    plot_scatter_and_regression(x=np.array(scores), y=np.array(emdifs), label="princetontrilogy_differencesbwyears_{}{}{}".format(label, group1em, group2em), xlabel='Chinese Score(1967) - Score(1933)', ylabel='Chinese Embedding bias change',
+        regression_key=regression_store.regression_key(label, 'adjectives_princeton', group1em, group2em, plot='princetontrilogy_differencesbwyears', variant=group2princeton), folder=folder)
 
     #just do a scatter of all year scores for chinese with relevant embedding score
     emdifs = []
@@ -776,10 +755,11 @@ def princeton_trilogy_plots(row, label, group1em, group2em, group2princeton):
             print(wrd, yr, differences[wrd][yr_indices[en]],sscores[group2princeton][yr][wrd][0])
 #     print(scores, emdifs)
 
-    plot_scatter_and_regression(x=np.array(scores), y=np.array(emdifs),label="princetontrilogy_allpoints_{}{}{}".format(label, group1em, group2em), xlabel='Princeton Trilogy Chinese Score', ylabel='Chinese Embedding bias')
+    plot_scatter_and_regression(x=np.array(scores), y=np.array(emdifs),label="princetontrilogy_allpoints_{}{}{}".format(label, group1em, group2em), xlabel='Princeton Trilogy Chinese Score', ylabel='Chinese Embedding bias',
+        regression_key=regression_store.regression_key(label, 'adjectives_princeton', group1em, group2em, plot='princetontrilogy_allpoints', variant=group2princeton), folder=folder)
 
 
-def plot_scatter_and_regression(x, y, label, xlabel='', ylabel='', sizes=None, ylim=None, xlim=None,do_regression_with_counts=False, counts=None, condensed_print=False, yrs_for_regression=None, saveformat='pdf', confidenceintervalsoff=False, includesquared=False):
+def plot_scatter_and_regression(x, y, label, xlabel='', ylabel='', sizes=None, ylim=None, xlim=None,do_regression_with_counts=False, counts=None, condensed_print=False, yrs_for_regression=None, saveformat='pdf', confidenceintervalsoff=False, includesquared=False, regression_key=None, folder=plots_folder):
 
     if sizes is not None:
         sizes = [np.sqrt(xx) for xx in sizes]
@@ -807,127 +787,57 @@ def plot_scatter_and_regression(x, y, label, xlabel='', ylabel='', sizes=None, y
         sns.despine()
         cistring = 'noconfidenceintervals'
     else:
-        sns.regplot(x=x, y=y, scatter=True, scatter_kws=scatter_kws, truncate=True)#,scatter_kws={"s": sizes})
+        sns.regplot(x=x, y=y, scatter=True, scatter_kws=scatter_kws, ci=regression_ci(), truncate=True)#,scatter_kws={"s": sizes})
         sns.despine()
 
     if ylim is not None: plt.ylim(ylim)
     if xlim is not None: plt.xlim(xlim)
-    plt.grid(b=True)  # Note: 'b' parameter deprecated in newer matplotlib, use 'visible=True' instead
+    plt.grid(visible=True)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
     plt.tight_layout()
-    plt.savefig(plotsfolder + 'scatterregression_{}{}.{}'.format(label, cistring, saveformat), dpi=1000)
+    save_figure(folder, 'scatterregression_{}{}.{}'.format(label, cistring, saveformat), dpi=1000)
     plt.close()
     # print((linregress(x, y)))
 
     if do_regression_with_counts:
         counts = np.array([counts[en] for en in order])
-        df = pd.DataFrame([y, x, counts])
-        df = df.transpose()
-        df.columns = [ylabel, xlabel, 'counts']
-        df['const'] = 1
-        model = sm.OLS(df[ylabel], df[[xlabel, 'counts', 'const']]).fit()
+        model = ols_engine.fit(y, *ols_engine.design([(xlabel, x), ('counts', counts)]))
+        specification = 'linear_counts'
 
-        # model = ols("y ~ x + counts + 1", df).fit()
     elif yrs_for_regression is not None: #do extra regression with years as regressor
         print('regression with only years')
         yrs = np.array([yrs_for_regression[en] for en in order])
-        # original:
-        # df = pd.DataFrame([y, yrs])
-        # df = df.transpose()
-        # df.columns = [ylabel, 'yr']
-        # dummies = pd.get_dummies(df, prefix = 'yr', columns = ['yr'])
-        # df['const'] = 1
-        # df.drop('yr', axis=1, inplace=True)
-        # df[dummies.columns] = dummies
-        df = pd.DataFrame({'y_temp': y, 'yr': yrs})
-        dummies = pd.get_dummies(df['yr'], prefix='yr', dtype=float)
-        df['const'] = 1.0
-        df = pd.concat([df[['y_temp', 'const']], dummies], axis=1)
-        df.columns = [ylabel if col == 'y_temp' else col for col in df.columns]
-        # Explicitly convert all columns to float64
-        for col in df.columns:
-            df[col] = df[col].astype('float64')
-
-        model = sm.OLS(df[ylabel], df[df.columns[1:]]).fit()
-        print(model.summary().as_latex())
+        model = ols_engine.fit(y, *ols_engine.design([], dummies=yrs))
+        print(ols_engine.summary_latex(model))
         print(model.pvalues)
         print('regression with x and years')
 
-        yrs = np.array([yrs_for_regression[en] for en in order])
-        df = pd.DataFrame([y, x, yrs])
-
-        # same modifications here. original:
-        # df = df.transpose()
-        # df.columns = [ylabel, xlabel, 'yr']
-        # dummies = pd.get_dummies(df, prefix = 'yr', columns = ['yr'])
-        # df['const'] = 1
-        # df.drop('yr', axis=1, inplace=True)
-        # df[dummies.columns] = dummies
-        df = pd.DataFrame({'y_temp': y, 'x_temp': x, 'yr': yrs})
-        dummies = pd.get_dummies(df['yr'], prefix='yr', dtype=float)
-        df['const'] = 1.0
-        df = pd.concat([df[['y_temp', 'x_temp', 'const']], dummies], axis=1)
-        df.columns = [ylabel if col == 'y_temp' else (xlabel if col == 'x_temp' else col) for col in df.columns]
-        # Explicitly convert all columns to float64
-        for col in df.columns:
-            df[col] = df[col].astype('float64')
-        
-
-        model = sm.OLS(df[ylabel], df[df.columns[1:]]).fit()
-        print(model.summary().as_latex())
+        model = ols_engine.fit(y, *ols_engine.design([(xlabel, x)], dummies=yrs))
+        print(ols_engine.summary_latex(model))
         print(model.pvalues)
-        df_save = summarize_model(model)
-        df_save.to_csv('../output/regressions/{}withyears.csv'.format(label))
-
-        df = pd.DataFrame([y, x])
-        df = df.transpose()
-        df.columns = [ylabel, xlabel]
-        df['const'] = 1
-        model = sm.OLS(df[ylabel], df[df.columns[1:]]).fit()
+        save_regression(model, label, 'linear_year_dummies', regression_key)
+
+        model = ols_engine.fit(y, *ols_engine.design([(xlabel, x)]))
         #print average residual by year:
         residuals= model.resid
         print('average residual by year:')
         for yr in list(sorted(set(yrs))):
             print('{}: {}'.format(yr, np.average([residuals[en] for en in range(len(yrs)) if yrs[en] == yr])))
+        specification = 'linear'
     elif includesquared:
-        df = pd.DataFrame([y, x, np.array([xx**2 for xx in x])])
-        df = df.transpose()
-        df.columns = [ylabel, xlabel, xlabel + '_squared']
-        df['const'] = 1
-        model = sm.OLS(df[ylabel], df[[xlabel, xlabel + '_squared', 'const']]).fit()
+        model = ols_engine.fit(y, *ols_engine.design([(xlabel, x), (xlabel + '_squared', np.array([xx**2 for xx in x]))]))
+        specification = 'quadratic'
     else:
-        df = pd.DataFrame([y, x])
-        df = df.transpose()
-        df.columns = [ylabel, xlabel]
-        df['const'] = 1
-        model = sm.OLS(df[ylabel], df[[xlabel, 'const']]).fit()
+        model = ols_engine.fit(y, *ols_engine.design([(xlabel, x)]))
+        specification = 'linear'
 
-    print(model.summary().as_latex())
+    print(ols_engine.summary_latex(model))
     print(model.pvalues)
 
-    df_save = summarize_model(model)
-    df_save.to_csv('../output/regressions/{}.csv'.format(label))
+    save_regression(model, label, specification, regression_key)
 
-def summarize_model(model_result):
-    '''
-    copied from https://github.com/statsmodels/statsmodels/blob/master/statsmodels/sandbox/multilinear.py
-    '''
-    statistics = pd.Series({'r2': model_result.rsquared,
-                  'adj_r2': model_result.rsquared_adj})
-    # put them togher with the result for each term
-    result_df = pd.DataFrame({'params': model_result.params,
-                              'pvals': model_result.pvalues,
-                              'std': model_result.bse,
-                              'statistics': statistics})
-    # add the complexive results for f-value and the total p-value
-    fisher_df = pd.DataFrame({'params': {'_f_test': model_result.fvalue},
-                              'pvals': {'_f_test': model_result.f_pvalue}})
-    # merge them and unstack to obtain a hierarchically indexed series
-    res_series = pd.concat([result_df, fisher_df]).unstack()
-    return res_series.dropna()
-
-def plot_mean_counts_together(row, label, wordlists, printlabel):
+def plot_mean_counts_together(row, label, wordlists, printlabel, folder=plots_folder):
     mapp = {'names_chinese': "Chinese names", 'names_white': "White names", 'names_hispanic': "Hispanic names", 'names_asian': "Asian names", 'names_black': "Black names", 'male_pairs': 'Words associated with Men', 'female_pairs': 'Words associated with Women', \
      'occupations1950': 'Occupations', 'adjectives_williamsbest': 'Adjectives from Williams and Best', 'personalitytraits_original': 'Personality Traits', 'names_russian': "Russian names",\
     'adjectives_princeton': 'Princeton trilogy', 'adjectives_otherization': 'Otherization adjectives', 'adjectives_appearance': "Appearance", 'adjectives_intelligencegeneral': "Intelligence"
@@ -946,11 +856,11 @@ def plot_mean_counts_together(row, label, wordlists, printlabel):
     plt.xlabel('Year')
     plt.yscale('log')
     lgd = plt.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
-    plt.savefig('../output/plots/appendix/avgfreqovertime_{}{}.pdf'.format(
+    save_figure(folder, 'avgfreqovertime_{}{}.pdf'.format(
         label, printlabel), bbox_extra_artists=(lgd,), bbox_inches='tight')
     plt.close()
 
-def plot_vector_variances_together(row, label, wordlists, printlabel):
+def plot_vector_variances_together(row, label, wordlists, printlabel, folder=plots_folder):
     mapp = {'names_chinese': "Chinese names", 'names_white': "White names", 'names_hispanic':\
      "Hispanic names", 'names_asian': "Asian names", 'names_black': "Black names", 'male_pairs': 'Words associated with Men', 'female_pairs': 'Words associated with Women', \
      'occupations1950': 'Occupations', 'adjectives_williamsbest': 'Adjectives from Williams and Best', 'personalitytraits_original':\
@@ -962,11 +872,11 @@ def plot_vector_variances_together(row, label, wordlists, printlabel):
     plt.ylabel('Group vector variance')
     plt.xlabel('Year')
     lgd = plt.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
-    plt.savefig('../output/plots/appendix/varianceovertime_{}{}.pdf'.format(
+    save_figure(folder, 'varianceovertime_{}{}.pdf'.format(
         label, printlabel), bbox_extra_artists=(lgd,), bbox_inches='tight')
     plt.close()
 
-def vocab_counts(row, label, wordlist, plot=False, indices=None):
+def vocab_counts(row, label, wordlist, plot=False, indices=None, folder=plots_folder):
     mins = []
     words= []
     all_freqs = []
@@ -989,7 +899,7 @@ def vocab_counts(row, label, wordlist, plot=False, indices=None):
     if plot:
         plt.yscale('log')
         plt.tight_layout()
-        plt.savefig('../output/plots/freqovertime_{}{}.pdf'.format(
+        save_figure(folder, 'freqovertime_{}{}.pdf'.format(
             label, wordlist))
         plt.close()
     mean_freqs = np.mean(all_freqs, axis=0)
@@ -998,6 +908,6 @@ def vocab_counts(row, label, wordlist, plot=False, indices=None):
         plt.plot(get_years(label), mean_freqs)
         plt.yscale('log')
         plt.tight_layout()
-        plt.savefig('../output/plots/avgfreqovertime_{}{}.pdf'.format(
+        save_figure(folder, 'avgfreqovertime_{}{}.pdf'.format(
             label, wordlist))
         plt.close()
\ No newline at end of file
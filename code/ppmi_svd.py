@@ -0,0 +1,116 @@
+'''
+PPMI-SVD embeddings of a sparse co-occurrence matrix, a fast alternative to glove_trainer for our
+own corpora (the Newsroom windows, COHA text), built as HistWords built its 'svd' vectors.
+
+ppmi_matrix weights the co-occurrences with positive pointwise mutual information and context
+distribution smoothing (Levy, Goldberg and Dagan 2015): the context probabilities are taken from
+the counts raised to cds = 0.75, which lowers the PMI of rare contexts, and neg > 1 shifts every
+PMI by log(neg). The result keeps only the positive entries, so it is as sparse as the counts.
+randomized_svd then finds the leading dim singular vectors with a randomized range finder (Halko,
+Martinsson and Tropp 2011; a few power iterations, sign of every vector fixed), touching the matrix
+only through sparse products, and the embeddings are U * s^eig (eig = 0, HistWords' default, gives
+U alone).
+
+From the command line every window of the Newsroom shards (window_cooc) is embedded and written
+to the vector store with its word counts (embedding_io), and --params-row runs changes_over_time
+on the new label with the word lists of a run_params.csv row:
+
+    python ppmi_svd.py --label newsroom_svd --params-row nyt
+'''
+import argparse
+import csv
+
+import numpy as np
+from scipy import sparse
+
+import corpus_stream
+import embedding_io
+import profiling
+import window_cooc
+
+window_years = list(range(1999, 2016))
+
+
+def ppmi_matrix(cooc, cds=0.75, neg=1):
+    '''
+    CSR matrix of max(0, PMI - log(neg)) with the context distribution smoothed by cds
+    '''
+    coo = sparse.coo_matrix(cooc)
+    coo.sum_duplicates()
+    words = np.asarray(coo.sum(axis=1)).ravel()
+    contexts = np.asarray(coo.sum(axis=0)).ravel() ** cds
+    pmi = np.log(coo.data) + np.log(contexts.sum()) - np.log(words[coo.row]) - np.log(contexts[coo.col]) - np.log(neg)
+    positive = pmi > 0
+    return sparse.csr_matrix((pmi[positive], (coo.row[positive], coo.col[positive])), shape=coo.shape)
+
+
+def randomized_svd(matrix, dim, oversample=10, power_iters=2, seed=0):
+    '''
+    (U, s, Vt) of the dim leading singular triplets, signs fixed so the largest entry of every
+    column of U is positive
+    '''
+    rng = np.random.RandomState(seed)
+    k = min(dim + oversample, min(matrix.shape))
+    Q, _ = np.linalg.qr(matrix.dot(rng.normal(size=(matrix.shape[1], k))))
+    for _ in range(power_iters):
+        Q, _ = np.linalg.qr(matrix.T.dot(Q))
+        Q, _ = np.linalg.qr(matrix.dot(Q))
+    Ub, s, Vt = np.linalg.svd(np.asarray(matrix.T.dot(Q)).T, full_matrices=False)
+    U = Q.dot(Ub)
+    dim = min(dim, k)
+    U, s, Vt = U[:, :dim], s[:dim], Vt[:dim]
+    signs = np.sign(U[np.argmax(np.abs(U), axis=0), np.arange(dim)])
+    signs[signs == 0] = 1
+    return U * signs, s, Vt * signs[:, None]
+
+
+def ppmi_svd_embeddings(cooc, dim=300, cds=0.75, neg=1, eig=0.0, power_iters=2, seed=0):
+    '''
+    (vocab_size x dim) PPMI-SVD embeddings of a co-occurrence matrix
+    '''
+    U, s, _ = randomized_svd(ppmi_matrix(cooc, cds, neg), dim, power_iters=power_iters, seed=seed)
+    return U * s ** eig
+
+
+def params_row(label, param_filename='run_params.csv'):
+    with open(param_filename, 'r') as f:
+        for row in csv.DictReader(f):
+            if row['label'] == label:
+                return row
+    raise ValueError('no row for {} in {}'.format(label, param_filename))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', default='../output/newsroom/shards', help='output folder of corpus_stream.py')
+    parser.add_argument('--cache', default=window_cooc.cache_folder)
+    parser.add_argument('--label', default='newsroom_svd')
+    parser.add_argument('--vectors-folder', default=embedding_io.folder)
+    parser.add_argument('--first-year', type=int, default=window_years[0])
+    parser.add_argument('--last-year', type=int, default=window_years[-1])
+    parser.add_argument('--vocab-size', type=int, default=50000)
+    parser.add_argument('--dim', type=int, default=300)
+    parser.add_argument('--cds', type=float, default=0.75, help='context distribution smoothing exponent')
+    parser.add_argument('--neg', type=float, default=1, help='PMI shift log(neg)')
+    parser.add_argument('--eig', type=float, default=0.0, help='embeddings are U * s^eig')
+    parser.add_argument('--params-row', help='run changes_over_time on the new label with the word lists of this run_params.csv row')
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'ppmi_svd')
+
+    years = list(range(args.first_year, args.last_year + 1))
+    manifest = corpus_stream.load_manifest(args.shards)
+    windows = window_cooc.iter_windows(args.shards, years, args.vocab_size, cache=args.cache, manifest=manifest)
+    filenames = []
+    for year, cooc, vocab, counts in windows:
+        with profiling.phase('ppmi_svd', {'year': year, 'vocab': len(vocab)}):
+            vectors = ppmi_svd_embeddings(cooc, args.dim, args.cds, args.neg, args.eig)
+        filenames.append(embedding_io.write_embeddings(vectors, vocab, counts, args.label, year, args.vectors_folder))
+
+    if args.params_row is not None:
+        import changes_over_time
+        row = params_row(args.params_row)
+        changes_over_time.main(filenames, label=args.label, csvname=row['csvname'],
+                               neutral_lists=eval(row['neutral_lists']), group_lists=eval(row['group_lists']),
+                               do_individual_neutral_words=(row['do_individual_neutral_words'] == 'TRUE'),
+                               do_individual_group_words=(row['do_individual_group_words'] == 'TRUE'))
@@ -0,0 +1,131 @@
+'''
+Optional cProfile / tracemalloc hooks, switched on from the command line with --profile=cpu|mem.
+
+Once enable() has been called every outermost instrumentation.timer phase (one label in
+changes_over_time, one plot job in create_final_plots_all, one normalize call in the normalizers)
+is profiled:
+    cpu: a cProfile run dumped to <script>_<phase>.pstats (open with python -m pstats)
+    mem: tracemalloc snapshots before and after the phase, the top allocations written to
+         <script>_<phase>_alloc.txt
+Peak RSS of every outermost phase is recorded in either mode and written to <script>_peak_rss.json.
+Only the outermost phase is profiled because cProfile cannot nest profilers.
+'''
+import contextlib
+import cProfile
+import json
+import os
+import re
+import resource
+import sys
+import tracemalloc
+
+profiles_folder = '../output/profiles/'
+profile_mode = None
+script_name = ''
+top_allocations = 30
+
+_depth = 0
+_seen = {}
+_peak_rss = []
+
+
+def enable(mode, script, folder=None):
+    global profile_mode, script_name, profiles_folder
+    if mode not in (None, 'cpu', 'mem'):
+        raise ValueError('unknown profile mode: {}'.format(mode))
+    profile_mode = mode
+    script_name = script
+    if folder is not None: profiles_folder = folder
+    if mode is not None:
+        os.makedirs(profiles_folder, exist_ok=True)
+
+
+def add_profile_argument(parser):
+    parser.add_argument('--profile', choices=['cpu', 'mem'], default=None, help='profile every phase with cProfile (cpu) or tracemalloc (mem), reports go to ' + profiles_folder)
+
+
+def reset_peak_rss():
+    '''
+    resets the kernel's high-water mark so the next peak_rss() only covers what follows, linux only
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    '''
+    peak resident set size in bytes, since the last reset_peak_rss() where the platform supports it
+    '''
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on linux and in bytes on mac
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _phase_filename(name, tags):
+    stem = '_'.join([script_name, name] + [str(v) for v in tags.values()])
+    stem = re.sub('[^A-Za-z0-9_.-]+', '', stem)
+    _seen[stem] = _seen.get(stem, 0) + 1
+    if _seen[stem] > 1:
+        stem += '_{}'.format(_seen[stem])
+    return os.path.join(profiles_folder, stem)
+
+
+def _write_allocations(filename, before, after, peak):
+    stats = after.compare_to(before, 'lineno')
+    with open(filename, 'w') as f:
+        f.write('peak traced memory: {:.1f} MiB\n'.format(peak / 1024.0 / 1024.0))
+        f.write('top {} allocations by size difference:\n'.format(top_allocations))
+        for stat in stats[:top_allocations]:
+            f.write(str(stat) + '\n')
+
+
+@contextlib.contextmanager
+def phase(name, tags=None):
+    global _depth
+    if profile_mode is None or _depth > 0:
+        _depth += 1
+        try:
+            yield
+        finally:
+            _depth -= 1
+        return
+
+    tags = tags or {}
+    stem = _phase_filename(name, tags)
+    reset_peak_rss()
+    _depth += 1
+    if profile_mode == 'cpu':
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            _depth -= 1
+            prof.dump_stats(stem + '.pstats')
+    else:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot()
+            _depth -= 1
+            _write_allocations(stem + '_alloc.txt', before, after, tracemalloc.get_traced_memory()[1])
+
+    _peak_rss.append({'phase': name, 'tags': tags, 'peak_rss_bytes': peak_rss()})
+    with open(os.path.join(profiles_folder, script_name + '_peak_rss.json'), 'w') as f:
+        json.dump(_peak_rss, f, indent=1)
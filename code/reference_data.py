@@ -0,0 +1,183 @@
+'''
+Reference datasets (census occupation percentages, Williams and Best adjective scores, MTurk and
+Princeton trilogy stereotype scores) parsed once per process into columns.
+
+load_table(filename) reads a csv into a Table of string columns, cached by path, size and mtime, so
+all plot jobs of a run share one parse per file. The occupation functions in utilities carry a
+vectorized form, func.columns(table) -> (values, defined), where defined is False for the rows the
+row function returns None for (the row functions are that form applied to a one-row table,
+apply_to_row); functions without one are applied row by row. pivot turns the
+rows into a (words x years) array, memoized per (file, function, years), with the same rules as
+the dict-building loops it replaces: rows whose value is undefined are skipped (optionally), a
+later row for the same word and year overwrites an earlier one, words keep the order in which
+they first appear and missing years are nan.
+'''
+import csv
+import functools
+import os
+
+import numpy as np
+
+
+def file_key(filename):
+    st = os.stat(filename)
+    return (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+
+
+class Table(object):
+    def __init__(self, header, rows):
+        self.header = header
+        self.columns = {}
+        for en, name in enumerate(header):
+            self.columns[name] = np.array([row[en] if en < len(row) else '' for row in rows], dtype=object)
+        self.nrows = len(rows)
+        self._floats = {}
+
+    def __len__(self):
+        return self.nrows
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def floats(self, name):
+        '''
+        the column parsed with float() (so exactly the values the row functions computed with)
+        '''
+        if name not in self._floats:
+            self._floats[name] = np.array([float(v) for v in self.columns[name]], dtype=float)
+        return self._floats[name]
+
+    def isin(self, name, values):
+        return np.array([v in values for v in self.columns[name]], dtype=bool)
+
+    def rows(self):
+        for en in range(self.nrows):
+            yield {name: self.columns[name][en] for name in self.header}
+
+
+@functools.lru_cache(maxsize=None)
+def _load_table(key, delimiter):
+    with open(key[0], 'r') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader)
+        # csv.DictReader skips empty lines as well
+        rows = [row for row in reader if row]
+    return Table(header, rows)
+
+
+def load_table(filename, delimiter=','):
+    return _load_table(file_key(filename), delimiter)
+
+
+def apply_function(table, func):
+    '''
+    (values, defined) of func over all rows, vectorized if func has a columns form
+    '''
+    if hasattr(func, 'columns'):
+        return func.columns(table)
+    values = [func(row) for row in table.rows()]
+    defined = np.array([v is not None for v in values], dtype=bool)
+    return np.array([np.nan if v is None else v for v in values], dtype=float), defined
+
+
+def apply_to_row(columns, row):
+    '''
+    a columns form (values, defined) applied to one csv row (a dict of strings), None where undefined
+    '''
+    values, defined = columns(Table(list(row), [list(row.values())]))
+    return float(values[0]) if defined[0] else None
+
+
+def pivot(words, years, values, yrs_to_do, keep=None):
+    '''
+    (words in first-appearance order, len(words) x len(yrs_to_do) array) from per-row word, year and
+    value; rows with keep False are left out and later rows overwrite earlier ones
+    '''
+    if keep is not None:
+        words, years, values = words[keep], years[keep], values[keep]
+    if len(words) == 0:
+        return [], np.zeros((0, len(yrs_to_do)))
+    distinct, first, inverse = np.unique(words, return_index=True, return_inverse=True)
+    rank = np.empty(len(distinct), dtype=int)
+    rank[np.argsort(first, kind='stable')] = np.arange(len(distinct))
+    columns = {yr: en for en, yr in enumerate(yrs_to_do)}
+    column = np.array([columns.get(yr, -1) for yr in years], dtype=int)
+    out = np.full((len(distinct), len(yrs_to_do)), np.nan)
+    inyears = column >= 0
+    # with repeated (word, year) the last row is assigned, as in the dict loops
+    out[rank[inverse.ravel()][inyears], column[inyears]] = values[inyears]
+    return [distinct[en] for en in np.argsort(first, kind='stable')], out
+
+
+@functools.lru_cache(maxsize=None)
+def _occupation_values(key, occupation_func, yrs_to_do):
+    table = _load_table(key, ',')
+    values, defined = apply_function(table, occupation_func)
+    years = np.array([int(y) for y in table['Census year']], dtype=int)
+    if 'Total Weight' in table:
+        weights = np.array([1.0 if len(w.strip()) == 0 else float(w) for w in table['Total Weight']], dtype=float)
+    else:
+        weights = np.ones(len(table))
+    words, values = pivot(table['Occupation'], years, values, yrs_to_do, defined)
+    _, weights = pivot(table['Occupation'], years, weights, yrs_to_do, defined)
+    return words, values, weights
+
+
+def occupation_values(filename, occupation_func, yrs_to_do):
+    '''
+    (occupations, values, weights) of a census occupation file, values and weights are
+    (occupations x yrs_to_do) arrays; memoized per file, function and years
+    '''
+    return _occupation_values(file_key(filename), occupation_func, tuple(yrs_to_do))
+
+
+@functools.lru_cache(maxsize=None)
+def _adjective_values(key, otherfunc, yrs_to_do):
+    table = _load_table(key, ',')
+    words = np.array([w.strip().replace('p.n', '').strip() for w in table['word']], dtype=object)
+    values, _ = apply_function(table, otherfunc)
+    years = np.array([float(y.strip()) for y in table['year']], dtype=float)
+    return pivot(words, years, values, yrs_to_do)
+
+
+def adjective_values(filename, otherfunc, yrs_to_do):
+    '''
+    (words, words x yrs_to_do array) of the Williams and Best adjective file; undefined values are
+    kept (as nan) rather than skipped, like the loader did
+    '''
+    return _adjective_values(file_key(filename), otherfunc, tuple(yrs_to_do))
+
+
+def as_dicts(words, values):
+    '''
+    {word: list over years}, fresh lists so callers can change them without touching the cache
+    '''
+    return {w: row for w, row in zip(words, values.tolist())}
+
+
+def mturk_stereotype_scores(filename):
+    table = load_table(filename)
+    scores = table.floats('stereotype_score') - 2
+    # center at 0
+    return dict(zip(table['occupation'], scores.tolist()))
+
+
+def princeton_stereotypes(filename):
+    '''
+    group -> year -> word -> (score, in the top 15 of 1933), rows without a score left out
+    '''
+    table = load_table(filename)
+    sscores = {}
+    for group, year, word, score, top in zip(table['group'], table['year'], table['word'], table['score'], table['top151933']):
+        if len(score) > 0:
+            sscores.setdefault(group, {}).setdefault(year, {})[word] = (float(score), top == 'TRUE')
+    return sscores
+
+
+def clear_cache():
+    _load_table.cache_clear()
+    _occupation_values.cache_clear()
+    _adjective_values.cache_clear()
@@ -0,0 +1,208 @@
+'''
+One table for the regression results of all plots (output/regressions/regressions.sqlite). The csv per
+plot in output/regressions is exported from it at the end of create_final_plots_all.main.
+
+Every model fitted by plot_creation.plot_scatter_and_regression is stored with one row per term,
+keyed by
+    label, neutral_list, groups, occupation_function:   what was regressed (groups is 'group1/group2')
+    plot, variant, year:    which regression of which plot (variant: limit list, metric, ...; year
+                            is the decade of single-year scatters and NULL for pooled ones)
+    specification:          linear, linear_counts, linear_year_dummies or quadratic
+    term
+with typed columns for the term (params, std, tvalues, pvals) and the model (r2, adj_r2, fvalue,
+f_pvalue, nobs, df_resid). Storing a model replaces the earlier rows of its key. name is the csv
+the model used to be written to (<name>.csv, <name>withyears.csv for linear_year_dummies),
+export_csvs writes those files in the old layout.
+
+    query(label=['sgns', 'svd'], plot='all_differences_dynamic')    one row per term
+    compare('params', plot='all_differences_dynamic', specification='linear')   one column per label
+
+From the command line: python regression_store.py --plot all_differences_dynamic --compare params
+'''
+import argparse
+import contextlib
+import datetime
+import os
+import sqlite3
+
+from lazy_modules import lazy_module
+
+pd = lazy_module('pandas')
+
+store_file = '../output/regressions/regressions.sqlite'
+regressions_folder = '../output/regressions/'
+key_columns = ['label', 'neutral_list', 'groups', 'occupation_function', 'plot', 'variant', 'year', 'specification']
+term_columns = ['term', 'position', 'params', 'std', 'tvalues', 'pvals']
+model_columns = ['r2', 'adj_r2', 'fvalue', 'f_pvalue', 'nobs', 'df_resid', 'name', 'written']
+csv_suffixes = {'linear_year_dummies': 'withyears'}
+
+schema = '''CREATE TABLE IF NOT EXISTS regressions (
+    label TEXT NOT NULL, neutral_list TEXT NOT NULL, groups TEXT NOT NULL, occupation_function TEXT NOT NULL,
+    plot TEXT NOT NULL, variant TEXT NOT NULL, year INTEGER, specification TEXT NOT NULL,
+    term TEXT NOT NULL, position INTEGER NOT NULL, params REAL, std REAL, tvalues REAL, pvals REAL,
+    r2 REAL, adj_r2 REAL, fvalue REAL, f_pvalue REAL, nobs INTEGER, df_resid REAL,
+    name TEXT NOT NULL, written TEXT NOT NULL)'''
+indexes = [
+    'CREATE UNIQUE INDEX IF NOT EXISTS regressions_key ON regressions ({}, term)'.format(', '.join(key_columns)),
+    'CREATE INDEX IF NOT EXISTS regressions_plot ON regressions (plot, specification, term)',
+    'CREATE INDEX IF NOT EXISTS regressions_name ON regressions (name)',
+]
+
+
+def connect(filename=None):
+    if filename is None: filename = store_file
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    # plot jobs in a pool write concurrently, sqlite serializes them
+    conn = sqlite3.connect(filename, timeout=60)
+    conn.execute(schema)
+    for index in indexes:
+        conn.execute(index)
+    return conn
+
+
+def regression_key(label='', neutral_list='', group1='', group2='', occupation_function='', plot='', variant='', year=None):
+    '''
+    the key of a plot's regression, occupation_function can be the occupation function itself
+    '''
+    if callable(occupation_function):
+        occupation_function = getattr(occupation_function, 'savelabel', occupation_function.__name__)
+    return {'label': label, 'neutral_list': neutral_list or '', 'groups': '/'.join(g for g in [group1, group2] if g),
+            'occupation_function': occupation_function or '', 'plot': plot, 'variant': str(variant or ''),
+            'year': None if year is None else int(year)}
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def record(model, name, specification, key=None, filename=None):
+    '''
+    stores an ols_engine result under key (regression_key(plot=name) if not given), replacing the
+    previous result of the same key and specification
+    '''
+    key = dict(regression_key(plot=name) if key is None else key, specification=specification)
+    written = datetime.datetime.now().isoformat()
+    rows = []
+    for position, term in enumerate(model.params.index):
+        rows.append([key[c] for c in key_columns] +
+                    [str(term), position, _float(model.params[term]), _float(model.bse[term]),
+                     _float(model.tvalues[term]), _float(model.pvalues[term]),
+                     _float(model.rsquared), _float(model.rsquared_adj), _float(model.fvalue), _float(model.f_pvalue),
+                     int(model.nobs), _float(model.df_resid), name, written])
+    columns = key_columns + term_columns + model_columns
+    with contextlib.closing(connect(filename)) as conn:
+        with conn:
+            conn.execute('DELETE FROM regressions WHERE ' + ' AND '.join('{} IS ?'.format(c) for c in key_columns),
+                         [key[c] for c in key_columns])
+            conn.executemany('INSERT INTO regressions ({}) VALUES ({})'.format(', '.join(columns), ', '.join('?' * len(columns))), rows)
+
+
+def query(filename=None, **filters):
+    '''
+    stored rows as a DataFrame, filtered by column=value (or column=[values]), one row per term
+    '''
+    where, values = [], []
+    for column, value in sorted(filters.items()):
+        if column not in key_columns + term_columns + model_columns:
+            raise ValueError('unknown column: {}'.format(column))
+        if isinstance(value, (list, tuple, set)):
+            value = list(value)
+            where.append('{} IN ({})'.format(column, ', '.join('?' * len(value))))
+            values.extend(value)
+        elif value is None:
+            where.append('{} IS NULL'.format(column))
+        else:
+            where.append('{} = ?'.format(column))
+            values.append(value)
+    sql = 'SELECT * FROM regressions'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY {}, position'.format(', '.join(key_columns))
+    with contextlib.closing(connect(filename)) as conn:
+        return pd.read_sql_query(sql, conn, params=values)
+
+
+def compare(statistic='params', by='label', filename=None, **filters):
+    '''
+    statistic of the matching rows with one column per value of by (default: per embedding)
+    '''
+    df = query(filename, **filters)
+    index = [c for c in key_columns if c != by] + ['term']
+    # year is NULL for pooled models, which pivot would drop
+    df['year'] = pd.to_numeric(df['year']).fillna(-1).astype(int)
+    return df.pivot(index=index, columns=by, values=statistic)
+
+
+def summarize_model(model_result):
+    '''
+    copied from https://github.com/statsmodels/statsmodels/blob/master/statsmodels/sandbox/multilinear.py
+    '''
+    statistics = pd.Series({'r2': model_result.rsquared,
+                  'adj_r2': model_result.rsquared_adj})
+    # put them togher with the result for each term
+    result_df = pd.DataFrame({'params': model_result.params,
+                              'pvals': model_result.pvalues,
+                              'std': model_result.bse,
+                              'statistics': statistics})
+    # add the complexive results for f-value and the total p-value
+    fisher_df = pd.DataFrame({'params': {'_f_test': model_result.fvalue},
+                              'pvals': {'_f_test': model_result.f_pvalue}})
+    # merge them and unstack to obtain a hierarchically indexed series
+    res_series = pd.concat([result_df, fisher_df]).unstack()
+    return res_series.dropna()
+
+
+class StoredModel(object):
+    '''
+    the attributes summarize_model reads, from the stored rows of one model
+    '''
+    def __init__(self, rows):
+        rows = rows.sort_values('position')
+        first = rows.iloc[0]
+        self.params = pd.Series(rows['params'].values, index=rows['term'].values, dtype=float)
+        self.pvalues = pd.Series(rows['pvals'].values, index=rows['term'].values, dtype=float)
+        self.bse = pd.Series(rows['std'].values, index=rows['term'].values, dtype=float)
+        self.rsquared = first['r2']
+        self.rsquared_adj = first['adj_r2']
+        self.fvalue = first['fvalue']
+        self.f_pvalue = first['f_pvalue']
+
+
+def csv_filename(name, specification, folder=None):
+    if folder is None: folder = regressions_folder
+    return os.path.join(folder, '{}{}.csv'.format(name, csv_suffixes.get(specification, '')))
+
+
+def export_csvs(folder=None, filename=None, **filters):
+    '''
+    writes every stored model (or the matching ones) to its csv in the old per-plot layout, returns the files
+    '''
+    df = query(filename, **filters)
+    written = []
+    for (name, specification), rows in df.groupby(['name', 'specification'], sort=False):
+        out = csv_filename(name, specification, folder)
+        summarize_model(StoredModel(rows)).to_csv(out)
+        written.append(out)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--store', default=store_file)
+    for column in ['label', 'neutral_list', 'groups', 'occupation_function', 'plot', 'variant', 'specification', 'term']:
+        parser.add_argument('--' + column.replace('_', '-'), nargs='+')
+    parser.add_argument('--year', nargs='+', type=int)
+    parser.add_argument('--compare', metavar='STATISTIC', help='one column per label, e.g. params or pvals')
+    parser.add_argument('--export-csvs', metavar='FOLDER', nargs='?', const=regressions_folder,
+                        help='write the per-plot csvs of the matching models')
+    args = parser.parse_args()
+
+    filters = {c: getattr(args, c) for c in key_columns + ['term'] if getattr(args, c) is not None}
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        if args.export_csvs is not None:
+            for f in export_csvs(args.export_csvs, args.store, **filters):
+                print(f)
+        elif args.compare is not None:
+            print(compare(args.compare, filename=args.store, **filters))
+        else:
+            print(query(args.store, **filters)[key_columns + ['term', 'params', 'std', 'pvals', 'r2', 'nobs']])
@@ -0,0 +1,7 @@
+'''
+The modules of code/ import each other as top-level scripts, so the tests import them the same way.
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,48 @@
+'''
+bias_frame on word lists with no words or no values, which the plot functions index like any other.
+'''
+import numpy as np
+
+import bias_frame
+
+
+def row(distances, n_decades=4):
+    averaged = [[0.5] * n_decades for _ in range(8)]
+    return {'indiv_distances_neutral_occupations': distances,
+            'occupations_male_pairs': averaged, 'occupations_female_pairs': averaged}
+
+
+def distances(word, male, female):
+    return {word: {'male_pairs': [[m] * 4 for m in male], 'female_pairs': [[f] * 4 for f in female]}}
+
+
+def test_bias_values():
+    bias_frame.clear_cache()
+    d = distances('nurse', range(8), [2 * v for v in range(8)])
+    for metric, expected in [('norm', 4 - 8), ('cossim', 14 - 7)]:
+        frame = bias_frame.get_bias_frame(row(d), 'occupations', 'male_pairs', 'female_pairs', metric)
+        assert frame.words == ['nurse'] and frame.values.shape == (1, 4)
+        np.testing.assert_allclose(frame['nurse'], expected)
+
+
+def test_empty_word_list():
+    bias_frame.clear_cache()
+    frame = bias_frame.get_bias_frame(row({}), 'occupations', 'male_pairs', 'female_pairs')
+    assert len(frame) == 0
+    assert frame.values.shape == frame.mask.shape == (0, 4)
+    assert frame.complete([1, 3]).shape == (0,)
+    assert frame.complete().shape == (0,)
+    assert frame.values[frame.complete([1, 3])][:, [1, 3]].shape == (0, 2)
+    assert frame.as_dict() == {}
+
+
+def test_fully_missing_word_list():
+    bias_frame.clear_cache()
+    nan = float('nan')
+    d = distances('nurse', [nan] * 8, [nan] * 8)
+    d.update(distances('janitor', [nan] * 8, [nan] * 8))
+    frame = bias_frame.get_bias_frame(row(d), 'occupations', 'male_pairs', 'female_pairs')
+    assert frame.values.shape == frame.mask.shape == (2, 4)
+    assert frame.mask.all()
+    assert not frame.complete([0, 2]).any()
+    assert frame.values[frame.complete([0, 2])][:, [0, 2]].shape == (0, 2)
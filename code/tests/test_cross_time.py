@@ -0,0 +1,78 @@
+'''
+cross_time's batched correlations and KS tests against scipy's one-pair functions.
+'''
+import itertools
+
+import numpy as np
+import pytest
+from scipy import stats
+
+import cross_time
+
+
+def biases(n_words=40, n_decades=5, seed=0, ties=False):
+    rng = np.random.RandomState(seed)
+    values = np.cumsum(rng.randn(n_words, n_decades) * 0.1, axis=1)
+    return np.round(values, 1) if ties else values
+
+
+def pairs(k):
+    return [(a, b) for a, b in itertools.combinations(range(k), 2)]
+
+
+@pytest.mark.parametrize('ties', [False, True])
+def test_pearson_and_spearman_match_scipy(ties):
+    values = biases(ties=ties)
+    r, p = cross_time.correlation_matrix(values, 'pearson')
+    rho, p_rho = cross_time.correlation_matrix(values, 'spearman')
+    for a, b in pairs(values.shape[1]):
+        expected = stats.pearsonr(values[:, a], values[:, b])
+        np.testing.assert_allclose([r[a, b], p[a, b]], [expected.statistic, expected.pvalue], rtol=1e-9, atol=1e-15)
+        expected = stats.spearmanr(values[:, a], values[:, b])
+        np.testing.assert_allclose([rho[a, b], p_rho[a, b]], [expected.statistic, expected.pvalue], rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(np.diag(r), 1)
+    assert np.all(np.diag(p) < 1e-200)
+
+
+@pytest.mark.parametrize('ties', [False, True])
+def test_kendall_matches_scipy_asymptotic(ties):
+    values = biases(ties=ties)
+    tau, p = cross_time.correlation_matrix(values, 'kendall')
+    for a, b in pairs(values.shape[1]):
+        expected = stats.kendalltau(values[:, a], values[:, b], method='asymptotic')
+        np.testing.assert_allclose([tau[a, b], p[a, b]], [expected.statistic, expected.pvalue], rtol=1e-9, atol=1e-15)
+
+
+def test_two_words():
+    values = np.array([[0.1, 0.3, -0.2], [0.2, 0.1, 0.4]])
+    r, p = cross_time.correlation_matrix(values, 'pearson')
+    tau, p_tau = cross_time.correlation_matrix(values, 'kendall')
+    rho, p_rho = cross_time.correlation_matrix(values, 'spearman')
+    for a, b in pairs(values.shape[1]):
+        expected = stats.pearsonr(values[:, a], values[:, b])
+        np.testing.assert_allclose([r[a, b], p[a, b]], [expected.statistic, expected.pvalue])
+        expected = stats.kendalltau(values[:, a], values[:, b])
+        np.testing.assert_allclose([tau[a, b], p_tau[a, b]], [expected.statistic, expected.pvalue])
+        expected = stats.spearmanr(values[:, a], values[:, b])
+        np.testing.assert_allclose(rho[a, b], expected.statistic)
+        assert np.isnan(p_rho[a, b]) and np.isnan(expected.pvalue)
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        cross_time.correlation_matrix(biases(), 'distance')
+
+
+def test_phase_shift_ks_matches_ks_2samp():
+    rng = np.random.RandomState(1)
+    heatmap = np.cumsum(rng.rand(8, 8), axis=0)
+    pvalues = cross_time.phase_shift_ks_pvalues(heatmap)
+    adjacent = np.abs(np.diff(heatmap, axis=0))
+    assert len(pvalues) == len(adjacent)
+    for i in range(len(adjacent)):
+        others = np.delete(adjacent, i, axis=0).ravel()
+        np.testing.assert_allclose(pvalues[i], stats.ks_2samp(adjacent[i], others).pvalue, rtol=1e-12)
+
+
+def test_phase_shift_ks_single_transition():
+    assert np.all(np.isnan(cross_time.phase_shift_ks_pvalues(np.ones((2, 3)))))
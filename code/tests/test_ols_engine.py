@@ -0,0 +1,106 @@
+'''
+ols_engine against statsmodels' OLS on synthetic regressions of the shapes plot_creation fits.
+'''
+import numpy as np
+import pytest
+
+import ols_engine
+
+sm = pytest.importorskip('statsmodels.api')
+
+
+def synthetic(n_per_year=25, years=(1950, 1960, 1970), seed=0):
+    rng = np.random.RandomState(seed)
+    years_all = np.repeat(years, n_per_year)
+    x = rng.rand(len(years_all))
+    y = 0.3 * x - 0.2 * x ** 2 + 0.01 * (years_all - years[0]) / 10 + 0.05 * rng.randn(len(years_all))
+    return x, y, years_all
+
+
+def specifications(x, years_all):
+    return {
+        'plain': ols_engine.design([('x', x)]),
+        # const plus every year dummy is rank deficient, both use the minimum-norm solution
+        'year_dummies': ols_engine.design([('x', x)], dummies=years_all),
+        'quadratic': ols_engine.design([('x', x), ('x2', x ** 2)]),
+    }
+
+
+def assert_matches(res, model):
+    for attr in ['params', 'bse', 'tvalues', 'pvalues']:
+        np.testing.assert_allclose(getattr(res, attr).values, np.asarray(getattr(model, attr)), rtol=1e-7, atol=1e-12)
+    for attr in ['rsquared', 'rsquared_adj', 'df_resid', 'df_model', 'ssr']:
+        np.testing.assert_allclose(getattr(res, attr), getattr(model, attr), rtol=1e-7, atol=1e-12)
+    np.testing.assert_allclose(res.fittedvalues.values, model.fittedvalues, rtol=1e-7, atol=1e-12)
+
+
+@pytest.mark.parametrize('spec', ['plain', 'year_dummies', 'quadratic'])
+def test_fit_matches_statsmodels(spec):
+    x, y, years_all = synthetic()
+    X, names = specifications(x, years_all)[spec]
+    res = ols_engine.fit(y, X, names)
+    model = sm.OLS(y, X).fit()
+    assert list(res.params.index) == names
+    assert_matches(res, model)
+    if spec != 'year_dummies':
+        np.testing.assert_allclose(res.fvalue, model.fvalue, rtol=1e-7)
+        np.testing.assert_allclose(res.f_pvalue, model.f_pvalue, rtol=1e-7, atol=1e-300)
+
+
+@pytest.mark.parametrize('spec', ['plain', 'quadratic'])
+def test_fit_groups_matches_per_group_statsmodels(spec):
+    x, y, years_all = synthetic()
+    # a last year of two rows, fewer than the quadratic's three parameters
+    x = np.concatenate([x, [0.2, 0.7]])
+    y = np.concatenate([y, [0.1, 0.3]])
+    years_all = np.concatenate([years_all, [1980, 1980]])
+    X, names = specifications(x, years_all)[spec]
+    results = ols_engine.fit_groups(y, X, years_all, names)
+    assert sorted(results) == [1950, 1960, 1970, 1980]
+    for year, res in results.items():
+        rows = years_all == year
+        model = sm.OLS(y[rows], X[rows]).fit()
+        if year == 1980 and spec == 'quadratic':
+            # no residual degrees of freedom: the fit goes through both points and nothing else is defined
+            np.testing.assert_allclose(res.params.values, model.params, atol=1e-10)
+            np.testing.assert_allclose(res.fittedvalues.values, y[rows], atol=1e-10)
+            assert res.df_resid == model.df_resid == 0
+            assert not np.any(np.isfinite(res.bse.values))
+            continue
+        assert_matches(res, model)
+
+
+def test_fit_keeps_series_index():
+    pd = pytest.importorskip('pandas')
+    x, y, years_all = synthetic()
+    X, names = specifications(x, years_all)['plain']
+    endog = pd.Series(y, index=['w{}'.format(i) for i in range(len(y))])
+    res = ols_engine.fit(endog, X, names)
+    assert list(res.resid.index) == list(endog.index)
+    np.testing.assert_allclose(res.predict(X), sm.OLS(y, X).fit().predict(X))
+
+
+def test_summary_latex_rows():
+    x, y, years_all = synthetic()
+    X, names = specifications(x, years_all)['quadratic']
+    res = ols_engine.fit(y, X, names)
+    model = sm.OLS(y, X).fit()
+    latex = ols_engine.summary_latex(res)
+    assert latex.startswith('\\begin{tabular}') and latex.endswith('\\end{tabular}')
+    for en, name in enumerate(names):
+        row = '{} & {:.4f} & {:.4f} & {:.3f} & {:.3f} \\\\'.format(
+            name.replace('_', '\\_'), model.params[en], model.bse[en], model.tvalues[en], model.pvalues[en])
+        assert row in latex
+    assert 'R-squared & {:.3f}'.format(model.rsquared) in latex
+    assert 'No. Observations & {} & Df Residuals & {} &'.format(len(y), len(y) - 3) in latex
+
+
+def test_cross_validate_matches_refits():
+    x, y, years_all = synthetic()
+    X, names = specifications(x, years_all)['quadratic']
+    cv = ols_engine.cross_validate(y, X, years_all)
+    for year in cv['folds']:
+        rows = years_all == year
+        model = sm.OLS(y[~rows], X[~rows]).fit()
+        np.testing.assert_allclose(cv['params'][year], model.params, rtol=1e-7)
+        np.testing.assert_allclose(cv['mse'][year], np.mean((y[rows] - model.predict(X[rows])) ** 2), rtol=1e-7)
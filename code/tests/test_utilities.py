@@ -0,0 +1,80 @@
+'''
+The occupation functions of utilities: their columns form and their row form agree with each other and
+with the original row-by-row formulas on the reference files.
+'''
+import csv
+import os
+
+import numpy as np
+import pytest
+
+import reference_data
+import utilities
+
+word_lists = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'word_lists')
+gender_file = os.path.join(word_lists, 'occupation_percentages_gender_occ1950.csv')
+race_file = os.path.join(word_lists, 'occupation_percentages_race_occ1950.csv')
+adjectives_file = os.path.join(word_lists, 'adjectives_williamsbest.csv')
+
+
+def female_logitprop(row):
+    p = float(row['Female'])
+    if p < 1e-5 or p > 1 - 1e-5:
+        return None
+    return np.log(p / (1 - p))
+
+
+def female_percent(row):
+    return (2 * float(row['Female']) - 1) * 100
+
+
+def minority_logitprop(minority):
+    def func(row):
+        if row['Occupation'] in utilities.bad_occupations:
+            return None
+        p = float(row[minority]) / (float(row[minority]) + float(row['white']) + 1e-5)
+        if p < 1e-4 or p > 1 - 1e-4:
+            return None
+        p = np.log(p / (1 - p))
+        if p > 5:
+            return None
+        return p
+    return func
+
+
+def minority_percent(minority):
+    def func(row):
+        if row['Occupation'] in utilities.bad_occupations:
+            return None
+        p = float(row[minority]) / (float(row[minority]) + float(row['white']) + 1e-5)
+        return (2 * p - 1) * 100
+    return func
+
+
+def williamsbest(row):
+    return float(row['transformed_score'].strip())
+
+
+cases = [
+    (gender_file, utilities.occupation_func_female_logitprop, female_logitprop),
+    (gender_file, utilities.occupation_func_female_percent, female_percent),
+    (race_file, utilities.occupation_func_whitehispanic_logitprop, minority_logitprop('hispanic')),
+    (race_file, utilities.occupation_func_whitehispanic_percent, minority_percent('hispanic')),
+    (race_file, utilities.occupation_func_whiteasian_logitprop, minority_logitprop('asian')),
+    (race_file, utilities.occupation_func_whiteasian_percent, minority_percent('asian')),
+    (adjectives_file, utilities.occupation_func_williamsbestadject, williamsbest),
+]
+
+
+@pytest.mark.parametrize('filename, func, original', cases, ids=[c[1].__name__ for c in cases])
+def test_row_and_columns_forms_agree(filename, func, original):
+    with open(filename, 'r') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) > 0
+    expected = [original(row) for row in rows]
+    assert [func(row) for row in rows] == expected
+
+    values, defined = func.columns(reference_data.load_table(filename))
+    assert list(defined) == [e is not None for e in expected]
+    np.testing.assert_array_equal(values[defined], [e for e in expected if e is not None])
+    assert any(e is not None for e in expected)
@@ -0,0 +1,157 @@
+'''
+Trains the embeddings of the Newsroom windows (1999-2015) in parallel, one window per worker
+process, in place of the notebook's loop that trains them one after the other.
+
+The years are counted first (window_cooc.year_cooc, one year per worker, skipped when cached),
+then every window is a job: its co-occurrences are summed from the cached years
+(window_cooc.window_cooc) and embedded with glove_trainer (the notebook's GloVe, default) or
+ppmi_svd. The workers are started with spawn after OMP/OpenBLAS/MKL thread counts are set to
+--blas-threads (1 by default) in the environment, so numpy's BLAS in every worker uses that many
+threads and n workers do not oversubscribe the cores. Every window is seeded from (--seed, year)
+alone, so its embeddings do not depend on the number of workers or on which window ran first.
+
+Every window is written under a .tmp name and renamed when complete, as the notebook's pickle
+({'embeddings', 'vocab', 'vocab_index'} and the word 'counts' in <output>/embeddings_<year>.pkl)
+and, with --label, into the vector store (embedding_io). Windows whose pickle exists are skipped
+unless --force, so an interrupted run continues where it stopped.
+'''
+import argparse
+import multiprocessing
+import os
+import pickle
+import time
+
+import numpy as np
+
+import corpus_stream
+import embedding_io
+import glove_trainer
+import ppmi_svd
+import profiling
+import window_cooc
+
+window_years = list(range(1999, 2016))
+output_folder = '../output/newsroom/embeddings'
+trainers = ['glove', 'svd']
+blas_variables = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+
+def notebook_vocab_size(words):
+    '''
+    the notebook's vocabulary size for a window of this many raw words (len(text.split()) before
+    tokenizing, not the tokens left after it)
+    '''
+    if words < 200000:
+        return 3000
+    elif words < 1000000:
+        return 6000
+    return 8000
+
+
+def window_seed(seed, year):
+    return int(np.random.SeedSequence([seed, year]).generate_state(1)[0])
+
+
+def embeddings_filename(output, year):
+    return os.path.join(output, 'embeddings_{}.pkl'.format(year))
+
+
+def count_year(job):
+    shards, cache, year, window_size = job
+    start = time.time()
+    window_cooc.year_cooc(shards, year, window_size, cache=cache)
+    return year, time.time() - start
+
+
+def train_window(job):
+    '''
+    trains and writes one window, returns (year, vocabulary size, seconds)
+    '''
+    year, config = job
+    start = time.time()
+    vocab_size = config['vocab_size'] if config['vocab_size'] is not None else notebook_vocab_size
+    cooc, vocab, counts = window_cooc.window_cooc(config['shards'], year, vocab_size, window_size=config['window_size'],
+                                                  cache=config['cache'])
+    seed = window_seed(config['seed'], year)
+    if config['trainer'] == 'glove':
+        embeddings = glove_trainer.train_glove(cooc, embed_dim=config['dim'], max_iter=config['max_iter'], seed=seed, verbose=False)
+    else:
+        embeddings = ppmi_svd.ppmi_svd_embeddings(cooc, config['dim'], seed=seed)
+
+    filename = embeddings_filename(config['output'], year)
+    with open(filename + '.tmp', 'wb') as f:
+        pickle.dump({'embeddings': embeddings, 'vocab': vocab, 'vocab_index': {w: i for i, w in enumerate(vocab)}, 'counts': counts}, f)
+    os.replace(filename + '.tmp', filename)
+    if config['label'] is not None:
+        embedding_io.write_embeddings(embeddings, vocab, counts, config['label'], year, config['vectors_folder'])
+    return year, len(vocab), time.time() - start
+
+
+def run_pool(func, jobs, n_jobs, blas_threads):
+    '''
+    func over jobs in a spawned pool of n_jobs workers (in this process for n_jobs=1), results as they finish
+    '''
+    if n_jobs == 1:
+        for job in jobs:
+            yield func(job)
+        return
+    # spawned workers import numpy after these are set, forked ones would share the parent's BLAS
+    saved = {name: os.environ.get(name) for name in blas_variables}
+    os.environ.update({name: str(blas_threads) for name in blas_variables})
+    try:
+        with multiprocessing.get_context('spawn').Pool(n_jobs) as pool:
+            for result in pool.imap_unordered(func, jobs):
+                yield result
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def train_windows(config, years, n_jobs=1, blas_threads=1, force=False):
+    '''
+    counts the years and trains the windows not written yet, returns the files of all windows
+    '''
+    manifest = corpus_stream.load_manifest(config['shards'])
+    os.makedirs(config['output'], exist_ok=True)
+    todo = [year for year in years if force or not os.path.exists(embeddings_filename(config['output'], year))]
+    print('{} windows, {} to train'.format(len(years), len(todo)))
+
+    needed = sorted(set(yr for year in todo for yr in window_cooc.window_years_present(year, 1, manifest)))
+    with profiling.phase('count_years', {'years': len(needed)}):
+        for year, seconds in run_pool(count_year, [(config['shards'], config['cache'], yr, config['window_size']) for yr in needed], n_jobs, blas_threads):
+            print('counted {} in {:.1f}s'.format(year, seconds))
+    with profiling.phase('train_windows', {'windows': len(todo), 'trainer': config['trainer']}):
+        for year, size, seconds in run_pool(train_window, [(year, config) for year in todo], n_jobs, blas_threads):
+            print('trained {} ({} words) in {:.1f}s'.format(year, size, seconds))
+    return [embeddings_filename(config['output'], year) for year in years]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', default='../output/newsroom/shards', help='output folder of corpus_stream.py')
+    parser.add_argument('--cache', default=window_cooc.cache_folder)
+    parser.add_argument('--output', default=output_folder)
+    parser.add_argument('--first-year', type=int, default=window_years[0])
+    parser.add_argument('--last-year', type=int, default=window_years[-1])
+    parser.add_argument('--trainer', choices=trainers, default='glove')
+    parser.add_argument('--vocab-size', type=int, help="fixed vocabulary size, default the notebook's 3000/6000/8000 by the window's raw word count")
+    parser.add_argument('--window-size', type=int, default=4)
+    parser.add_argument('--dim', type=int, default=50)
+    parser.add_argument('--max-iter', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', help='also write the windows into the vector store under this label')
+    parser.add_argument('--vectors-folder', default=embedding_io.folder)
+    parser.add_argument('--jobs', type=int, default=multiprocessing.cpu_count(), help='windows trained in parallel')
+    parser.add_argument('--blas-threads', type=int, default=1, help='BLAS threads of every worker')
+    parser.add_argument('--force', action='store_true', help='train windows that were written before as well')
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'train_windows')
+
+    config = {'shards': args.shards, 'cache': args.cache, 'output': args.output, 'trainer': args.trainer,
+              'vocab_size': args.vocab_size, 'window_size': args.window_size, 'dim': args.dim, 'max_iter': args.max_iter,
+              'seed': args.seed, 'label': args.label, 'vectors_folder': args.vectors_folder}
+    train_windows(config, list(range(args.first_year, args.last_year + 1)), max(1, args.jobs), args.blas_threads, args.force)
@@ -1,147 +1,144 @@
 import csv
 import ast
+import os
 import random
 import sys
 
-import latexify
 import numpy as np
-import pandas as pd
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import seaborn as sns
-from math import sqrt
-from scipy.stats import linregress
-
-# set up LaTeX-style plotting
-latexify.latexify()
+import data_sources
+import reference_data
+from instrumentation import timer
+
+# the LaTeX-style plot setup (latexify) is applied by plot_creation when pyplot is first used
 csv.field_size_limit(2 ** 30)
 
 
-def occupation_func_female_logitprop(row):
-    occupation_func_female_logitprop.label = "Women Occupation Logit Prop"
-    occupation_func_female_logitprop.savelabel = "WomenOccupationLogProp"
+# each transform is written once on the columns of a reference_data.Table, as (values, defined);
+# the row functions apply it to a single csv row and return None where it is undefined
+def _female_logitprop_columns(table):
+    p = table.floats("Female")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.log(p / (1 - p)), ~((p < 1e-5) | (p > 1 - 1e-5))
 
-    p = float(row["Female"])
-    if p < 1e-5 or p > 1 - 1e-5:
-        return None
 
-    return np.log(p / (1 - p))
+def occupation_func_female_logitprop(row):
+    return reference_data.apply_to_row(_female_logitprop_columns, row)
 
 
-def occupation_func_female_percent(row):
-    occupation_func_female_percent.label = "Women Occupation $\\%$ Difference"
-    occupation_func_female_percent.savelabel = "WomenOccupRelativePer"
+occupation_func_female_logitprop.label = "Women Occupation Logit Prop"
+occupation_func_female_logitprop.savelabel = "WomenOccupationLogProp"
+occupation_func_female_logitprop.columns = _female_logitprop_columns
 
-    p = float(row["Female"])
 
+def _female_percent_columns(table):
+    p = table.floats("Female")
     # percent minority - percent majority
-    return (2 * p - 1) * 100
+    return (2 * p - 1) * 100, np.ones(len(p), dtype=bool)
+
+
+def occupation_func_female_percent(row):
+    return reference_data.apply_to_row(_female_percent_columns, row)
 
 
+occupation_func_female_percent.label = "Women Occupation $\\%$ Difference"
+occupation_func_female_percent.savelabel = "WomenOccupRelativePer"
+occupation_func_female_percent.columns = _female_percent_columns
+
 bad_occupations = ["smith", "conductor"]
 
 
-def occupation_func_whitehispanic_logitprop(row):
-    occupation_func_whitehispanic_logitprop.label = "Hispanic Occupation Logit Prop"
-    occupation_func_whitehispanic_logitprop.savelabel = "HispanicOccupationLogProp"
+def _minority_proportion(table, minority):
+    return table.floats(minority) / (table.floats(minority) + table.floats("white") + 1e-5)
+
+
+def _logitprop_columns(minority):
+    def columns(table):
+        p = _minority_proportion(table, minority)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            logit = np.log(p / (1 - p))
+        defined = ~table.isin("Occupation", bad_occupations) & ~((p < 1e-4) | (p > 1 - 1e-4)) & ~(logit > 5)
+        return logit, defined
+    return columns
+
+
+def _percent_columns(minority):
+    def columns(table):
+        p = _minority_proportion(table, minority)
+        # percent minority - percent majority
+        return (2 * p - 1) * 100, ~table.isin("Occupation", bad_occupations)
+    return columns
 
-    if row["Occupation"] in bad_occupations:
-        return None
 
-    p = float(row["hispanic"]) / (
-        float(row["hispanic"]) + float(row["white"]) + 1e-5
-    )
-    if p < 1e-4 or p > 1 - 1e-4:
-        return None
+_whitehispanic_logitprop_columns = _logitprop_columns("hispanic")
+_whitehispanic_percent_columns = _percent_columns("hispanic")
+_whiteasian_logitprop_columns = _logitprop_columns("asian")
+_whiteasian_percent_columns = _percent_columns("asian")
 
-    p = np.log(p / (1 - p))
-    if p > 5:
-        return None
-    return p
+
+def occupation_func_whitehispanic_logitprop(row):
+    return reference_data.apply_to_row(_whitehispanic_logitprop_columns, row)
+
+
+occupation_func_whitehispanic_logitprop.label = "Hispanic Occupation Logit Prop"
+occupation_func_whitehispanic_logitprop.savelabel = "HispanicOccupationLogProp"
+occupation_func_whitehispanic_logitprop.columns = _whitehispanic_logitprop_columns
 
 
 def occupation_func_whitehispanic_percent(row):
-    occupation_func_whitehispanic_percent.label = (
-        "Hispanic Occupation $\\%$ Difference"
-    )
-    occupation_func_whitehispanic_percent.savelabel = "HispanicOccupRelativePer"
+    return reference_data.apply_to_row(_whitehispanic_percent_columns, row)
 
-    if row["Occupation"] in bad_occupations:
-        return None
 
-    p = float(row["hispanic"]) / (
-        float(row["hispanic"]) + float(row["white"]) + 1e-5
-    )
-    # percent minority - percent majority
-    return (2 * p - 1) * 100
+occupation_func_whitehispanic_percent.label = (
+    "Hispanic Occupation $\\%$ Difference"
+)
+occupation_func_whitehispanic_percent.savelabel = "HispanicOccupRelativePer"
+occupation_func_whitehispanic_percent.columns = _whitehispanic_percent_columns
 
 
 def load_mturkstereotype_data(filename):
-    dd = {}
-    with open(filename, "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            # center at 0
-            dd[row["occupation"]] = float(row["stereotype_score"]) - 2
-    return dd
+    # occupation -> stereotype score centered at 0, parsed once per file (reference_data)
+    return reference_data.mturk_stereotype_scores(filename)
 
 
 def occupation_func_whiteasian_logitprop(row):
-    occupation_func_whiteasian_logitprop.label = "Asian Occupation Logit Prop"
-    occupation_func_whiteasian_logitprop.savelabel = "AsianOccupationProportion"
-
-    if row["Occupation"] in bad_occupations:
-        return None
+    return reference_data.apply_to_row(_whiteasian_logitprop_columns, row)
 
-    p = float(row["asian"]) / (float(row["asian"]) + float(row["white"]) + 1e-5)
-    if p < 1e-4 or p > 1 - 1e-4:
-        return None
 
-    p = np.log(p / (1 - p))
-    if p > 5:
-        return None
-    return p
+occupation_func_whiteasian_logitprop.label = "Asian Occupation Logit Prop"
+occupation_func_whiteasian_logitprop.savelabel = "AsianOccupationProportion"
+occupation_func_whiteasian_logitprop.columns = _whiteasian_logitprop_columns
 
 
 def occupation_func_whiteasian_percent(row):
-    occupation_func_whiteasian_percent.label = "Asian Occupation $\\%$ Difference"
-    occupation_func_whiteasian_percent.savelabel = "AsianOccupRelativeProp"
+    return reference_data.apply_to_row(_whiteasian_percent_columns, row)
 
-    if row["Occupation"] in bad_occupations:
-        return None
 
-    p = float(row["asian"]) / (float(row["asian"]) + float(row["white"]) + 1e-5)
-    return (2 * p - 1) * 100
+occupation_func_whiteasian_percent.label = "Asian Occupation $\\%$ Difference"
+occupation_func_whiteasian_percent.savelabel = "AsianOccupRelativeProp"
+occupation_func_whiteasian_percent.columns = _whiteasian_percent_columns
 
 
 def load_williamsbestadjectives(filename, otherfunc, yrs_to_do=None):
-
-    d = {}
-    with open(filename, "r") as f:
-        reader = csv.DictReader(f, delimiter=",")
-        for row in reader:
-            row["word"] = row["word"].strip().replace("p.n", "")
-            word = row["word"].strip()
-            curr = d.get(word, {})
-            curr[float(row["year"].strip())] = otherfunc(row)
-            d[word] = curr
-
-    ret = {}
-    ret_weights = {}
-    for occ in d:
-        ret[occ] = [d[occ].get(x, np.nan) for x in yrs_to_do]
-        ret_weights[occ] = [1 for _ in yrs_to_do]
+    # word -> otherfunc over yrs_to_do, the columns are parsed and transformed once (reference_data)
+    words, values = reference_data.adjective_values(filename, otherfunc, yrs_to_do)
+    ret = reference_data.as_dicts(words, values)
+    ret_weights = {occ: [1 for _ in yrs_to_do] for occ in ret}
 
     return ret, ret_weights
 
 
-def occupation_func_williamsbestadject(row):
-    occupation_func_williamsbestadject.label = "Human Stereotype Score"
-    occupation_func_williamsbestadject.savelabel = "HSS"
+def _williamsbestadject_columns(table):
+    scores = np.array([float(v.strip()) for v in table["transformed_score"]], dtype=float)
+    return scores, np.ones(len(scores), dtype=bool)
+
 
-    return float(row["transformed_score"].strip())
+def occupation_func_williamsbestadject(row):
+    return reference_data.apply_to_row(_williamsbestadject_columns, row)
 
 
+occupation_func_williamsbestadject.label = "Human Stereotype Score"
+occupation_func_williamsbestadject.savelabel = "HSS"
+occupation_func_williamsbestadject.columns = _williamsbestadject_columns
 
 
 def load_occupationpercent_data(
@@ -152,33 +149,11 @@ def load_occupationpercent_data(
 # original:
 # def load_occupationpercent_data(filename, occupation_func, yrs_to_do=list(range(1950, 2000, 10))):
 
-    # load as dictionary: occupation -> occupation_func(group_type : array over time)
-    d = {}
-    d_weights = {}
-    with open(filename, "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            occ = row["Occupation"]
-            curr = d.get(occ, {})
-            occp = occupation_func(row)
-            if occp is None:
-                continue
-            curr[int(row["Census year"])] = occp
-            d[occ] = curr
-
-            curr_w = d_weights.get(occ, {})
-            total_weight = row.get("Total Weight", "").strip()
-            if len(total_weight) == 0:
-                curr_w[int(row["Census year"])] = 1
-            else:
-                curr_w[int(row["Census year"])] = float(total_weight)
-            d_weights[occ] = curr_w
-
-    ret = {}
-    ret_weights = {}
-    for occ in d:
-        ret[occ] = [d[occ].get(x, np.nan) for x in yrs_to_do]
-        ret_weights[occ] = [d_weights[occ].get(x, np.nan) for x in yrs_to_do]
+    # load as dictionary: occupation -> occupation_func(group_type : array over time), from the
+    # columns of the file parsed and transformed once per (file, function, years) (reference_data)
+    occupations, values, weights = reference_data.occupation_values(filename, occupation_func, yrs_to_do)
+    ret = reference_data.as_dicts(occupations, values)
+    ret_weights = reference_data.as_dicts(occupations, weights)
 
     return ret, ret_weights
 
@@ -195,7 +170,7 @@ def load_files(filenames):
 
 def load_file(filename):
     rows = {}
-    with open(filename, "r") as f:
+    with open(filename, "r") as f, timer("load_file", file=filename, bytes=os.path.getsize(filename)) as t:
         reader = list(csv.reader(f))
         # replace literal "nan" strings so eval can see np.nan
         for en in range(len(reader)):
@@ -212,6 +187,7 @@ def load_file(filename):
             except Exception as e:
                 print(e)
                 continue
+        t["counts"]["rows"] = len(rows)
     return rows
 
 
@@ -219,26 +195,11 @@ def differences(vec1, vec2):
     return np.subtract(vec1, vec2)
 
 
-nytyears = list(range(1987, 2005))
-sgnyears = list(range(1910, 2000, 10))
-svdyears = list(range(1910, 2000, 10))
-cohayears = list(range(1880, 2000, 10))
-
-
 def get_years(label):
-    if "svd" in label:
-        yrs = svdyears
-    elif "sgns" in label:
-        yrs = sgnyears
-    elif "wikipedia" in label:
-        yrs = [2015]
-    elif "google" in label or "commoncrawlglove" in label:
-        yrs = [2015]
-    elif "nyt" in label:
-        yrs = nytyears
-    else:
+    # the years are registered per label in data_sources
+    yrs = data_sources.get_years(label)
+    if yrs is None:
         print(f"don't have years for label: {label}")
-        return None
     return yrs
 
 # def get_years_single(label):
@@ -0,0 +1,166 @@
+'''
+Golden-equivalence check of the accelerated code paths against the legacy pure-python one.
+
+For every (neutral list, group list) combination it runs changes_over_time's legacy
+single_set_distances_to_single_set and each other engine in changes_over_time.distance_engines on
+the same inputs (the whole neutral list and, like main's individual-word runs, each neutral word on
+its own) and compares all 8 metric series. It also checks that the decade-streaming mode
+(compute_distances one decade at a time + merge_decade_results) gives the in-memory result.
+
+Run from code/, on synthetic vectors or on a sample of a real label:
+
+    python verify_equivalence.py --synthetic
+    python verify_equivalence.py --label sgns --sample 25 --decades 0,4,8 --rtol 1e-9
+
+Exits with status 1 when any series differs by more than the tolerance.
+'''
+import argparse
+import contextlib
+import csv
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+import changes_over_time as cot
+import data_sources
+
+metric_names = ['toset', 'toset_cossim', 'averageboth', 'averagefirst', 'averagesecond',
+                'averageboth_cossim', 'averagefirst_cossim', 'averagesecond_cossim']
+
+
+def compare_series(expected, actual, rtol=1e-9, atol=1e-12):
+    '''
+    compares two 8-metric outputs, returns one entry per metric with the largest absolute deviation
+    and whether the nan pattern and the values agree within tolerance
+    '''
+    ret = []
+    for name, e, a in zip(metric_names, expected, actual):
+        e = np.asarray(e, dtype=float)
+        a = np.asarray(a, dtype=float)
+        nan_match = e.shape == a.shape and bool(np.all(np.isnan(e) == np.isnan(a)))
+        both = ~np.isnan(e) & ~np.isnan(a) if nan_match else np.zeros(e.shape, dtype=bool)
+        deviation = float(np.max(np.abs(e[both] - a[both]))) if both.any() else 0.0
+        ok = nan_match and bool(np.allclose(e[both], a[both], rtol=rtol, atol=atol))
+        ret.append({'metric': name, 'max_abs_deviation': deviation, 'nan_pattern_matches': nan_match, 'ok': ok})
+    return ret
+
+
+def verify_engines(vectors_over_time, vocabd, lists, neutral_lists, group_lists, engines=None, rtol=1e-9, atol=1e-12, individual_words=5, seed=0):
+    if engines is None:
+        engines = [e for e in cot.distance_engines if e != 'legacy']
+    rnd = random.Random(seed)
+    legacy = cot.distance_engines['legacy']
+    checks = []
+    for neut in neutral_lists:
+        singles = rnd.sample(lists[neut], min(individual_words, len(lists[neut])))
+        for group in group_lists:
+            cases = [(neut, lists[neut])] + [(neut + ':' + w, [w]) for w in singles]
+            for casename, targets in cases:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    expected = legacy(vectors_over_time, targets, lists[group], vocabd)
+                for engine in engines:
+                    actual = cot.distance_engines[engine](vectors_over_time, targets, lists[group], vocabd)
+                    for res in compare_series(expected, actual, rtol, atol):
+                        res.update({'engine': engine, 'neutral': casename, 'group': group})
+                        checks.append(res)
+    return checks
+
+
+def verify_streaming(vectors_over_time, vocabd, neutral_lists, group_lists):
+    '''
+    compute_distances on all decades vs one decade at a time, merged; must match exactly
+    '''
+    kwargs = {'neutral_lists': neutral_lists, 'group_lists': group_lists, 'do_individual_neutral_words': True}
+    with contextlib.redirect_stdout(io.StringIO()):
+        full = cot.compute_distances(vectors_over_time, vocabd, **kwargs)
+        parts = [cot.compute_distances([v], [vocabd[en]], **kwargs) for en, v in enumerate(vectors_over_time)]
+    return repr(full) == repr(cot.merge_decade_results(parts))
+
+
+def report(checks, streaming_ok=None):
+    failures = [c for c in checks if not c['ok']]
+    worst = max(checks, key=lambda c: c['max_abs_deviation']) if checks else None
+    print('{} series compared, {} outside tolerance'.format(len(checks), len(failures)))
+    if worst is not None:
+        print('largest deviation: {:.3e} ({} engine, {} vs {}, {})'.format(
+            worst['max_abs_deviation'], worst['engine'], worst['neutral'], worst['group'], worst['metric']))
+    for c in failures[:20]:
+        print('FAILED: {engine} {neutral} vs {group} {metric}: deviation {max_abs_deviation:.3e}, nan pattern matches: {nan_pattern_matches}'.format(**c))
+    if streaming_ok is not None:
+        print('decade streaming matches in-memory run: {}'.format(streaming_ok))
+    return len(failures) == 0 and streaming_ok is not False
+
+
+def read_list(name):
+    with open('../data/word_lists/' + name + '.txt', 'r') as f:
+        return [x.strip() for x in f]
+
+
+def load_label(label, decades=None):
+    filenames = data_sources.filenames(label)
+    if decades is not None:
+        filenames = [filenames[i] for i in decades]
+    with contextlib.redirect_stdout(io.StringIO()):
+        vectors_over_time = cot.load_vectors_over_time(filenames)
+        vocabd = [cot.load_vocab(cot.vocab_filename(fi)) for fi in filenames]
+    return vectors_over_time, vocabd
+
+
+def label_lists(label, param_filename='run_params.csv'):
+    with open(param_filename, 'r') as f:
+        for row in csv.DictReader(f):
+            if row['label'] == label:
+                return eval(row['neutral_lists']), eval(row['group_lists'])
+    raise KeyError('no run_params row for label ' + label)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--synthetic', action='store_true', help='generate synthetic vectors instead of loading a label')
+    parser.add_argument('--label', default='sgns')
+    parser.add_argument('--sample', type=int, default=None, help='only use this many random words of each neutral list')
+    parser.add_argument('--decades', default=None, help='comma separated decade indices to load, e.g. 0,4,8')
+    parser.add_argument('--engines', default=None, help='comma separated engines to check, default all')
+    parser.add_argument('--rtol', type=float, default=1e-9)
+    parser.add_argument('--atol', type=float, default=1e-12)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-streaming', action='store_true')
+    args = parser.parse_args()
+
+    engines = args.engines.split(',') if args.engines else None
+    decades = [int(x) for x in args.decades.split(',')] if args.decades else None
+    workspace = None
+    if args.synthetic:
+        from benchmarks.synthetic import create_workspace
+        workspace = tempfile.mkdtemp(prefix='embedding_verify_')
+        ws = create_workspace(workspace, {'vocab_size': 2000, 'dims': 50, 'seed': args.seed})
+        cwd = os.getcwd()
+        os.chdir(ws['code_folder'])
+        neutral_lists, group_lists = [ws['config']['neutral_list']], ws['config']['group_lists']
+        with contextlib.redirect_stdout(io.StringIO()):
+            vectors_over_time = cot.load_vectors_over_time(ws['filenames'])
+            vocabd = [cot.load_vocab(cot.vocab_filename(fi)) for fi in ws['filenames']]
+    else:
+        neutral_lists, group_lists = label_lists(args.label)
+        vectors_over_time, vocabd = load_label(args.label, decades)
+
+    lists = {name: read_list(name) for name in set(neutral_lists) | set(group_lists)}
+    if args.sample is not None:
+        rnd = random.Random(args.seed)
+        for name in neutral_lists:
+            lists[name] = rnd.sample(lists[name], min(args.sample, len(lists[name])))
+
+    checks = verify_engines(vectors_over_time, vocabd, lists, neutral_lists, group_lists, engines, args.rtol, args.atol, seed=args.seed)
+    streaming_ok = None
+    if not args.no_streaming and args.sample is None:
+        streaming_ok = verify_streaming(vectors_over_time, vocabd, neutral_lists, group_lists)
+
+    if workspace is not None:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+    sys.exit(0 if report(checks, streaming_ok) else 1)
@@ -0,0 +1,256 @@
+'''
+Co-occurrence matrices of the extended figure's 3-year windows from per-year matrices, so every
+year of the Newsroom shards is read and counted once instead of once per window it is part of
+(three times, like the notebook's re-joined window text, or pipeline.create_combined_years_glove's
+concatenated file per window).
+
+year_cooc counts one year over all of its words (cooccurrence.build_cooc with the year's whole
+vocabulary, words in order of first appearance) and caches the matrix, the token counts and the
+first and last window_size tokens of the year in <cache>/<year>_w<window_size>_<weighting>.npz; the
+cache is recomputed when the year's entry in the shard manifest changes.
+
+iter_windows then keeps one running sum over a growing index of all words seen so far: moving to
+the next window adds the years that enter and subtracts the ones that leave, so a window costs the
+sparse sums of one year's matrix in and one out. The pairs across the boundary of two consecutive
+years (at most window_size^2, from the cached tails and heads) are added per window, so with
+span_articles=True a window equals build_cooc over the window's articles joined into one stream
+(exactly for the count weighting, up to rounding for the harmonic one). Its vocabulary is the
+vocab_size most frequent words of the window, ties in order of first appearance, as build_vocab.
+Years with fewer than window_size tokens are not bridged to the year after them.
+'''
+import argparse
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+
+import cooccurrence
+import corpus_stream
+import profiling
+
+cache_folder = '../output/newsroom/cooc'
+
+
+def cache_filename(cache, year, window_size, weighting, span_articles):
+    return os.path.join(cache, '{}_w{}_{}{}.npz'.format(year, window_size, weighting, '' if span_articles else '_articles'))
+
+
+def _source(manifest, year):
+    # what a cached year was computed from, compared on load
+    return json.dumps({'input': manifest.get('input'), 'year': manifest['years'].get(str(year))}, sort_keys=True)
+
+
+def _recording(articles, window_size, ends):
+    # passes the articles through, keeping the first and last window_size tokens of the stream
+    for tokens in articles:
+        if len(ends['head']) < window_size:
+            ends['head'].extend(tokens[:window_size - len(ends['head'])])
+        ends['tail'] = (ends['tail'] + list(tokens))[-window_size:] if window_size > 0 else []
+        yield tokens
+
+
+def count_year(output, year, window_size=4, weighting='count', span_articles=True, manifest=None):
+    '''
+    {'words', 'counts', 'matrix', 'head', 'tail'} of one year, the matrix over all of its words
+    '''
+    counts = cooccurrence.count_tokens(corpus_stream.iter_year_articles(output, year, manifest))
+    # a Counter keeps its words in order of first appearance
+    words = list(counts)
+    ends = {'head': [], 'tail': []}
+    articles = _recording(corpus_stream.iter_year_articles(output, year, manifest), window_size, ends)
+    matrix, _ = cooccurrence.build_cooc(articles, words, window_size, weighting, span_articles)
+    return {'words': np.array(words, dtype=str), 'counts': np.array([counts[w] for w in words], dtype=np.int64),
+            'matrix': matrix, 'head': np.array(ends['head'], dtype=str), 'tail': np.array(ends['tail'], dtype=str)}
+
+
+def save_year(filename, year_data, source):
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    matrix = year_data['matrix'].tocsr()
+    # np.savez adds .npz to names without it
+    tmp = filename + '.tmp.npz'
+    np.savez(tmp, words=year_data['words'], counts=year_data['counts'], head=year_data['head'], tail=year_data['tail'],
+             data=matrix.data, indices=matrix.indices, indptr=matrix.indptr, source=np.array(source))
+    os.replace(tmp, filename)
+
+
+def load_year(filename):
+    '''
+    the cached year and the source it was computed from
+    '''
+    with np.load(filename) as f:
+        V = len(f['words'])
+        matrix = sparse.csr_matrix((f['data'], f['indices'], f['indptr']), shape=(V, V))
+        year_data = {'words': f['words'], 'counts': f['counts'], 'matrix': matrix, 'head': f['head'], 'tail': f['tail']}
+        return year_data, str(f['source'])
+
+
+def year_cooc(output, year, window_size=4, weighting='count', span_articles=True, cache=cache_folder, manifest=None):
+    '''
+    count_year of one year, from the cache when it was computed from the same shards
+    '''
+    if manifest is None: manifest = corpus_stream.load_manifest(output)
+    source = _source(manifest, year)
+    filename = cache_filename(cache, year, window_size, weighting, span_articles)
+    if os.path.exists(filename):
+        year_data, cached_source = load_year(filename)
+        if cached_source == source:
+            return year_data
+    year_data = count_year(output, year, window_size, weighting, span_articles, manifest)
+    save_year(filename, year_data, source)
+    return year_data
+
+
+def junction_pairs(tail, head, window_size, weighting='count'):
+    '''
+    (word, word, weight) of the pairs between the tail of one year and the head of the next
+    '''
+    pairs = []
+    for p, left in enumerate(tail):
+        for q, right in enumerate(head):
+            d = len(tail) - p + q
+            if d <= window_size:
+                pairs.append((left, right, 1.0 if weighting == 'count' else 1.0 / d))
+    return pairs
+
+
+class WindowSum(object):
+    '''
+    running sum of per-year matrices and counts over an index that grows with every new word
+    '''
+    def __init__(self):
+        self.index = {}
+        self.words = []
+        self.matrix = sparse.csr_matrix((0, 0))
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.years = {}
+
+    def ids(self, words):
+        for w in words:
+            if w not in self.index:
+                self.index[w] = len(self.words)
+                self.words.append(w)
+        return np.array([self.index[w] for w in words], dtype=np.int64)
+
+    def _grow(self):
+        V = len(self.words)
+        if self.matrix.shape[0] < V:
+            self.matrix.resize((V, V))
+            self.counts = np.concatenate([self.counts, np.zeros(V - len(self.counts), dtype=np.int64)])
+
+    def _global(self, year_data, ids):
+        V = len(self.words)
+        coo = year_data['matrix'].tocoo()
+        return sparse.csr_matrix((coo.data, (ids[coo.row], ids[coo.col])), shape=(V, V))
+
+    def add(self, year, year_data):
+        ids = self.ids(year_data['words'].tolist())
+        self._grow()
+        self.matrix = self.matrix + self._global(year_data, ids)
+        self.counts[ids] += year_data['counts']
+        self.years[year] = (year_data, ids)
+
+    def remove(self, year):
+        year_data, ids = self.years.pop(year)
+        self.matrix = self.matrix - self._global(year_data, ids)
+        self.matrix.eliminate_zeros()
+        self.counts[ids] -= year_data['counts']
+
+
+def window_vocab(window, vocab_size):
+    '''
+    the vocab_size most frequent words of the window's years (as ids), ties in order of first
+    appearance in the window's stream
+    '''
+    years = sorted(window.years)
+    if len(years) == 0:
+        return np.zeros(0, dtype=np.int64)
+    # first position of every word in the concatenated per-year word lists
+    stream = np.concatenate([window.years[yr][1] for yr in years])
+    ids, first = np.unique(stream, return_index=True)
+    ids = ids[np.argsort(first, kind='stable')]
+    ids = ids[window.counts[ids] > 0]
+    return ids[np.argsort(-window.counts[ids], kind='stable')][:vocab_size]
+
+
+def window_years_present(year, half_width, manifest):
+    return [yr for yr in range(year - half_width, year + half_width + 1)
+            if manifest['years'].get(str(yr), {'tokens': 0})['tokens'] > 0]
+
+
+def _window_result(window, years, vocab_size, window_size, weighting, span_articles, manifest):
+    # (matrix, vocab, counts) of the years currently summed in window
+    matrix = window.matrix
+    if span_articles:
+        pairs = []
+        for before, after in zip(years[:-1], years[1:]):
+            pairs.extend(junction_pairs(window.years[before][0]['tail'].tolist(), window.years[after][0]['head'].tolist(),
+                                        window_size, weighting))
+        if pairs:
+            rows = np.array([window.index[a] for a, b, w in pairs], dtype=np.int64)
+            cols = np.array([window.index[b] for a, b, w in pairs], dtype=np.int64)
+            V = len(window.words)
+            forward = sparse.csr_matrix((np.array([w for a, b, w in pairs]), (rows, cols)), shape=(V, V))
+            matrix = matrix + forward + forward.T
+
+    size = vocab_size(corpus_stream.raw_words(manifest, years)) if callable(vocab_size) else vocab_size
+    ids = window_vocab(window, size)
+    sub = matrix[ids][:, ids]
+    sub.sum_duplicates()
+    return sub, [window.words[i] for i in ids], window.counts[ids].copy()
+
+
+def iter_windows(output, window_years, vocab_size=6000, half_width=1, window_size=4, weighting='count',
+                 span_articles=True, cache=cache_folder, manifest=None):
+    '''
+    (year, matrix, vocab, counts) per window year, matrix the vocab x vocab co-occurrences of the
+    window year-half_width .. year+half_width in the order of vocab and counts the window's token
+    counts of vocab; vocab_size is a number or a function of the window's raw word count (the
+    notebook's len(text.split()) before tokenizing, corpus_stream.raw_words)
+    '''
+    if manifest is None: manifest = corpus_stream.load_manifest(output)
+    window = WindowSum()
+    for year in sorted(window_years):
+        years = window_years_present(year, half_width, manifest)
+        for yr in sorted(window.years):
+            if yr not in years:
+                window.remove(yr)
+        for yr in years:
+            if yr not in window.years:
+                window.add(yr, year_cooc(output, yr, window_size, weighting, span_articles, cache, manifest))
+        yield (year,) + _window_result(window, years, vocab_size, window_size, weighting, span_articles, manifest)
+
+
+def window_cooc(output, year, vocab_size=6000, half_width=1, window_size=4, weighting='count',
+                span_articles=True, cache=cache_folder, manifest=None):
+    '''
+    (matrix, vocab, counts) of a single window, summed from its cached years without the running sum
+    of iter_windows (for windows handled in separate processes)
+    '''
+    if manifest is None: manifest = corpus_stream.load_manifest(output)
+    years = window_years_present(year, half_width, manifest)
+    window = WindowSum()
+    for yr in years:
+        window.add(yr, year_cooc(output, yr, window_size, weighting, span_articles, cache, manifest))
+    return _window_result(window, years, vocab_size, window_size, weighting, span_articles, manifest)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', default='../output/newsroom/shards', help='output folder of corpus_stream.py')
+    parser.add_argument('--cache', default=cache_folder)
+    parser.add_argument('--first-year', type=int, default=corpus_stream.first_year)
+    parser.add_argument('--last-year', type=int, default=corpus_stream.last_year)
+    parser.add_argument('--window-size', type=int, default=4)
+    parser.add_argument('--weighting', choices=cooccurrence.weightings, default='count')
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    profiling.enable(args.profile, 'window_cooc')
+
+    manifest = corpus_stream.load_manifest(args.shards)
+    for year in range(args.first_year, args.last_year + 1):
+        if str(year) not in manifest['years']:
+            continue
+        with profiling.phase('year_cooc', {'year': year}):
+            year_data = year_cooc(args.shards, year, args.window_size, args.weighting, cache=args.cache, manifest=manifest)
+        print(year, '→', len(year_data['words']), 'words,', year_data['matrix'].nnz, 'nonzeros')